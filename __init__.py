@@ -25,7 +25,7 @@ bl_info = {
 #   Modules
 #----------------------------------------------------------
 
-Modules = ["panel", "utils"]
+Modules = ["panel", "utils", "transfer", "export", "batch", "profiling", "weights", "morphs", "snapshots", "library", "colors", "scheduler", "mirror"]
 
 import bpy
 
@@ -33,7 +33,7 @@ import bpy
 #   Register
 #----------------------------------------------------------
 
-Regnames = ["panel", "utils"]
+Regnames = ["panel", "utils", "weights", "morphs", "snapshots", "mirror"]
 
 def register():
     print("Register DAZ Tools")
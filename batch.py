@@ -0,0 +1,278 @@
+import bpy
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Headless clothing pipeline: reparent -> copy weights -> prune -> export.
+#
+# Schedule a manifest over N worker processes:
+#   blender --background --factory-startup --python batch.py -- --manifest jobs.json --workers 4
+#
+# Manifest layout (paths are relative to the manifest file):
+#   {"jobs": [{"id": "jacket",
+#              "source": "library/jacket.blend",
+#              "armature": "Genesis 9",
+#              "mesh": "Genesis 9 Mesh",
+#              "objects": ["Jacket"],          # optional, defaults to every other mesh
+#              "exclude": ["Genesis 9 Eyes"],  # optional
+#              "output_blend": "out/jacket.blend",
+#              "output_fbx": "out/jacket.fbx",
+#              "output_fbx_pieces": {"Jacket": "out/jacket.fbx"},  # optional, one FBX per object instead
+#              "influences": {"max_influences": 4, "epsilon": 0.001, "quantize": true},  # optional
+#              "stages": ["reparent", "copy_weights", "prune", "save", "export"]}]}  # optional
+#
+# "mesh" is only needed when the copy_weights stage runs.
+#
+# Results are written to <manifest>.report.json after every finished job.
+# Re-running the same manifest skips jobs already reported as "ok", and
+# exports whose fingerprint matches the cache manifest next to the FBX are
+# skipped too. --force re-runs and re-exports everything.
+
+#-------------------------------------------------------------
+#   Manifest and report
+#-------------------------------------------------------------
+
+STAGES = ["reparent", "copy_weights", "prune", "save", "export"]
+
+def load_manifest(path):
+    path = os.path.abspath(path)
+    base_dir = os.path.dirname(path)
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    jobs = []
+    for i, job in enumerate(manifest.get("jobs", [])):
+        job = dict(job)
+        job.setdefault("id", f"job_{i:04d}")
+        for key in ("source", "output_blend", "output_fbx"):
+            if job.get(key):
+                job[key] = os.path.normpath(os.path.join(base_dir, job[key]))
+        if job.get("output_fbx_pieces"):
+            job["output_fbx_pieces"] = {name: os.path.normpath(os.path.join(base_dir, path))
+                                        for name, path in job["output_fbx_pieces"].items()}
+        if not job.get("source") or not job.get("armature"):
+            raise ValueError(f"Job '{job['id']}' needs 'source' and 'armature'")
+        if not job.get("mesh") and "copy_weights" in (job.get("stages") or STAGES):
+            raise ValueError(f"Job '{job['id']}' needs 'mesh' to copy weights")
+        jobs.append(job)
+    return jobs
+
+def default_report_path(manifest_path):
+    return os.path.splitext(os.path.abspath(manifest_path))[0] + ".report.json"
+
+def load_report(path):
+    if not os.path.exists(path):
+        return {"jobs": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_report(path, report):
+    # Write to a sibling temp file first so a crash never leaves a torn report
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+
+#-------------------------------------------------------------
+#   Scheduler
+#-------------------------------------------------------------
+
+def run_job_process(job, blender, work_dir, timeout=None):
+    job_path = os.path.join(work_dir, f"{job['id']}.job.json")
+    result_path = os.path.join(work_dir, f"{job['id']}.result.json")
+    with open(job_path, "w", encoding="utf-8") as f:
+        json.dump(job, f)
+    if os.path.exists(result_path):
+        os.remove(result_path)
+
+    command = [
+        blender, "--background", "--factory-startup", job["source"],
+        "--python", os.path.abspath(__file__),
+        "--", "--job", job_path, "--result", result_path,
+    ]
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+        output = process.stdout + process.stderr
+    except subprocess.TimeoutExpired as e:
+        output = f"Timed out after {timeout} s\n{e.stdout or ''}{e.stderr or ''}"
+
+    if os.path.exists(result_path):
+        with open(result_path, "r", encoding="utf-8") as f:
+            result = json.load(f)
+    else:
+        result = {"status": "failed", "error": "Worker exited without a result", "log": output[-4000:]}
+    result["wall_time"] = time.perf_counter() - start
+    return result
+
+def run_manifest(manifest_path, workers=1, report_path=None, blender=None, force=False, timeout=None):
+    jobs = load_manifest(manifest_path)
+    report_path = report_path or default_report_path(manifest_path)
+    report = load_report(report_path)
+    blender = blender or bpy.app.binary_path or "blender"
+
+    pending = [job for job in jobs
+               if force or report["jobs"].get(job["id"], {}).get("status") != "ok"]
+    print(f"Batch: {len(pending)} of {len(jobs)} jobs to run on {workers} workers")
+
+    with tempfile.TemporaryDirectory(prefix="daztools_batch_") as work_dir:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(run_job_process, dict(job, force=force or job.get("force", False)), blender, work_dir, timeout): job
+                       for job in pending}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"status": "failed", "error": str(e)}
+                report["jobs"][job["id"]] = result
+                save_report(report_path, report)
+                print(f"Batch: {job['id']} {result['status']} in {result.get('wall_time', 0.0):.1f} s")
+
+    hits = sum(1 for job in pending if report["jobs"].get(job["id"], {}).get("export_cache") == "hit")
+    misses = sum(1 for job in pending if report["jobs"].get(job["id"], {}).get("export_cache") == "miss")
+    print(f"Batch: export cache {hits} hits, {misses} misses")
+    return report
+
+#-------------------------------------------------------------
+#   Worker
+#-------------------------------------------------------------
+
+def select_only(objects, active):
+    view_layer = bpy.context.view_layer
+    for obj in view_layer.objects:
+        obj.select_set(False)
+    for obj in objects:
+        obj.select_set(True)
+    view_layer.objects.active = active
+
+def run_job(job):
+    # Runs inside the worker process with job["source"] already loaded
+    from . import utils, transfer, export
+
+    scene = bpy.context.scene
+    timings = {}
+    stages = job.get("stages") or STAGES
+    armature = bpy.data.objects.get(job["armature"])
+    mesh = bpy.data.objects.get(job.get("mesh") or "")
+    if not armature or armature.type != 'ARMATURE':
+        raise ValueError(f"Armature '{job['armature']}' not found")
+    if "copy_weights" in stages and (not mesh or mesh.type != 'MESH'):
+        raise ValueError(f"Mesh '{job.get('mesh')}' not found")
+
+    if job.get("objects"):
+        objects = [bpy.data.objects[name] for name in job["objects"]]
+    else:
+        exclude = set(job.get("exclude", [])) | {mesh.name if mesh else ""}
+        objects = [obj for obj in scene.objects if obj.type == 'MESH' and obj.name not in exclude]
+    if not objects:
+        raise ValueError("No clothing objects to process")
+
+    # Files written with bpy.data.libraries.write hold objects outside any scene
+    for obj in [armature] + objects:
+        if obj.name not in scene.objects:
+            scene.collection.objects.link(obj)
+
+    scene.primary_armature_enum = armature.name
+    if mesh:
+        scene.primary_mesh_enum = mesh.name
+    select_only(objects, objects[0])
+
+    if "reparent" in stages:
+        start = time.perf_counter()
+        bpy.ops.daztools.reparent_to_armature()
+        timings["reparent"] = time.perf_counter() - start
+
+    if "copy_weights" in stages:
+        start = time.perf_counter()
+        transfer.transfer_weights(mesh, objects)
+        timings["copy_weights"] = time.perf_counter() - start
+
+    if "prune" in stages:
+        start = time.perf_counter()
+        utils.prune_vertex_groups(objects)
+        timings["prune"] = time.perf_counter() - start
+
+    if "save" in stages and job.get("output_blend"):
+        start = time.perf_counter()
+        os.makedirs(os.path.dirname(job["output_blend"]), exist_ok=True)
+        bpy.ops.wm.save_as_mainfile(filepath=job["output_blend"], copy=True)
+        timings["save"] = time.perf_counter() - start
+
+    result = {"status": "ok", "objects": [obj.name for obj in objects], "timings": timings}
+    if "export" in stages and job.get("output_fbx_pieces"):
+        start = time.perf_counter()
+        pieces = job["output_fbx_pieces"]
+        result["export_manifest"], result["export_items"] = export.export_pieces(
+            [obj for obj in objects if obj.name in pieces], armature, pieces,
+            force=job.get("force", False), influences=job.get("influences"))
+        result["export_cache"] = "hit" if all(item["status"] == "unchanged" for item in result["export_items"]) else "miss"
+        failed = [item["name"] for item in result["export_items"] if item["status"] == "failed"]
+        if failed:
+            result["status"] = "failed"
+            result["error"] = f"Export failed for {', '.join(failed)}"
+        timings["export"] = time.perf_counter() - start
+    elif "export" in stages and job.get("output_fbx"):
+        start = time.perf_counter()
+        written = export.export_if_changed(objects, armature, job["output_fbx"], force=job.get("force", False),
+                                           influences=job.get("influences"), digest=job.get("fingerprint"))
+        result["export_cache"] = "miss" if written else "hit"
+        timings["export"] = time.perf_counter() - start
+
+    return result
+
+#-------------------------------------------------------------
+#   Entry point
+#-------------------------------------------------------------
+
+def import_addon_module(name):
+    # Run as a script: load a module of the add-on package this file belongs to
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    if os.path.dirname(package_dir) not in sys.path:
+        sys.path.insert(0, os.path.dirname(package_dir))
+    addon = importlib.import_module(os.path.basename(package_dir))
+    if not hasattr(bpy.types, "DAZTOOLS_OT_CopyWeights"):
+        addon.register()
+    return importlib.import_module(f"{addon.__name__}.{name}")
+
+def main(argv=None):
+    argv = sys.argv[sys.argv.index("--") + 1:] if argv is None and "--" in sys.argv else (argv or [])
+    parser = argparse.ArgumentParser(prog="batch.py")
+    parser.add_argument("--manifest", help="Job manifest to schedule")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--report", help="Report path, defaults to <manifest>.report.json")
+    parser.add_argument("--blender", help="Blender executable for the workers")
+    parser.add_argument("--timeout", type=float, help="Per-job timeout in seconds")
+    parser.add_argument("--force", action="store_true", help="Re-run jobs already reported as ok and ignore the export cache")
+    parser.add_argument("--job", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.job:
+        with open(args.job, "r", encoding="utf-8") as f:
+            job = json.load(f)
+        start = time.perf_counter()
+        try:
+            result = import_addon_module("batch").run_job(job)
+        except Exception as e:
+            result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+        result["job_time"] = time.perf_counter() - start
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    elif args.manifest:
+        report = run_manifest(args.manifest, args.workers, args.report, args.blender, args.force, args.timeout)
+        failed = [job_id for job_id, result in report["jobs"].items() if result.get("status") != "ok"]
+        if failed:
+            print(f"Batch: {len(failed)} failed jobs: {', '.join(failed)}")
+            sys.exit(1)
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import bpy
+import numpy as np
+from .. import utils
+
+# Deterministic Genesis-scale stand-ins: a capsule-like body with bone
+# weights and sparse morphs, a matching armature, and clothing bands
+# bound to a throwaway armature so reparenting has work to do.
+
+#-------------------------------------------------------------
+#   Mesh helpers
+#-------------------------------------------------------------
+
+def grid_mesh(name, rings, segments, radius, z_min, z_max):
+    # Open cylinder of rings x segments vertices built with bulk writes
+    angle = np.linspace(0.0, 2.0 * np.pi, segments, endpoint=False)
+    height = np.linspace(z_min, z_max, rings)
+    co = np.empty((rings, segments, 3), dtype=np.float32)
+    co[..., 0] = radius * np.cos(angle)[None, :]
+    co[..., 1] = radius * np.sin(angle)[None, :]
+    co[..., 2] = height[:, None]
+
+    r, s = np.meshgrid(np.arange(rings - 1), np.arange(segments), indexing='ij')
+    a = r * segments + s
+    b = r * segments + (s + 1) % segments
+    quads = np.stack((a, b, b + segments, a + segments), axis=-1).reshape(-1, 4)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(rings * segments)
+    mesh.vertices.foreach_set("co", co.ravel())
+    mesh.loops.add(len(quads) * 4)
+    mesh.loops.foreach_set("vertex_index", quads.ravel().astype(np.int32))
+    mesh.polygons.add(len(quads))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, len(quads) * 4, 4, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(len(quads), 4, dtype=np.int32))
+    mesh.update(calc_edges=True)
+    mesh.validate()
+    return mesh
+
+def link_object(name, data, collection):
+    obj = bpy.data.objects.new(name, data)
+    collection.objects.link(obj)
+    return obj
+
+def bone_positions(group_count, seed):
+    rng = np.random.RandomState(seed)
+    heads = np.empty((group_count, 3), dtype=np.float32)
+    heads[:, 2] = np.linspace(0.05, 1.75, group_count)
+    angle = rng.uniform(0.0, 2.0 * np.pi, group_count)
+    heads[:, 0] = 0.08 * np.cos(angle)
+    heads[:, 1] = 0.08 * np.sin(angle)
+    return heads
+
+def bind_to_bones(obj, heads, names, influences=4):
+    co = np.empty(len(obj.data.vertices) * 3, dtype=np.float32)
+    obj.data.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)
+
+    # Squared distances via the dot-product expansion, avoiding a verts x bones x 3 temporary
+    dist = (co * co).sum(axis=1)[:, None] + (heads * heads).sum(axis=1)[None, :] - 2.0 * co @ heads.T
+    dist = np.sqrt(np.maximum(dist, 0.0))
+    nearest = np.argsort(dist, axis=1)[:, :influences]
+    weight = 1.0 / np.maximum(np.take_along_axis(dist, nearest, axis=1), 1e-4)
+    weight /= weight.sum(axis=1, keepdims=True)
+
+    for name in names:
+        obj.vertex_groups.new(name=name)
+    rows = np.repeat(np.arange(len(co)), influences)
+    cols = nearest.ravel()
+    vals = weight.ravel()
+    for gn in np.unique(cols):
+        members = cols == gn
+        utils.write_group_weights(obj.vertex_groups[int(gn)], rows[members], vals[members])
+
+def add_morphs(obj, key_count, seed, prefix="Morph"):
+    rng = np.random.RandomState(seed)
+    mesh = obj.data
+    obj.shape_key_add(name="Basis", from_mix=False)
+    basis = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", basis)
+    basis = basis.reshape(-1, 3)
+
+    for k in range(key_count):
+        key_block = obj.shape_key_add(name=f"{prefix}{k:04d}", from_mix=False)
+        center = basis[rng.randint(len(basis))]
+        falloff = np.clip(1.0 - np.linalg.norm(basis - center, axis=1) / 0.15, 0.0, 1.0)
+        offset = rng.normal(scale=0.01, size=3).astype(np.float32)
+        key_block.data.foreach_set("co", (basis + falloff[:, None] * offset).ravel())
+
+#-------------------------------------------------------------
+#   Scene
+#-------------------------------------------------------------
+
+def make_armature(name, heads, names, collection):
+    arm_data = bpy.data.armatures.new(name)
+    arm = link_object(name, arm_data, collection)
+    bpy.context.view_layer.objects.active = arm
+    with bpy.context.temp_override(active_object=arm, object=arm):
+        bpy.ops.object.mode_set(mode='EDIT')
+        for head, bone_name in zip(heads, names):
+            bone = arm_data.edit_bones.new(bone_name)
+            bone.head = head
+            bone.tail = head + np.array((0.0, 0.0, 0.05), dtype=np.float32)
+        bpy.ops.object.mode_set(mode='OBJECT')
+    return arm
+
+def build_scene(vertices=20000, groups=150, keys=500, clothing=10, seed=0):
+    # Replaces the current file with a synthetic character
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    scene = bpy.context.scene
+    collection = scene.collection
+
+    segments = 128
+    rings = max(2, vertices // segments)
+    names = [f"Bone{i:03d}" for i in range(groups)]
+    heads = bone_positions(groups, seed)
+
+    armature = make_armature("Genesis", heads, names, collection)
+    old_armature = make_armature("OldGenesis", heads, names, collection)
+
+    body = link_object("Body", grid_mesh("Body", rings, segments, 0.15, 0.0, 1.8), collection)
+    body.parent = armature
+    bind_to_bones(body, heads, names)
+    add_morphs(body, keys, seed)
+    body.modifiers.new("Armature", 'ARMATURE').object = armature
+
+    rng = np.random.RandomState(seed + 1)
+    pieces = []
+    for i in range(clothing):
+        z_min = rng.uniform(0.1, 1.2)
+        z_max = min(1.75, z_min + rng.uniform(0.2, 0.5))
+        cloth_rings = max(2, int(rings * (z_max - z_min) / 1.8))
+        piece = link_object(f"Clothing{i:02d}", grid_mesh(f"Clothing{i:02d}", cloth_rings, segments // 2,
+                                                          0.155, z_min, z_max), collection)
+        piece.parent = old_armature
+        piece.modifiers.new("Armature", 'ARMATURE').object = old_armature
+        piece.modifiers.new("Subdivision", 'SUBSURF')
+        add_morphs(piece, min(keys, 20), seed + 2 + i)
+        pieces.append(piece)
+
+    utils.invalidate_object_index()
+    scene.primary_armature_enum = armature.name
+    scene.primary_mesh_enum = body.name
+    return armature, body, pieces
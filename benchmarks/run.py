@@ -0,0 +1,263 @@
+import bpy
+import argparse
+import gc
+import importlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+# Benchmark suite for the operators and utils functions.
+#
+#   blender --background --factory-startup --python benchmarks/run.py -- [options]
+#
+# The first run, or any run with --update-baseline, records
+# benchmarks/baseline.json. Later runs compare against it and exit with
+# status 1 when any benchmark is slower than baseline * (1 + threshold), or
+# fails where the baseline has a time.
+# Baselines only compare when the fixture parameters match.
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+#-------------------------------------------------------------
+#   Benchmarks
+#-------------------------------------------------------------
+
+class Benchmark:
+    # setup runs before every timed run, outside the timing
+    def __init__(self, name, run, repeat=3, setup=None):
+        self.name = name
+        self.run = run
+        self.repeat = repeat
+        self.setup = setup
+
+    def measure(self):
+        times = []
+        for _ in range(self.repeat):
+            if self.setup:
+                self.setup()
+            gc.collect()
+            start = time.perf_counter()
+            self.run()
+            times.append(time.perf_counter() - start)
+        return {"median": statistics.median(times), "min": min(times), "runs": times}
+
+def select_only(objects, active):
+    view_layer = bpy.context.view_layer
+    for obj in view_layer.objects:
+        obj.select_set(False)
+    for obj in objects:
+        obj.select_set(True)
+    view_layer.objects.active = active
+
+def operator(idname, objects, active, **kwargs):
+    category, name = idname.split(".")
+    op = getattr(getattr(bpy.ops, category), name)
+
+    def run():
+        select_only(objects, active)
+        result = op(**kwargs)
+        if 'FINISHED' not in result:
+            raise RuntimeError(f"{idname} returned {result}")
+    return run
+
+def make_benchmarks(addon, armature, body, pieces, output_dir):
+    utils = addon.utils
+    transfer = addon.transfer
+    morphs = addon.morphs
+    weights = addon.weights
+    key_names = [key_block.name for key_block in body.data.shape_keys.key_blocks]
+    scene = bpy.context.scene
+    scene.female_anatomy_mesh_enum = body.name
+    scene.male_anatomy_mesh_enum = body.name
+    scene.paint_mesh_enum = body.name
+    scene.weight_stash_directory = output_dir
+    body.vertex_groups.active_index = 0
+    body.active_shape_key_index = 1
+
+    # Paint groups in the layout the paint operators expect
+    for name in ("Attribute", "Penis"):
+        attribute = body.data.color_attributes.new(name=name, type='FLOAT_COLOR', domain='POINT')
+        attribute.data.foreach_set("color", [0.5] * (len(attribute.data) * 4))
+
+    def paint_groups():
+        mesh = pieces[0].data
+        for name in ("Attribute", "Penis"):
+            if mesh.color_attributes.get(name) is None:
+                mesh.color_attributes.new(name=name, type='FLOAT_COLOR', domain='POINT')
+
+    tucked_names = ["TuckedMax", "TuckedShaftMax", "TuckedScrotumMax"]
+
+    def remove_tucked_morphs():
+        for name in tucked_names:
+            key_block = utils.get_shapekey(pieces[0], name)
+            if key_block is not None:
+                pieces[0].shape_key_remove(key_block)
+
+    def first_tucked_morph():
+        if utils.find_shapekey_index(pieces[0], tucked_names[0]) < 0:
+            bpy.ops.daztools.add_tucked_morphs()
+        utils.set_active_shapekey_by_name(pieces[0], tucked_names[0])
+
+    def preview_steps():
+        # The Next/Previous operators enter sculpt mode, which needs a UI
+        session = morphs.preview_session(pieces[0], body)
+        session.step(morphs.NEXT)
+        morphs.preview_session(pieces[0], body).step(morphs.PREVIOUS)
+
+    def invalidate_statistics():
+        weights.invalidate_group_statistics()
+
+    return [
+        # Only the first reparent has an old armature to delete
+        Benchmark("daztools.reparent_to_armature", operator("daztools.reparent_to_armature", pieces, pieces[0]), repeat=1),
+        Benchmark("daztools.copy_weights", operator("daztools.copy_weights", pieces, pieces[0])),
+        Benchmark("daztools.transfer_shapekeys", operator("daztools.transfer_shapekeys", pieces, pieces[0])),
+        # Worker scaling, bindings are cached after the copy_weights runs
+        Benchmark("transfer.transfer_weights[workers=1]", lambda: transfer.transfer_weights(body, pieces, 1)),
+        Benchmark("transfer.transfer_weights[workers=2]", lambda: transfer.transfer_weights(body, pieces, 2)),
+        Benchmark("transfer.transfer_weights[workers=4]", lambda: transfer.transfer_weights(body, pieces, 4)),
+        # The paint operators end in a paint tool switch, which needs a UI
+        Benchmark("transfer.transfer_colors", lambda: transfer.transfer_colors(body, pieces[:1])),
+        Benchmark("transfer.transfer_colors[mix]", lambda: transfer.transfer_colors(body, pieces[:1], mix=True)),
+        Benchmark("daztools.merge_paint_groups", operator("daztools.merge_paint_groups", [pieces[0]], pieces[0]),
+                  setup=paint_groups),
+        Benchmark("utils.weight_matrix", lambda: utils.weight_matrix(body)),
+        Benchmark("utils.survey", lambda: utils.survey(body)),
+        Benchmark("utils.prune_vertex_groups", lambda: utils.prune_vertex_groups(pieces)),
+        Benchmark("utils.find_shapekey_index", lambda: [utils.find_shapekey_index(body, name) for name in key_names]),
+        Benchmark("utils.set_shapekey_values", lambda: utils.set_shapekey_values(body, 0.0)),
+        Benchmark("daztools.clear_morphs", operator("daztools.clear_morphs", [body], body)),
+        Benchmark("daztools.select_default_shapekey", operator("daztools.select_default_shapekey", [body], body)),
+        Benchmark("daztools.print_vertex_weight", operator("daztools.print_vertex_weight", [body], body)),
+        Benchmark("daztools.apply_vertex_smoothing", operator("daztools.apply_vertex_smoothing", [pieces[0]], pieces[0])),
+        Benchmark("daztools.preview_morph", operator("daztools.preview_morph", [body], body)),
+        Benchmark("morphs.preview_next_previous", preview_steps),
+        Benchmark("daztools.add_tucked_morphs", operator("daztools.add_tucked_morphs", [pieces[0]], pieces[0]),
+                  setup=remove_tucked_morphs),
+        Benchmark("daztools.next_tucked_morph", operator("daztools.next_tucked_morph", [pieces[0]], pieces[0]),
+                  setup=first_tucked_morph),
+        Benchmark("daztools.prune_shapekeys", operator("daztools.prune_shapekeys", pieces, pieces[0], dry_run=True)),
+        Benchmark("daztools.symmetrize[WEIGHTS]", operator("daztools.symmetrize", pieces, pieces[0], data='WEIGHTS')),
+        Benchmark("daztools.symmetrize[COLORS]", operator("daztools.symmetrize", [body], body, data='COLORS')),
+        Benchmark("daztools.symmetrize[SHAPE_KEYS]", operator("daztools.symmetrize", pieces, pieces[0], data='SHAPE_KEYS')),
+        Benchmark("daztools.stash_weights", operator("daztools.stash_weights", pieces, pieces[0], slot="A")),
+        Benchmark("daztools.restore_weight_stash", operator("daztools.restore_weight_stash", pieces, pieces[0], slot="A")),
+        Benchmark("daztools.group_statistics", operator("daztools.group_statistics", [body], body),
+                  setup=invalidate_statistics),
+        Benchmark("daztools.export_clothing", operator("daztools.export_clothing", [pieces[0]], pieces[0],
+                                                       filepath=os.path.join(output_dir, "clothing.fbx"))),
+    ]
+
+def run_benchmarks(benchmarks):
+    results = {}
+    for benchmark in benchmarks:
+        try:
+            results[benchmark.name] = benchmark.measure()
+            print(f"{benchmark.name:40s} {results[benchmark.name]['median'] * 1000.0:10.2f} ms")
+        except Exception as e:
+            # Some operators need a UI (sculpt tools, paint modes) and can't run headless
+            message = str(e).strip().splitlines()[-1] if str(e).strip() else type(e).__name__
+            results[benchmark.name] = {"error": message}
+            print(f"{benchmark.name:40s} {'skipped':>10s}  ({message})")
+        if bpy.context.mode != 'OBJECT' and bpy.context.active_object:
+            bpy.ops.object.mode_set(mode='OBJECT')
+    return results
+
+#-------------------------------------------------------------
+#   Baselines
+#-------------------------------------------------------------
+
+def compare(results, baseline, threshold, min_delta):
+    # [(name, baseline median, median)], median is None for a benchmark
+    # that has a baseline median but failed this run
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or "median" not in base:
+            continue
+        if "median" not in result:
+            regressions.append((name, base["median"], None))
+            continue
+        limit = base["median"] * (1.0 + threshold)
+        if result["median"] > limit and result["median"] - base["median"] > min_delta:
+            regressions.append((name, base["median"], result["median"]))
+    return regressions
+
+def import_addon():
+    # Run as a script: load the add-on package this directory belongs to
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if os.path.dirname(package_dir) not in sys.path:
+        sys.path.insert(0, os.path.dirname(package_dir))
+    addon = importlib.import_module(os.path.basename(package_dir))
+    if not hasattr(bpy.types, "DAZTOOLS_OT_CopyWeights"):
+        addon.register()
+    return addon
+
+def main(argv=None):
+    argv = sys.argv[sys.argv.index("--") + 1:] if argv is None and "--" in sys.argv else (argv or [])
+    parser = argparse.ArgumentParser(prog="benchmarks/run.py")
+    parser.add_argument("--vertices", type=int, default=20000)
+    parser.add_argument("--groups", type=int, default=150)
+    parser.add_argument("--keys", type=int, default=500)
+    parser.add_argument("--clothing", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown, 0.15 = 15%%")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="Ignore slowdowns below this many seconds")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="Also write this run's results to this JSON file")
+    args = parser.parse_args(argv)
+
+    addon = import_addon()
+    fixtures = importlib.import_module(f"{addon.__name__}.benchmarks.fixtures")
+    fixture = {key: getattr(args, key) for key in ("vertices", "groups", "keys", "clothing", "seed")}
+
+    start = time.perf_counter()
+    armature, body, pieces = fixtures.build_scene(**fixture)
+    print(f"Built fixture {fixture} in {time.perf_counter() - start:.1f} s")
+
+    with tempfile.TemporaryDirectory(prefix="daztools_bench_") as output_dir:
+        results = run_benchmarks(make_benchmarks(addon, armature, body, pieces, output_dir))
+
+    report = {
+        "meta": {
+            "fixture": fixture,
+            "blender": bpy.app.version_string,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["meta"]["fixture"] != fixture:
+        print(f"Baseline fixture {baseline['meta']['fixture']} does not match {fixture}, not comparing")
+        return 2
+
+    regressions = compare(results, baseline["results"], args.threshold, args.min_delta)
+    for name, before, after in regressions:
+        if after is None:
+            print(f"FAILED {name}: {before * 1000.0:.2f} ms -> {results[name].get('error', 'no result')}")
+            continue
+        print(f"REGRESSION {name}: {before * 1000.0:.2f} ms -> {after * 1000.0:.2f} ms "
+              f"(+{(after / before - 1.0) * 100.0:.0f}%)")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold * 100.0:.0f}%")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
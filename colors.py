@@ -0,0 +1,138 @@
+import numpy as np
+from . import profiling
+
+#-------------------------------------------------------------
+#   Channel mappings
+#-------------------------------------------------------------
+
+CHANNELS = "RGBA"
+
+# Green of "Attribute" into green of "Penis", the paint group layout of the
+# male anatomy meshes
+DEFAULT_MAPPINGS = "Attribute.G > Penis.G"
+
+def parse_mappings(text):
+    # "Src.R > Dst.G, Other.B > Dst.B" -> [(src, 0, dst, 1), (other, 2, dst, 2)]
+    mappings = []
+    for entry in text.split(","):
+        if not entry.strip():
+            continue
+        try:
+            source, destination = (side.strip() for side in entry.split(">"))
+            src_name, src_channel = source.rsplit(".", 1)
+            dst_name, dst_channel = destination.rsplit(".", 1)
+            mappings.append((src_name.strip(), CHANNELS.index(src_channel.strip().upper()),
+                             dst_name.strip(), CHANNELS.index(dst_channel.strip().upper())))
+        except ValueError:
+            raise ValueError(f"Can't read channel mapping '{entry.strip()}', expected 'Source.R > Destination.G'")
+    return mappings
+
+#-------------------------------------------------------------
+#   Attribute arrays
+#-------------------------------------------------------------
+
+def read_colors(attribute):
+    colors = np.empty(len(attribute.data) * 4, dtype=np.float32)
+    attribute.data.foreach_get("color", colors)
+    return colors.reshape(-1, 4)
+
+def write_colors(attribute, colors):
+    attribute.data.foreach_set("color", np.ascontiguousarray(colors, dtype=np.float32).ravel())
+
+def corner_vertices(mesh):
+    vertices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", vertices)
+    return vertices
+
+def convert_domain(mesh, colors, source_domain, target_domain):
+    # Point colors spread to corners, corner colors average onto points
+    if source_domain == target_domain:
+        return colors
+    vertices = corner_vertices(mesh)
+    if source_domain == 'POINT':
+        return colors[vertices]
+    count = np.bincount(vertices, minlength=len(mesh.vertices))
+    sums = np.stack([np.bincount(vertices, weights=colors[:, c], minlength=len(mesh.vertices))
+                     for c in range(4)], axis=1)
+    return (sums / np.maximum(count, 1)[:, None]).astype(np.float32)
+
+#-------------------------------------------------------------
+#   Merge
+#-------------------------------------------------------------
+
+def merge_channels(mesh, mappings):
+    # Copies every (source, channel) -> (destination, channel) mapping with
+    # each attribute read and written once. Returns the destinations written.
+    attributes = mesh.color_attributes
+    names = {name for src, _sc, dst, _dc in mappings for name in (src, dst)}
+    missing = [name for name in names if attributes.get(name) is None]
+    if missing:
+        raise KeyError(f"'{mesh.name}' has no color attribute {', '.join(sorted(missing))}")
+
+    with profiling.span("read_colors", mesh=mesh.name):
+        arrays = {name: read_colors(attributes[name]) for name in names}
+
+    with profiling.span("merge_channels", mesh=mesh.name):
+        merged = {}
+        for src, src_channel, dst, dst_channel in mappings:
+            if dst not in merged:
+                merged[dst] = arrays[dst].copy()
+            source = convert_domain(mesh, arrays[src], attributes[src].domain, attributes[dst].domain)
+            merged[dst][:, dst_channel] = source[:, src_channel]
+
+    with profiling.span("write_colors", mesh=mesh.name):
+        for dst, colors in merged.items():
+            write_colors(attributes[dst], colors)
+    profiling.count(color_values=sum(colors.size for colors in merged.values()))
+    return list(merged)
+
+def convert_to_byte_color(mesh, name):
+    # Replaces a FLOAT_COLOR attribute by a BYTE_COLOR one with the same
+    # name and domain, a quarter of the memory
+    attributes = mesh.color_attributes
+    attribute = attributes[name]
+    if attribute.data_type == 'BYTE_COLOR':
+        return attribute
+    was_active = attributes.active_color_name == name
+    was_render = attributes.render_color_index == attributes.find(name)
+    colors = read_colors(attribute)
+    domain = attribute.domain
+    attributes.remove(attribute)
+    attribute = attributes.new(name=name, type='BYTE_COLOR', domain=domain)
+    write_colors(attribute, np.clip(colors, 0.0, 1.0))
+    if was_active:
+        attributes.active_color = attribute
+    if was_render:
+        attributes.render_color_index = attributes.find(name)
+    return attribute
+
+def merge_paint_groups(objects, mappings, remove_sources=True, byte_color=False):
+    # Runs merge_channels on every object that has all the attributes.
+    # With remove_sources, source layers that aren't destinations are
+    # deleted and a single destination takes over the first source's name,
+    # so materials reading that name keep working. Returns objects merged.
+    merged_objects = []
+    for obj in objects:
+        mesh = obj.data
+        names = {name for src, _sc, dst, _dc in mappings for name in (src, dst)}
+        if obj.type != 'MESH' or any(mesh.color_attributes.get(name) is None for name in names):
+            continue
+        destinations = merge_channels(mesh, mappings)
+
+        if remove_sources:
+            sources = [src for src, _sc, _dst, _dc in mappings if src not in destinations]
+            for name in dict.fromkeys(sources):
+                mesh.color_attributes.remove(mesh.color_attributes[name])
+            if len(destinations) == 1 and sources:
+                attribute = mesh.color_attributes[destinations[0]]
+                attribute.name = sources[0]
+                mesh.color_attributes.active_color = attribute
+                destinations = [sources[0]]
+
+        if byte_color:
+            with profiling.span("byte_color", mesh=mesh.name):
+                for name in destinations:
+                    convert_to_byte_color(mesh, name)
+        mesh.update()
+        merged_objects.append(obj)
+    return merged_objects
@@ -0,0 +1,620 @@
+import bpy
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import string
+import subprocess
+import tempfile
+import time
+import numpy as np
+from mathutils import Matrix
+from . import utils, profiling, weights
+
+#-------------------------------------------------------------
+#   Settings
+#-------------------------------------------------------------
+
+# Armature and meshes are scaled up by this before export and the FBX
+# global scale brings them back, so UE sees a unit-scale root bone
+UNIT_SCALE = 100.0
+
+FBX_SETTINGS = dict(
+    use_selection = True,
+    use_visible = True,
+    use_active_collection = False,
+    global_scale = 0.009999999776482582,
+    apply_unit_scale = True,
+    apply_scale_options = 'FBX_SCALE_NONE',
+    use_space_transform = True,
+    bake_space_transform = False,
+    object_types = {'ARMATURE', 'MESH'},
+    use_mesh_modifiers = False,
+    use_mesh_modifiers_render = True,
+    mesh_smooth_type = 'FACE',
+    colors_type = 'SRGB',
+    prioritize_active_color = False,
+    use_subsurf = False,
+    use_mesh_edges = False,
+    use_tspace = False,
+    use_triangles = False,
+    use_custom_props = False,
+    add_leaf_bones = False,
+    primary_bone_axis = 'Y',
+    secondary_bone_axis = 'X',
+    use_armature_deform_only = False,
+    armature_nodetype = 'NULL',
+    bake_anim = False,
+    bake_anim_use_all_bones = True,
+    bake_anim_use_nla_strips = True,
+    bake_anim_use_all_actions = True,
+    bake_anim_force_startend_keying = True,
+    bake_anim_step = 1.0,
+    bake_anim_simplify_factor = 1.0,
+    path_mode = 'AUTO',
+    embed_textures = False,
+    batch_mode = 'OFF',
+    use_batch_own_dir = True,
+    axis_forward = '-Z',
+    axis_up = 'Y',
+)
+
+# Placeholders of the export path template
+PATH_PLACEHOLDERS = ("name", "armature", "blend")
+
+def output_path(template, obj, armature=None):
+    if template.startswith("//") and not bpy.data.filepath:
+        raise ValueError("The export path is relative to the .blend file, save it first")
+    blend_name = os.path.splitext(os.path.basename(bpy.data.filepath))[0] or "untitled"
+    try:
+        fields = [field for _text, field, _spec, _conversion in string.Formatter().parse(template)
+                  if field is not None]
+        for field in fields:
+            if field not in PATH_PLACEHOLDERS:
+                raise KeyError(field)
+        path = template.format(
+            name=bpy.path.clean_name(obj.name),
+            armature=bpy.path.clean_name(armature.name) if armature else "",
+            blend=blend_name,
+        )
+    except (KeyError, IndexError) as error:
+        raise ValueError(f"Unknown placeholder {{{error.args[0]}}} in the export path, "
+                         f"use {{name}}, {{armature}} or {{blend}}") from error
+    except (ValueError, AttributeError) as error:
+        raise ValueError(f"Invalid export path '{template}': {error}") from error
+    path = bpy.path.abspath(path)
+    if not path.lower().endswith(".fbx"):
+        path = os.path.join(path, bpy.path.clean_name(obj.name) + ".fbx")
+    return path
+
+#-------------------------------------------------------------
+#   Export copies
+#-------------------------------------------------------------
+
+def flush_basis(mesh):
+    # Mesh positions follow the reference key, as an edit mode toggle with
+    # the basis active would leave them
+    if not mesh.shape_keys:
+        return
+    basis = mesh.shape_keys.reference_key
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    basis.data.foreach_get("co", co)
+    mesh.vertices.foreach_set("co", co)
+
+def make_export_copies(objects, armature, collection, scale=UNIT_SCALE):
+    # Duplicate armature and meshes with the unit scale already applied to
+    # their data, leaving the originals untouched
+    scaled_world = armature.matrix_world @ Matrix.Scale(scale, 4)
+    location, rotation, data_scale = scaled_world.decompose()
+
+    arm_copy = armature.copy()
+    arm_copy.data = armature.data.copy()
+    arm_copy.animation_data_clear()
+    arm_copy.parent = None
+    collection.objects.link(arm_copy)
+    arm_copy.matrix_world = Matrix.LocRotScale(location, rotation, None)
+    arm_copy.data.transform(Matrix.Diagonal(data_scale.to_4d()))
+    for pose_bone in arm_copy.pose.bones:
+        pose_bone.location *= scale
+
+    copies = [arm_copy]
+    for obj in objects:
+        if obj.mode == 'EDIT':
+            obj.update_from_editmode()
+        if obj.parent == armature:
+            world = scaled_world @ obj.matrix_parent_inverse @ obj.matrix_basis
+        else:
+            world = obj.matrix_world
+
+        mesh_copy = obj.copy()
+        mesh_copy.data = obj.data.copy()
+        mesh_copy.animation_data_clear()
+        collection.objects.link(mesh_copy)
+        flush_basis(mesh_copy.data)
+        mesh_copy.active_shape_key_index = 0
+        mesh_copy.show_only_shape_key = False
+
+        mesh_copy.parent = arm_copy
+        mesh_copy.matrix_parent_inverse = Matrix.Identity(4)
+        mesh_copy.matrix_basis = Matrix.Identity(4)
+        mesh_copy.data.transform(arm_copy.matrix_world.inverted() @ world, shape_keys=True)
+        for mod in mesh_copy.modifiers:
+            if mod.type == 'ARMATURE':
+                mod.object = arm_copy
+        copies.append(mesh_copy)
+    return copies
+
+def remove_export_copies(copies, collection):
+    for obj in copies:
+        data = obj.data
+        bpy.data.objects.remove(obj)
+        if isinstance(data, bpy.types.Mesh):
+            bpy.data.meshes.remove(data)
+        elif isinstance(data, bpy.types.Armature):
+            bpy.data.armatures.remove(data)
+    bpy.data.collections.remove(collection)
+
+@contextlib.contextmanager
+def export_scene(objects, armature, scale=UNIT_SCALE, influences=None):
+    # Export copies of armature and objects, named like the originals while
+    # the context is open, as FBX node names come from object names.
+    # Yields [armature copy] + mesh copies and leaves the scene as it was.
+    scene = bpy.context.scene
+    collection = bpy.data.collections.new("DazTools Export")
+    scene.collection.children.link(collection)
+    copies = []
+    renamed = []
+    try:
+        with profiling.span("export_copies", objects=len(objects)):
+            copies = make_export_copies(objects, armature, collection, scale)
+        if influences is not None:
+            for copy in copies[1:]:
+                weights.limit_influences(copy, **influences)
+
+        for original, copy in zip([armature] + objects, copies):
+            name = original.name
+            # Names are capped at 63 characters
+            original.name = name[:47] + ".daztools_export"
+            renamed.append((original, name))
+            copy.name = name
+        yield copies
+    finally:
+        remove_export_copies(copies, collection)
+        for original, name in renamed:
+            original.name = name
+
+def write_fbx(copies, filepath, settings=None):
+    # copies[0] is the armature, the others are exported with it
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    fbx_settings = dict(FBX_SETTINGS, **(settings or {}))
+    with bpy.context.temp_override(selected_objects=copies, active_object=copies[1], object=copies[1]):
+        with profiling.span("fbx_export"):
+            bpy.ops.export_scene.fbx(filepath=filepath, **fbx_settings)
+
+def export_clothing(objects, armature, filepath, scale=UNIT_SCALE, settings=None, influences=None):
+    # Non-destructive FBX export of objects skinned to armature. Safe to call
+    # from scripts, needs no file dialog and leaves the scene as it was.
+    # influences are weights.limit_influences arguments applied to the copies.
+    objects = [obj for obj in objects if obj.type == 'MESH']
+    if not objects:
+        raise ValueError("No mesh objects to export")
+    with export_scene(objects, armature, scale, influences) as copies:
+        write_fbx(copies, filepath, settings)
+    return filepath
+
+#-------------------------------------------------------------
+#   Export cache
+#-------------------------------------------------------------
+
+# Fingerprints of finished exports, kept next to the FBX files
+CACHE_MANIFEST = ".daztools_export_cache.json"
+
+_cache_stats = {"hits": 0, "misses": 0}
+
+def hash_array(digest, collection, attr, size, dtype=np.float32):
+    data = np.empty(len(collection) * size, dtype=dtype)
+    if len(data):
+        collection.foreach_get(attr, data)
+    digest.update(data.tobytes())
+
+def stable(value):
+    # Sets repr in hash order, which changes between sessions
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(value, key=str))
+    if hasattr(value, "__len__") and not isinstance(value, str):
+        return tuple(stable(item) for item in value)
+    return value
+
+# Properties that change with selection, layout or the session, not with
+# what gets exported
+ID_UI_PROPERTIES = {prop.identifier for prop in bpy.types.ID.bl_rna.properties} - {"name"} | {
+    "preview_render_type", "use_preview_world", "paint_active_slot", "paint_clone_slot"}
+NODE_UI_PROPERTIES = {prop.identifier for prop in bpy.types.Node.bl_rna.properties} - {"bl_idname", "mute"}
+MODIFIER_UI_PROPERTIES = {"execution_time", "is_active", "is_override_data", "persistent_uid",
+                          "show_expanded", "show_in_editmode", "show_on_cage"}
+
+def hash_properties(digest, struct, skip=()):
+    # Plain RNA properties of a modifier or similar, pointers by name
+    for prop in struct.bl_rna.properties:
+        if prop.identifier == "rna_type" or prop.identifier in skip:
+            continue
+        value = getattr(struct, prop.identifier, None)
+        if prop.type == 'POINTER':
+            value = getattr(value, "name", None)
+        elif prop.type == 'COLLECTION':
+            continue
+        digest.update(repr((prop.identifier, stable(value))).encode())
+
+def hash_node_tree(digest, node_tree):
+    # Node types, settings, unlinked input values and links, node groups
+    # included. Node location, size and selection are left out.
+    for node in node_tree.nodes:
+        hash_properties(digest, node, NODE_UI_PROPERTIES)
+        for socket in node.inputs:
+            if hasattr(socket, "default_value") and not socket.is_linked:
+                digest.update(repr((node.name, socket.identifier, stable(socket.default_value))).encode())
+        if node.type == 'GROUP' and node.node_tree:
+            hash_node_tree(digest, node.node_tree)
+    for link in node_tree.links:
+        digest.update(repr((link.from_node.name, link.from_socket.identifier,
+                            link.to_node.name, link.to_socket.identifier, link.is_muted)).encode())
+
+def hash_material(digest, material):
+    hash_properties(digest, material, ID_UI_PROPERTIES)
+    if material.node_tree:
+        hash_node_tree(digest, material.node_tree)
+
+def hash_object(digest, obj):
+    mesh = obj.data
+    digest.update(repr((obj.name, tuple(map(tuple, obj.matrix_world)), obj.parent.name if obj.parent else None,
+                        tuple(obj.matrix_parent_inverse.row[i][:] for i in range(4)))).encode())
+    hash_array(digest, mesh.vertices, "co", 3)
+    hash_array(digest, mesh.loops, "vertex_index", 1, np.int32)
+    hash_array(digest, mesh.polygons, "loop_total", 1, np.int32)
+    hash_array(digest, mesh.polygons, "use_smooth", 1, bool)
+    for uv_layer in mesh.uv_layers:
+        digest.update(uv_layer.name.encode())
+        hash_array(digest, uv_layer.data, "uv", 2)
+    for attribute in mesh.color_attributes:
+        digest.update(repr((attribute.name, attribute.domain, attribute.data_type)).encode())
+        hash_array(digest, attribute.data, "color", 4)
+    digest.update(repr([material.name if material else None for material in mesh.materials]).encode())
+    for material in mesh.materials:
+        if material:
+            hash_material(digest, material)
+
+    digest.update(repr([vg.name for vg in obj.vertex_groups]).encode())
+    for array in utils.weight_matrix(obj):
+        digest.update(array.tobytes())
+
+    if mesh.shape_keys:
+        for key_block in mesh.shape_keys.key_blocks:
+            digest.update(repr((key_block.name, key_block.relative_key.name, key_block.mute,
+                                key_block.slider_min, key_block.slider_max)).encode())
+            hash_array(digest, key_block.data, "co", 3)
+
+    for mod in obj.modifiers:
+        hash_properties(digest, mod, MODIFIER_UI_PROPERTIES)
+
+def fingerprint(objects, armature, scale=UNIT_SCALE, settings=None, influences=None):
+    # Hash of everything that ends up in the FBX: geometry, weights, shape
+    # keys, modifiers, materials, armature rest and current pose and the
+    # export settings
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr((scale, stable(sorted(dict(FBX_SETTINGS, **(settings or {})).items(), key=str)),
+                        sorted((influences or {}).items()))).encode())
+
+    bones = armature.data.bones
+    digest.update(repr((armature.name, tuple(map(tuple, armature.matrix_world)), [bone.name for bone in bones],
+                        [bone.parent.name if bone.parent else None for bone in bones])).encode())
+    hash_array(digest, bones, "head_local", 3)
+    hash_array(digest, bones, "tail_local", 3)
+    hash_array(digest, bones, "matrix_local", 16)
+    hash_array(digest, bones, "use_deform", 1, bool)
+    hash_array(digest, armature.pose.bones, "matrix_basis", 16)
+
+    for obj in objects:
+        if obj.type == 'MESH':
+            if obj.mode == 'EDIT':
+                obj.update_from_editmode()
+            hash_object(digest, obj)
+    return digest.hexdigest()
+
+def cache_manifest_path(filepath):
+    return os.path.join(os.path.dirname(os.path.abspath(filepath)), CACHE_MANIFEST)
+
+def load_cache_manifest(filepath):
+    path = cache_manifest_path(filepath)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def is_cached(filepath, digest):
+    entry = load_cache_manifest(filepath).get(os.path.basename(filepath))
+    return bool(entry) and entry.get("fingerprint") == digest and os.path.exists(filepath)
+
+# A manifest lock older than this is left over from a crashed writer
+LOCK_TIMEOUT = 10.0
+
+@contextlib.contextmanager
+def locked(path, timeout=LOCK_TIMEOUT):
+    # Exclusive lock file next to path, shared by every Blender process
+    # exporting to the same directory
+    lock_path = f"{path}.lock"
+    start = time.time()
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > timeout:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.time() - start > timeout:
+                raise TimeoutError(f"'{lock_path}' is held by another export")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+def record_export(filepath, digest):
+    # Read-modify-write under the manifest lock, so background exports to
+    # the same directory don't drop each other's entries. The atomic
+    # replace keeps readers from seeing a partial file.
+    path = cache_manifest_path(filepath)
+    with locked(path):
+        manifest = load_cache_manifest(filepath)
+        manifest[os.path.basename(filepath)] = {"fingerprint": digest, "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+def export_if_changed(objects, armature, filepath, force=False, scale=UNIT_SCALE, settings=None,
+                      influences=None, digest=None):
+    # export_clothing unless the manifest has the same fingerprint for
+    # filepath. Returns True when the FBX was written.
+    with profiling.span("fingerprint"):
+        digest = digest or fingerprint(objects, armature, scale, settings, influences)
+    if not force and is_cached(filepath, digest):
+        _cache_stats["hits"] += 1
+        profiling.count(cache_hits=1)
+        return False
+    _cache_stats["misses"] += 1
+    profiling.count(cache_misses=1)
+    export_clothing(objects, armature, filepath, scale, settings, influences)
+    record_export(filepath, digest)
+    return True
+
+def cache_stats():
+    return dict(_cache_stats)
+
+def reset_cache_stats():
+    _cache_stats.update(hits=0, misses=0)
+
+#-------------------------------------------------------------
+#   Per-piece export
+#-------------------------------------------------------------
+
+# Summary of a per-piece export, written next to the FBX files
+EXPORT_MANIFEST = "daztools_export_manifest.json"
+
+def piece_paths(template, objects, armature):
+    # {object name: FBX path} from the output template, one file per mesh
+    paths = {}
+    for obj in objects:
+        path = output_path(template, obj, armature)
+        if os.path.normcase(path) in map(os.path.normcase, paths.values()):
+            raise ValueError(f"'{obj.name}' and another piece would both export to '{path}', "
+                             "add {name} to the export path")
+        paths[obj.name] = path
+    return paths
+
+def export_manifest_path(paths):
+    directories = [os.path.dirname(os.path.abspath(path)) for path in paths]
+    try:
+        directory = os.path.commonpath(directories)
+    except ValueError:
+        # Different drives
+        directory = directories[0]
+    return os.path.join(directory, EXPORT_MANIFEST)
+
+def export_pieces(objects, armature, paths, force=False, scale=UNIT_SCALE, settings=None, influences=None):
+    # One FBX per mesh in a single pass: export copies of the armature and
+    # every changed piece are made once, then each piece is exported with
+    # the armature to paths[name]. Pieces matching the export cache are
+    # skipped. Returns (manifest path, [item]), items are dicts with name,
+    # filepath, status ("exported", "unchanged" or "failed"), seconds, error.
+    objects = [obj for obj in objects if obj.type == 'MESH']
+    if not objects:
+        raise ValueError("No mesh objects to export")
+    start = time.perf_counter()
+
+    items = {}
+    pending = []
+    for obj in objects:
+        item_start = time.perf_counter()
+        with profiling.span("fingerprint", object=obj.name):
+            digest = fingerprint([obj], armature, scale, settings, influences)
+        item = items[obj.name] = {"name": obj.name, "filepath": paths[obj.name], "status": "unchanged",
+                                  "seconds": 0.0, "error": "", "fingerprint": digest}
+        if not force and is_cached(paths[obj.name], digest):
+            _cache_stats["hits"] += 1
+            profiling.count(cache_hits=1)
+        else:
+            pending.append(obj)
+        item["seconds"] = time.perf_counter() - item_start
+
+    if pending:
+        # Originals are renamed while their copies export
+        names = [obj.name for obj in pending]
+        try:
+            with export_scene(pending, armature, scale, influences) as copies:
+                for name, copy in zip(names, copies[1:]):
+                    item = items[name]
+                    item_start = time.perf_counter()
+                    try:
+                        write_fbx([copies[0], copy], item["filepath"], settings)
+                        record_export(item["filepath"], item["fingerprint"])
+                        item["status"] = "exported"
+                        _cache_stats["misses"] += 1
+                        profiling.count(cache_misses=1)
+                    except Exception as e:
+                        item["status"] = "failed"
+                        item["error"] = f"{type(e).__name__}: {e}"
+                    item["seconds"] += time.perf_counter() - item_start
+        except Exception as e:
+            # Copying or cleaning up failed, pieces not written yet failed with it
+            for name in names:
+                if items[name]["status"] == "unchanged":
+                    items[name]["status"] = "failed"
+                    items[name]["error"] = f"{type(e).__name__}: {e}"
+
+    items = [items[obj.name] for obj in objects]
+    counts = {status: sum(item["status"] == status for item in items) for status in ("exported", "unchanged", "failed")}
+    manifest = dict(armature=armature.name, time=time.strftime("%Y-%m-%d %H:%M:%S"),
+                    seconds=time.perf_counter() - start, items=items, **counts)
+    manifest_path = export_manifest_path([item["filepath"] for item in items])
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return manifest_path, items
+
+#-------------------------------------------------------------
+#   Background export
+#-------------------------------------------------------------
+
+class BackgroundExport:
+    # One FBX export running in a headless Blender worker
+    def __init__(self, name, filepath, process, work_dir, result_path, log_path):
+        self.name = name
+        self.filepath = filepath
+        self.process = process
+        self.work_dir = work_dir
+        self.result_path = result_path
+        self.log_path = log_path
+        self.start = time.time()
+        self.duration = 0.0
+        self.status = 'RUNNING'
+        self.error = ""
+
+    def poll(self):
+        # Returns True once, when the worker has just exited
+        if self.status != 'RUNNING' or self.process.poll() is None:
+            return False
+        self.duration = time.time() - self.start
+        result = {}
+        if os.path.exists(self.result_path):
+            with open(self.result_path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        if result.get("status") == "ok":
+            self.status = 'DONE'
+        else:
+            self.status = 'FAILED'
+            # Operator errors end with a "Location:" line, the message is above it
+            lines = [line for line in result.get("error", "").strip().splitlines()
+                     if line.strip() and not line.startswith("Location:")]
+            self.error = lines[-1].strip() if lines else \
+                self.log_tail() or f"Worker exited with {self.process.returncode}"
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        return True
+
+    def log_tail(self):
+        try:
+            with open(self.log_path, "r", encoding="utf-8", errors="replace") as f:
+                lines = [line.strip() for line in f if line.strip()]
+            return lines[-1] if lines else ""
+        except OSError:
+            return ""
+
+_background_exports = []
+
+def start_background_export(objects, armature, filepath, influences=None, blender=None, digest=None,
+                            pieces=None, force=True):
+    # Writes objects and armature to a temporary .blend and exports it from
+    # a headless Blender, leaving this session free. With pieces, a
+    # {name: path} of piece_paths, every mesh gets its own FBX and filepath
+    # is the export manifest.
+    objects = [obj for obj in objects if obj.type == 'MESH']
+    if not objects:
+        raise ValueError("No mesh objects to export")
+    for obj in objects:
+        if obj.mode == 'EDIT':
+            obj.update_from_editmode()
+
+    work_dir = tempfile.mkdtemp(prefix="daztools_export_")
+    source = os.path.join(work_dir, "export.blend")
+    with profiling.span("write_library", objects=len(objects)):
+        bpy.data.libraries.write(source, {armature, *objects}, fake_user=True)
+
+    job = {
+        "id": bpy.path.clean_name(objects[0].name),
+        "source": source,
+        "armature": armature.name,
+        "objects": [obj.name for obj in objects],
+        "output_fbx": filepath,
+        "influences": influences,
+        "output_fbx_pieces": pieces,
+        "stages": ["export"],
+        "force": force,
+        "fingerprint": digest,
+    }
+    job_path = os.path.join(work_dir, "job.json")
+    result_path = os.path.join(work_dir, "result.json")
+    log_path = os.path.join(work_dir, "worker.log")
+    with open(job_path, "w", encoding="utf-8") as f:
+        json.dump(job, f)
+
+    command = [
+        blender or bpy.app.binary_path or "blender", "--background", "--factory-startup", source,
+        "--python", os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch.py"),
+        "--", "--job", job_path, "--result", result_path,
+    ]
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+
+    task = BackgroundExport(objects[0].name, filepath, process, work_dir, result_path, log_path)
+    _background_exports.append(task)
+    return task
+
+def background_exports():
+    return list(_background_exports)
+
+def poll_background_exports():
+    # Exports that finished since the last poll
+    return [task for task in _background_exports if task.poll()]
+
+def running_background_exports():
+    return [task for task in _background_exports if task.status == 'RUNNING']
+
+def clear_background_exports():
+    _background_exports[:] = running_background_exports()
+
+def cancel_background_exports():
+    # Terminates every running worker, returns the tasks cancelled
+    cancelled = running_background_exports()
+    for task in cancelled:
+        task.process.terminate()
+    for task in cancelled:
+        try:
+            task.process.wait(timeout=5.0)
+        except subprocess.TimeoutExpired:
+            task.process.kill()
+            task.process.wait()
+        task.duration = time.time() - task.start
+        task.status = 'FAILED'
+        task.error = "Cancelled"
+        shutil.rmtree(task.work_dir, ignore_errors=True)
+    return cancelled
@@ -0,0 +1,272 @@
+import bpy
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+# Index of the objects in a directory of .blend files, so the Data panel
+# can offer bodies and clothing without opening or appending them first.
+#
+#   blender --background --factory-startup --python library.py -- --directory D:/Daz/Library
+#
+# The index is a SQLite file in the library directory. Only files whose
+# mtime or size changed since the last scan are read again.
+
+INDEX_NAME = ".daztools_library.sqlite"
+
+# Enum identifiers of library objects are ITEM_PREFIX + path + ITEM_SEPARATOR + name
+ITEM_PREFIX = "library:"
+ITEM_SEPARATOR = "|"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    indexed REAL NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS objects (
+    file TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    vertices INTEGER,
+    PRIMARY KEY (file, name)
+);
+CREATE TABLE IF NOT EXISTS vertex_groups (
+    file TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    object TEXT NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shape_keys (
+    file TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    object TEXT NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS objects_type ON objects (type, name);
+CREATE INDEX IF NOT EXISTS vertex_groups_object ON vertex_groups (file, object);
+CREATE INDEX IF NOT EXISTS shape_keys_object ON shape_keys (file, object);
+"""
+
+#-------------------------------------------------------------
+#   Index database
+#-------------------------------------------------------------
+
+def default_index_path(directory):
+    return os.path.join(directory, INDEX_NAME)
+
+def connect(index_path):
+    conn = sqlite3.connect(index_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+def blend_files(directory):
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(".blend"):
+                path = os.path.normpath(os.path.join(root, name))
+                stat = os.stat(path)
+                yield path, stat.st_mtime, stat.st_size
+
+def read_file(path):
+    # Links the file's objects into this session just long enough to read
+    # their metadata, returns [(name, type, vertices, groups, shape keys)]
+    with bpy.data.libraries.load(path, link=True) as (data_from, data_to):
+        data_to.objects = list(data_from.objects)
+
+    records = []
+    for obj in data_to.objects:
+        if obj is None or obj.type not in {'MESH', 'ARMATURE'}:
+            continue
+        if obj.type == 'MESH':
+            keys = obj.data.shape_keys
+            records.append((obj.name, obj.type, len(obj.data.vertices), [vg.name for vg in obj.vertex_groups],
+                            [key_block.name for key_block in keys.key_blocks] if keys else []))
+        else:
+            records.append((obj.name, obj.type, None, [], []))
+
+    for library in {obj.library for obj in data_to.objects if obj is not None and obj.library}:
+        bpy.data.libraries.remove(library)
+    return records
+
+def index_directory(directory, index_path=None):
+    # Brings the index up to date with directory, returns (read, removed, unchanged) file counts
+    directory = os.path.normpath(bpy.path.abspath(directory))
+    conn = connect(index_path or default_index_path(directory))
+    known = {path: (mtime, size) for path, mtime, size in conn.execute("SELECT path, mtime, size FROM files")}
+    found = {path: (mtime, size) for path, mtime, size in blend_files(directory)}
+
+    removed = [path for path in known if path not in found]
+    stale = [path for path, stamp in found.items() if known.get(path) != stamp]
+    with conn:
+        conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed + stale])
+
+    for i, path in enumerate(sorted(stale)):
+        start = time.perf_counter()
+        try:
+            records, error = read_file(path), None
+        except Exception as e:
+            records, error = [], f"{type(e).__name__}: {e}"
+        mtime, size = found[path]
+        with conn:
+            conn.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?)", (path, mtime, size, time.time(), error))
+            conn.executemany("INSERT INTO objects VALUES (?, ?, ?, ?)",
+                             [(path, name, obj_type, vertices) for name, obj_type, vertices, _g, _k in records])
+            conn.executemany("INSERT INTO vertex_groups VALUES (?, ?, ?)",
+                             [(path, name, group) for name, _t, _v, groups, _k in records for group in groups])
+            conn.executemany("INSERT INTO shape_keys VALUES (?, ?, ?)",
+                             [(path, name, key) for name, _t, _v, _g, keys in records for key in keys])
+        print(f"Library: [{i + 1}/{len(stale)}] {path}: {len(records)} objects "
+              f"in {time.perf_counter() - start:.1f} s" + (f" ({error})" if error else ""))
+
+    conn.close()
+    return len(stale), len(removed), len(found) - len(stale)
+
+def find_objects(index_path, obj_type=None):
+    # [(file, name, type, vertices)] sorted by name
+    if not os.path.exists(index_path):
+        return []
+    conn = connect(index_path)
+    try:
+        query = "SELECT file, name, type, vertices FROM objects"
+        rows = conn.execute(query + " WHERE type = ? ORDER BY name", (obj_type,)) if obj_type else \
+            conn.execute(query + " ORDER BY name")
+        return rows.fetchall()
+    finally:
+        conn.close()
+
+def object_details(index_path, path, name):
+    conn = connect(index_path)
+    try:
+        groups = [row[0] for row in conn.execute(
+            "SELECT name FROM vertex_groups WHERE file = ? AND object = ?", (path, name))]
+        keys = [row[0] for row in conn.execute(
+            "SELECT name FROM shape_keys WHERE file = ? AND object = ?", (path, name))]
+        return groups, keys
+    finally:
+        conn.close()
+
+#-------------------------------------------------------------
+#   Enum items
+#-------------------------------------------------------------
+
+# Items per (index path, object type), rebuilt when the index file changes.
+# Also keeps the enum strings referenced, as Blender requires.
+_items_cache = {}
+
+def library_directory(scene):
+    directory = getattr(scene, "library_directory", "")
+    return os.path.normpath(bpy.path.abspath(directory)) if directory else ""
+
+def library_stamp(scene):
+    # (index path, modification time) of the scene's library index, None
+    # when there is no index
+    directory = library_directory(scene)
+    if not directory:
+        return None
+    index_path = default_index_path(directory)
+    try:
+        return index_path, os.path.getmtime(index_path)
+    except OSError:
+        return None
+
+def library_items(scene, obj_type, exclude=()):
+    found = library_stamp(scene)
+    if found is None:
+        return []
+    index_path, stamp = found
+
+    key = (index_path, obj_type)
+    cached = _items_cache.get(key)
+    if cached is None or cached[0] != stamp:
+        items = []
+        for path, name, _type, vertices in find_objects(index_path, obj_type):
+            label = f"{name} ({os.path.splitext(os.path.basename(path))[0]})"
+            description = f"Append from {path}" + (f", {vertices} vertices" if vertices else "")
+            items.append((ITEM_PREFIX + path + ITEM_SEPARATOR + name, label, description))
+        cached = _items_cache[key] = (stamp, items)
+    if not exclude:
+        return cached[1]
+    exclude = set(exclude)
+    return [item for item in cached[1] if item[0].rsplit(ITEM_SEPARATOR, 1)[1] not in exclude]
+
+def invalidate_library_items():
+    _items_cache.clear()
+
+def is_library_item(identifier):
+    return identifier.startswith(ITEM_PREFIX)
+
+def parse_library_item(identifier):
+    path, name = identifier[len(ITEM_PREFIX):].rsplit(ITEM_SEPARATOR, 1)
+    return path, name
+
+def append_object(path, name, scene):
+    # Appends one object with the data it uses and links it to the scene
+    with bpy.data.libraries.load(path, link=False) as (data_from, data_to):
+        if name not in data_from.objects:
+            raise KeyError(f"'{name}' is no longer in {path}, rescan the library")
+        data_to.objects = [name]
+    obj = data_to.objects[0]
+
+    # Parents and armatures come along as dependencies, link them as well
+    related = [obj]
+    ancestor = obj.parent
+    while ancestor is not None:
+        related.append(ancestor)
+        ancestor = ancestor.parent
+    related += [mod.object for mod in getattr(obj, "modifiers", []) if mod.type == 'ARMATURE' and mod.object]
+    for ob in related:
+        if not ob.users_collection:
+            scene.collection.objects.link(ob)
+    return obj
+
+#-------------------------------------------------------------
+#   Background scan
+#-------------------------------------------------------------
+
+# The scan worker last started, so a file load can stop it
+_scan_process = None
+
+def start_background_scan(directory, blender=None):
+    global _scan_process
+    directory = os.path.normpath(bpy.path.abspath(directory))
+    log_path = os.path.join(bpy.app.tempdir or directory, "daztools_library_scan.log")
+    command = [
+        blender or bpy.app.binary_path or "blender", "--background", "--factory-startup",
+        "--python", os.path.abspath(__file__), "--", "--directory", directory,
+    ]
+    with open(log_path, "w", encoding="utf-8") as log:
+        _scan_process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+    return _scan_process
+
+def cancel_background_scan():
+    # Terminates the scan worker when it is still running, returns True if it was
+    global _scan_process
+    process, _scan_process = _scan_process, None
+    if process is None or process.poll() is not None:
+        return False
+    process.terminate()
+    try:
+        process.wait(timeout=5.0)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    return True
+
+def main(argv=None):
+    argv = sys.argv[sys.argv.index("--") + 1:] if argv is None and "--" in sys.argv else (argv or [])
+    parser = argparse.ArgumentParser(prog="library.py")
+    parser.add_argument("--directory", required=True, help="Library directory to scan")
+    parser.add_argument("--index", help=f"Index file, defaults to <directory>/{INDEX_NAME}")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    read, removed, unchanged = index_directory(args.directory, args.index)
+    print(f"Library: read {read}, removed {removed}, unchanged {unchanged} files "
+          f"in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
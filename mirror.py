@@ -0,0 +1,227 @@
+import bpy
+import re
+import numpy as np
+from mathutils import kdtree
+from . import profiling, weights, colors, transfer
+
+#-------------------------------------------------------------
+#   Mirror map
+#-------------------------------------------------------------
+
+# Vertices whose mirrored rest position is within this of another vertex pair up
+TOLERANCE = 0.0001
+
+# Which half is copied onto the other. Blender's +X is the character's left.
+DIRECTIONS = {'POSITIVE_X': 1.0, 'NEGATIVE_X': -1.0}
+
+# Mirror map per mesh, reused until the topology or the rest shape changes.
+# Entries are keyed by the topology and coordinate hashes, so a reused
+# pointer is safe.
+_mirror_cache = {}
+
+def rest_coords(mesh):
+    if mesh.shape_keys:
+        return transfer.key_coords(mesh.shape_keys.reference_key, len(mesh.vertices))
+    return transfer.mesh_coords(mesh)
+
+def mirror_map(mesh, tolerance=TOLERANCE):
+    # Index of the X-mirrored partner of every vertex, -1 where there is
+    # none. Vertices on the symmetry plane are their own partner.
+    co = rest_coords(mesh)
+    key = (transfer.topology_hash(mesh), hash(co.tobytes()), tolerance)
+    cached = _mirror_cache.get(mesh.as_pointer())
+    if cached and cached[0] == key:
+        return cached[1]
+
+    with profiling.span("mirror_map", mesh=mesh.name):
+        tree = kdtree.KDTree(len(co))
+        for i, point in enumerate(co.tolist()):
+            tree.insert(point, i)
+        tree.balance()
+
+        partners = np.full(len(co), -1, dtype=np.int32)
+        find = tree.find
+        for i, (x, y, z) in enumerate(co.tolist()):
+            _co, index, distance = find((-x, y, z))
+            if index is not None and distance <= tolerance:
+                partners[i] = index
+
+    _mirror_cache[mesh.as_pointer()] = (key, partners)
+    return partners
+
+def invalidate_mirror_maps():
+    _mirror_cache.clear()
+
+def mirror_targets(mesh, direction='POSITIVE_X', tolerance=TOLERANCE):
+    # (target vertices, their source partners) on the side being overwritten,
+    # symmetry plane and unpaired vertices excluded
+    partners = mirror_map(mesh, tolerance)
+    x = rest_coords(mesh)[:, 0] * DIRECTIONS[direction]
+    targets = np.flatnonzero((x < -tolerance) & (partners >= 0))
+    return targets, partners[targets]
+
+#-------------------------------------------------------------
+#   Side names
+#-------------------------------------------------------------
+
+# Daz bones use an l/r prefix ("lThighBend"), Blender rigs .L/_L suffixes
+SIDE_PATTERNS = [
+    (re.compile(r"^([lr])(?=[A-Z])"), {"l": "r", "r": "l"}),
+    (re.compile(r"([._ -])([LRlr])$"), {"L": "R", "R": "L", "l": "r", "r": "l"}),
+    (re.compile(r"(Left|Right|left|right)"), {"Left": "Right", "Right": "Left", "left": "right", "right": "left"}),
+]
+
+def mirror_name(name):
+    # Name of the other side's group, name itself when it has no side
+    for pattern, swap in SIDE_PATTERNS:
+        match = pattern.search(name)
+        if match:
+            side = match.group(match.lastindex)
+            start, end = match.span(match.lastindex)
+            return name[:start] + swap[side] + name[end:]
+    return name
+
+#-------------------------------------------------------------
+#   Symmetrize
+#-------------------------------------------------------------
+
+def symmetrize_weights(obj, direction='POSITIVE_X', tolerance=TOLERANCE):
+    # Target side weights of every group come from the partner vertex's
+    # weight in the mirrored group. Returns the number of groups written.
+    targets, sources = mirror_targets(obj.data, direction, tolerance)
+    if not len(targets) or not obj.vertex_groups:
+        return 0
+    for name in {mirror_name(vg.name) for vg in obj.vertex_groups}:
+        if obj.vertex_groups.get(name) is None:
+            obj.vertex_groups.new(name=name)
+
+    before, membership = weights.read_weights(obj)
+    swap = np.array([obj.vertex_groups[mirror_name(vg.name)].index for vg in obj.vertex_groups])
+    after = before.copy()
+    after[targets] = before[sources][:, swap]
+    return weights.write_changed_groups(obj, before, after, membership)
+
+def symmetrize_colors(obj, direction='POSITIVE_X', tolerance=TOLERANCE):
+    # Target side colors come from the partner vertex. Corner colors on the
+    # target side take the mean color of the partner's corners.
+    targets, sources = mirror_targets(obj.data, direction, tolerance)
+    mesh = obj.data
+    if not len(targets) or not mesh.color_attributes:
+        return 0
+    for attribute in mesh.color_attributes:
+        values = colors.read_colors(attribute)
+        if attribute.domain == 'POINT':
+            values[targets] = values[sources]
+        else:
+            point_values = colors.convert_domain(mesh, values, attribute.domain, 'POINT')
+            source_of = np.full(len(mesh.vertices), -1, dtype=np.int64)
+            source_of[targets] = sources
+            corners = source_of[colors.corner_vertices(mesh)]
+            mirrored = corners >= 0
+            values[mirrored] = point_values[corners[mirrored]]
+        colors.write_colors(attribute, values)
+    mesh.update()
+    return len(mesh.color_attributes)
+
+def relative_order(key_blocks):
+    # Key blocks with every relative key ahead of the keys relative to it
+    order = []
+    seen = set()
+    for key_block in key_blocks:
+        chain = []
+        while key_block.name not in seen:
+            seen.add(key_block.name)
+            chain.append(key_block)
+            key_block = key_block.relative_key
+        order.extend(reversed(chain))
+    return order
+
+def selected_keys(obj, keys='ALL'):
+    # Key names the Keys option of Symmetrize picks, None for every key
+    if keys != 'ACTIVE':
+        return None
+    return {obj.active_shape_key.name} if obj.active_shape_key else set()
+
+def written_keys(key, names=None):
+    # Names of the keys symmetrize_shapekeys writes: the keys in names, or
+    # every key but the reference when names is None, plus every key
+    # relative to one of them, relative keys first
+    reference = key.reference_key
+    written = []
+    for key_block in relative_order(key.key_blocks):
+        if key_block == reference or key_block.relative_key == key_block:
+            continue
+        if names is None or key_block.name in names or key_block.relative_key.name in written:
+            written.append(key_block.name)
+    return written
+
+def symmetrize_shapekeys(obj, direction='POSITIVE_X', tolerance=TOLERANCE, names=None):
+    # Target side offsets of the keys in names, every key when None, are
+    # the partner's offsets with X flipped. Relative keys are symmetrized
+    # first, keys relative to them keep their original offsets on top of
+    # the symmetrized relative key. Returns the number of keys written.
+    mesh = obj.data
+    if not mesh.shape_keys:
+        return 0
+    targets, sources = mirror_targets(mesh, direction, tolerance)
+    if not len(targets):
+        return 0
+    count = len(mesh.vertices)
+    flip = np.array([-1.0, 1.0, 1.0], dtype=np.float32)
+    key_blocks = mesh.shape_keys.key_blocks
+    relatives = {key_block.relative_key.name for key_block in key_blocks}
+    # Relative key name -> (coords before, coords after)
+    relative_coords = {}
+    written = written_keys(mesh.shape_keys, names)
+    for name in written:
+        key_block = key_blocks[name]
+        co = transfer.key_coords(key_block, count)
+        relative = key_block.relative_key
+        if relative.name not in relative_coords:
+            base = transfer.key_coords(relative, count)
+            relative_coords[relative.name] = (base, base)
+        before, after = relative_coords[relative.name]
+        original = co.copy() if name in relatives else None
+        delta = co - before
+        if names is None or name in names:
+            co[targets] = after[targets] + delta[sources] * flip
+        else:
+            # Only relative to a symmetrized key, its own offsets stay
+            co[targets] = after[targets] + delta[targets]
+        key_block.data.foreach_set("co", co.ravel())
+        if original is not None:
+            relative_coords[name] = (original, co)
+    mesh.update()
+    return len(written)
+
+SYMMETRIZE = {
+    'WEIGHTS': symmetrize_weights,
+    'COLORS': symmetrize_colors,
+    'SHAPE_KEYS': symmetrize_shapekeys,
+}
+
+def symmetrize(objects, data, direction='POSITIVE_X', tolerance=TOLERANCE, keys='ALL'):
+    # Runs the data's symmetrize on every mesh, returns [(object name, items written)]
+    result = []
+    for obj in objects:
+        if obj.type != 'MESH':
+            continue
+        with profiling.span("symmetrize", object=obj.name, data=data):
+            if data == 'SHAPE_KEYS':
+                written = symmetrize_shapekeys(obj, direction, tolerance, selected_keys(obj, keys))
+            else:
+                written = SYMMETRIZE[data](obj, direction, tolerance)
+            result.append((obj.name, written))
+    return result
+
+@bpy.app.handlers.persistent
+def _on_file_load(*args):
+    invalidate_mirror_maps()
+
+def register():
+    bpy.app.handlers.load_post.append(_on_file_load)
+
+def unregister():
+    if _on_file_load in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_file_load)
+    invalidate_mirror_maps()
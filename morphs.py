@@ -0,0 +1,220 @@
+import bpy
+import numpy as np
+from . import utils, profiling
+
+#-------------------------------------------------------------
+#   Morph preview session
+#-------------------------------------------------------------
+
+# Step direction of the Next/Previous buttons. Next walks up the key list.
+NEXT = -1
+PREVIOUS = 1
+
+class PreviewSession:
+    # Remembers the key pair shown last so stepping only resets that pair
+    # instead of clearing every key on both meshes
+
+    def __init__(self, obj, body):
+        self.obj = obj
+        self.body = body
+        self.names = key_names(obj)
+        self.body_names = key_names(body) if body and body.type == 'MESH' else []
+        body_map = {name: i for i, name in enumerate(self.body_names)}
+        # Clothing key index -> body key index, -1 where the body has no such key
+        self.body_index = [body_map.get(name, -1) for name in self.names]
+        self.current = None
+
+        utils.clear_shapekeys(obj)
+        if body != obj:
+            utils.clear_shapekeys(body)
+
+    def is_valid(self, obj, body):
+        # Added or removed keys on either mesh, or renamed keys where the
+        # next step lands, start a new session. Checks a handful of keys
+        # whatever the key count.
+        try:
+            if self.obj != obj or self.body != body or key_count(obj) != len(self.names):
+                return False
+            if key_count(body) != len(self.body_names):
+                return False
+            nearby = {i + d for i in (self.current, obj.active_shape_key_index) if i is not None
+                      for d in (-1, 0, 1)}
+            return all(self.matches(i) for i in nearby if 0 <= i < len(self.names))
+        except (AttributeError, ReferenceError):
+            return False
+
+    def matches(self, index):
+        # Names of the key pair at index are the ones the session was built with
+        for mesh, i in self.pairs(index):
+            names = self.names if mesh == self.obj else self.body_names
+            if mesh.data.shape_keys.key_blocks[i].name != names[i]:
+                return False
+        return True
+
+    def pairs(self, index):
+        yield self.obj, index
+        if self.body and self.body != self.obj and self.body_index[index] >= 0:
+            yield self.body, self.body_index[index]
+
+    def hide(self, index):
+        if not 0 <= index < len(self.names):
+            return
+        for mesh, i in self.pairs(index):
+            key_block = mesh.data.shape_keys.key_blocks[i]
+            if key_block.name not in utils.KEEP_KEYS:
+                key_block.value = 0.0
+
+    def show(self, index):
+        # Zero the previous pair, raise the new one and make it active on both meshes
+        if not 0 <= index < len(self.names):
+            return None
+        if self.current is not None and self.current != index:
+            self.hide(self.current)
+        for mesh, i in self.pairs(index):
+            mesh.data.shape_keys.key_blocks[i].value = 1.0
+            mesh.active_shape_key_index = i
+        self.current = index
+        profiling.count(shape_keys=2)
+        return self.names[index]
+
+    def step(self, offset):
+        active = self.obj.active_shape_key_index
+        if self.current is not None and self.current != active:
+            # Another key was picked in the list since the last step, step
+            # from it with neither pair left raised
+            self.hide(self.current)
+            self.hide(active)
+            self.current = None
+        start = self.current if self.current is not None else active
+        return self.show(start + offset)
+
+def key_count(obj):
+    if not obj or obj.type != 'MESH' or not obj.data.shape_keys:
+        return 0
+    return len(obj.data.shape_keys.key_blocks)
+
+def key_names(obj):
+    key = obj.data.shape_keys
+    return [key_block.name for key_block in key.key_blocks] if key else []
+
+_session = None
+
+def preview_session(obj, body):
+    # The running session when it still matches obj/body, otherwise a new one
+    global _session
+    if _session is None or not _session.is_valid(obj, body):
+        _session = PreviewSession(obj, body)
+    return _session
+
+def end_preview_session():
+    global _session
+    _session = None
+
+def enter_sculpt(obj):
+    # Mode and tool switches only happen when not sculpting already
+    if bpy.context.mode == 'SCULPT':
+        return
+    if bpy.context.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    bpy.ops.object.mode_set(mode='SCULPT')
+    bpy.ops.wm.tool_set_by_id(name="builtin_brush.Smooth")
+    obj.use_mesh_mirror_x = True
+
+#-------------------------------------------------------------
+#   Dead shape keys
+#-------------------------------------------------------------
+
+# Keys moving no vertex further than this from their relative key are dead
+MIN_OFFSET = 0.0001
+
+# Rough FBX cost of a morph target: per-shape node overhead plus index,
+# position and normal per moved vertex
+FBX_BYTES_PER_KEY = 512
+FBX_BYTES_PER_VERTEX = 4 + 3 * 8 + 3 * 8
+
+# Keys are read this many at a time to bound memory on large meshes
+KEY_CHUNK = 64
+
+def key_displacements(obj):
+    # Max offset of every key from its relative key and the number of
+    # vertices it moves, from bulk reads of the key coordinates
+    key_blocks = obj.data.shape_keys.key_blocks
+    count = len(obj.data.vertices)
+    index = {key_block.name: i for i, key_block in enumerate(key_blocks)}
+    relative = np.array([index[key_block.relative_key.name] for key_block in key_blocks])
+
+    reference = {}
+    def coords(i):
+        co = np.empty(count * 3, dtype=np.float32)
+        key_blocks[int(i)].data.foreach_get("co", co)
+        return co.reshape(-1, 3)
+
+    displacement = np.zeros(len(key_blocks), dtype=np.float32)
+    moved = np.zeros(len(key_blocks), dtype=np.int64)
+    for start in range(0, len(key_blocks), KEY_CHUNK):
+        chunk = range(start, min(start + KEY_CHUNK, len(key_blocks)))
+        co = np.stack([coords(i) for i in chunk])
+        for r in np.unique(relative[chunk.start:chunk.stop]):
+            if r not in reference:
+                reference[r] = co[r - start] if r in chunk else coords(r)
+        base = np.stack([reference[r] for r in relative[chunk.start:chunk.stop]])
+        offset = np.sqrt(((co - base) ** 2).sum(axis=2))
+        displacement[chunk.start:chunk.stop] = offset.max(axis=1) if count else 0.0
+        moved[chunk.start:chunk.stop] = (offset > 1e-6).sum(axis=1)
+    return displacement, moved
+
+def dead_shapekeys(obj, threshold=MIN_OFFSET, keep_tucked=False):
+    # [(key name, max offset, estimated FBX bytes)] of removable keys.
+    # keep_tucked leaves the tucked morphs alone while they are still flat.
+    if obj.type != 'MESH' or not obj.data.shape_keys:
+        return []
+    key = obj.data.shape_keys
+    displacement, moved = key_displacements(obj)
+    # Keys other keys are relative to change the result of those keys when removed
+    bases = {key_block.relative_key.name for key_block in key.key_blocks if key_block.relative_key != key_block}
+    protected = utils.KEEP_KEYS | utils.TUCKED_KEYS if keep_tucked else utils.KEEP_KEYS
+    return [(key_block.name, float(displacement[i]), FBX_BYTES_PER_KEY + int(moved[i]) * FBX_BYTES_PER_VERTEX)
+            for i, key_block in enumerate(key.key_blocks)
+            if displacement[i] <= threshold and key_block != key.reference_key
+            and key_block.name not in bases and key_block.name not in protected]
+
+def prune_shapekeys(objects, threshold=MIN_OFFSET, dry_run=False, keep_tucked=False):
+    # Find dead keys on every object, then remove them unless dry_run.
+    # Returns [(object name, [key names], bytes saved)]
+    report = []
+    with profiling.span("survey_keys"):
+        for obj in objects:
+            dead = dead_shapekeys(obj, threshold, keep_tucked)
+            report.append((obj, dead))
+
+    with profiling.span("remove_keys"):
+        if not dry_run:
+            for obj, dead in report:
+                key_blocks = obj.data.shape_keys.key_blocks if dead else []
+                for name, _offset, _size in dead:
+                    obj.shape_key_remove(key_blocks[name])
+                if dead:
+                    obj.active_shape_key_index = 0
+    profiling.count(shape_keys_pruned=sum(len(dead) for _obj, dead in report))
+
+    verb = "Would remove" if dry_run else "Removed"
+    result = []
+    for obj, dead in report:
+        saved = sum(size for _name, _offset, size in dead)
+        print(f"{verb} {len(dead)} shape keys from '{obj.name}' (~{saved / 1024.0:.1f} KB of FBX)")
+        for name, offset, _size in dead:
+            print(f"    {name}: max offset {offset * 1000.0:.3f} mm")
+        result.append((obj.name, [name for name, _offset, _size in dead], saved))
+    return result
+
+@bpy.app.handlers.persistent
+def _on_file_load(*args):
+    end_preview_session()
+
+def register():
+    bpy.app.handlers.load_post.append(_on_file_load)
+
+def unregister():
+    if _on_file_load in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_file_load)
+    end_preview_session()
@@ -1,5 +1,7 @@
 import bpy
-from . import utils
+import os
+import time
+from . import utils, transfer, export, profiling, weights, morphs, snapshots, library, colors, mirror
 
 #----------------------------------------------------------
 #   Viewport Tab
@@ -27,6 +29,16 @@ class DAZTOOLS_PT_Data(DAZTOOLS_PT_ToolsTab, bpy.types.Panel):
         layout.prop(context.scene, "female_anatomy_mesh_enum", text="Female Anatomy")
         layout.prop(context.scene, "male_anatomy_mesh_enum", text="Male Anatomy")
         layout.prop(context.scene, "paint_mesh_enum", text="Paint Mesh")
+        layout.separator()
+        row = layout.row(align=True)
+        row.prop(context.scene, "library_directory", text="Library")
+        row.operator("daztools.scan_library", text="", icon='FILE_REFRESH')
+        if DAZTOOLS_OT_ScanLibrary.running:
+            layout.label(text="Scanning library...", icon='SORTTIME')
+        elif context.scene.library_directory:
+            meshes = len(library.library_items(context.scene, 'MESH'))
+            armatures = len(library.library_items(context.scene, 'ARMATURE'))
+            layout.label(text=f"{meshes} meshes, {armatures} armatures indexed")
 
 class DAZTOOLS_PT_ClothingTools(DAZTOOLS_PT_ToolsTab, bpy.types.Panel):
     bl_label = "Clothing"
@@ -46,7 +58,36 @@ class DAZTOOLS_PT_ClothingTools(DAZTOOLS_PT_ToolsTab, bpy.types.Panel):
         layout.separator()
         layout.operator("daztools.reparent_to_armature", text="Reparent to Armature")
         layout.operator("daztools.copy_weights", text="Copy Weights")
-        layout.operator("daztools.export_clothing", text="Export")
+        layout.prop(context.scene, "export_path_template", text="Output")
+        layout.prop(context.scene, "export_limit_influences", text="Limit Influences")
+        if context.scene.export_limit_influences:
+            row = layout.row(align=True)
+            row.prop(context.scene, "export_max_influences", text="Max")
+            row.prop(context.scene, "export_influence_epsilon", text="Min Weight")
+            row.prop(context.scene, "export_quantize_weights", text="8-bit")
+        layout.prop(context.scene, "export_per_piece", text="One File per Piece")
+        if context.scene.export_per_piece:
+            layout.prop(context.scene, "export_collection", text="Collection")
+        layout.prop(context.scene, "export_in_background", text="Background Export")
+        layout.prop(context.scene, "export_use_cache", text="Skip Unchanged")
+        row = layout.row(align=True)
+        row.operator("daztools.export_clothing", text="Export")
+        row.operator("daztools.export_clothing", text="", icon='FILE_REFRESH').force = True
+        stats = export.cache_stats()
+        if stats["hits"] or stats["misses"]:
+            layout.label(text=f"Export cache: {stats['hits']} skipped, {stats['misses']} exported")
+
+        tasks = export.background_exports()
+        if tasks:
+            box = layout.box()
+            icons = {'RUNNING': 'SORTTIME', 'DONE': 'CHECKMARK', 'FAILED': 'ERROR'}
+            for task in tasks:
+                seconds = task.duration if task.status != 'RUNNING' else time.time() - task.start
+                box.label(text=f"{task.name}: {task.status.lower()} ({seconds:.0f} s)", icon=icons[task.status])
+                if task.error:
+                    box.label(text=task.error)
+            if len(tasks) > len(export.running_background_exports()):
+                box.operator("daztools.clear_background_exports", text="Clear Finished")
 
 class DAZTOOLS_PT_VertexWeightTools(DAZTOOLS_PT_ToolsTab, bpy.types.Panel):
     bl_label = "Vertex Weight Tools"
@@ -58,8 +99,32 @@ class DAZTOOLS_PT_VertexWeightTools(DAZTOOLS_PT_ToolsTab, bpy.types.Panel):
         layout = self.layout
         layout.prop(context.scene, "vertex_smooth_factor", text="Smooth Factor")
         layout.prop(context.scene, "vertex_smooth_iterations", text="Smooth Iterations")
+        layout.prop(context.scene, "vertex_smooth_groups", text="Groups")
+        layout.prop(context.scene, "vertex_smooth_normalize", text="Normalize")
+        layout.separator()
+        layout.operator("daztools.apply_vertex_smoothing", text="Apply Smoothing To Vertex Groups")
+
+        layout.separator()
+        row = layout.row(align=True)
+        row.prop(context.scene, "mirror_direction", text="")
+        row.prop(context.scene, "mirror_tolerance", text="Tolerance")
+        row = layout.row(align=True)
+        row.operator("daztools.symmetrize", text="Weights").data = 'WEIGHTS'
+        row.operator("daztools.symmetrize", text="Colors").data = 'COLORS'
+        row.operator("daztools.symmetrize", text="Shape Keys").data = 'SHAPE_KEYS'
+        props = row.operator("daztools.symmetrize", text="Active Key")
+        props.data = 'SHAPE_KEYS'
+        props.keys = 'ACTIVE'
         layout.separator()
-        layout.operator("daztools.apply_vertex_smoothing", text="Apply Smoothing To Vertex Group")
+        layout.prop(context.scene, "weight_stash_directory", text="Stashes")
+        for slot in ("A", "B"):
+            stash = snapshots.weight_stash(slot)
+            row = layout.row(align=True)
+            row.operator("daztools.stash_weights", text=f"Stash {slot}").slot = slot
+            row.operator("daztools.restore_weight_stash", text=f"Restore {slot}").slot = slot
+            if stash:
+                row.label(text=f"{len(stash)} objects, {sum(entry.nbytes for entry in stash.values()) / 1024.0:.0f} KB")
+        layout.operator("daztools.compare_weight_stashes", text="Compare A and B")
 
 class DAZTOOLS_PT_MorphTools(DAZTOOLS_PT_ToolsTab, bpy.types.Panel):
     bl_label = "Morph Tools"
@@ -69,16 +134,23 @@ class DAZTOOLS_PT_MorphTools(DAZTOOLS_PT_ToolsTab, bpy.types.Panel):
 
     def draw(self, context):
         layout = self.layout
-        layout.operator("daz.transfer_shapekeys", text="Transfer Shapekeys")
+        layout.prop(context.scene, "shapekey_transfer_threshold", text="Min Offset")
+        layout.operator("daztools.transfer_shapekeys", text="Transfer Shapekeys")
         layout.separator()
         row = layout.row()  
         row.operator("daztools.preview_morph", text="Preview Morph")
         row.operator("daztools.preview_next_morph", text="Preview Next")
         row.operator("daztools.preview_prev_morph", text="Preview Previous")
+        layout.operator("daztools.step_morphs", text="Step Through Morphs")
         layout.separator()
         layout.operator("daztools.clear_morphs", text="Clear Morphs")
         layout.operator("daztools.select_default_shapekey", text="Select Default Shapekey")
         layout.separator()
+        layout.prop(context.scene, "shapekey_prune_threshold", text="Dead Offset")
+        row = layout.row()
+        row.operator("daztools.prune_shapekeys", text="Report Dead Shapekeys").dry_run = True
+        row.operator("daztools.prune_shapekeys", text="Prune Dead Shapekeys").dry_run = False
+        layout.separator()
         layout.operator("daztools.add_tucked_base_morph", text="Add Tucked Base Morph")
         layout.operator("daztools.add_tucked_morphs", text="Add Tucked Morphs")
         layout.operator("daztools.next_tucked_morph", text="Next Tucked Morph")
@@ -93,6 +165,8 @@ class DAZTOOLS_PT_VertexColorTools(DAZTOOLS_PT_ToolsTab, bpy.types.Panel):
         layout = self.layout
         layout.operator("daztools.copy_vertex_paint", text="Copy Vertex Paint")
         layout.operator("daztools.copy_male_gens_paint", text="Copy Male Gens Paint")
+        layout.prop(context.scene, "paint_channel_map", text="Channels")
+        layout.prop(context.scene, "paint_byte_color", text="Byte Color")
         layout.operator("daztools.merge_paint_groups", text="Merge Paint Groups")
 
 class DAZTOOLS_PT_DebugTools(DAZTOOLS_PT_ToolsTab, bpy.types.Panel):
@@ -102,12 +176,193 @@ class DAZTOOLS_PT_DebugTools(DAZTOOLS_PT_ToolsTab, bpy.types.Panel):
 
     def draw(self, context):
         layout = self.layout
+        scene = context.scene
         layout.operator("daztools.print_vertex_weight", text="Print Vertex Weight")
+        layout.operator("daztools.group_statistics", text="Vertex Group Statistics", icon='FILE_REFRESH')
+        if scene.daztools_group_stats_object:
+            layout.label(text=f"Groups of '{scene.daztools_group_stats_object}' (max, mean, count)")
+            layout.template_list("DAZTOOLS_UL_GroupStats", "", scene, "daztools_group_stats",
+                                 scene, "daztools_group_stats_index", rows=8)
+            if 0 <= scene.daztools_group_stats_index < len(scene.daztools_group_stats):
+                stat = scene.daztools_group_stats[scene.daztools_group_stats_index]
+                row = layout.row(align=True)
+                for bin_count in stat.histogram:
+                    row.label(text=str(bin_count))
+
+        layout.separator()
+        layout.prop(scene, "scheduler_workers", text="Worker Threads")
+        layout.prop(scene, "use_snapshots", text="Snapshots Instead Of Undo")
+        layout.prop(scene, "snapshot_budget", text="Snapshot Budget (MB)")
+        recent = snapshots.recent_snapshots()
+        if recent:
+            layout.label(text=f"Snapshots: {snapshots.memory_used() / 1048576.0:.1f} MB")
+            for snapshot_id, snapshot in recent[:5]:
+                row = layout.row()
+                row.label(text=f"{snapshot.label} ({time.strftime('%H:%M:%S', time.localtime(snapshot.time))})")
+                row.operator("daztools.restore_snapshot", text="", icon='LOOP_BACK').snapshot_id = snapshot_id
+
+        layout.separator()
+        layout.prop(context.scene, "profile_operators", text="Profile Operators")
+        if context.scene.profile_operators:
+            layout.prop(context.scene, "profile_directory", text="Traces")
+
+        for run in profiling.recent_runs():
+            box = layout.box()
+            box.label(text=f"{run.name}: {run.duration * 1000.0:.0f} ms, "
+                           f"peak {run.peak_memory / 1048576.0:.1f} MB", icon='TIME')
+            for name, seconds in run.top_spans():
+                box.label(text=f"    {name}: {seconds * 1000.0:.0f} ms")
+            if run.counts:
+                box.label(text="    " + ", ".join(f"{key} {value}" for key, value in run.counts.items()))
+
+#----------------------------------------------------------
+#   Lists
+#----------------------------------------------------------
+
+class DAZTOOLS_PG_GroupStat(bpy.types.PropertyGroup):
+    max_weight: bpy.props.FloatProperty(name="Max")
+    mean_weight: bpy.props.FloatProperty(name="Mean")
+    count: bpy.props.IntProperty(name="Count")
+    histogram: bpy.props.IntVectorProperty(name="Histogram", size=weights.HISTOGRAM_BINS)
+
+class DAZTOOLS_UL_GroupStats(bpy.types.UIList):
+    sort_key: bpy.props.EnumProperty(
+        name="Sort By",
+        items=[
+            ('NAME', "Name", "Sort by group name"),
+            ('MAX', "Max", "Sort by maximum weight"),
+            ('MEAN', "Mean", "Sort by mean non-zero weight"),
+            ('COUNT', "Count", "Sort by number of weighted vertices"),
+        ],
+        default='MAX'
+    )
+
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+        row = layout.row(align=True)
+        row.label(text=item.name, icon='GROUP_VERTEX')
+        row.label(text=f"{item.max_weight:.4f}")
+        row.label(text=f"{item.mean_weight:.4f}")
+        row.label(text=str(item.count))
+
+    def draw_filter(self, context, layout):
+        row = layout.row(align=True)
+        row.prop(self, "filter_name", text="")
+        row.prop(self, "sort_key", text="")
+        row.prop(self, "use_filter_sort_reverse", text="", icon='SORT_DESC')
+
+    def filter_items(self, context, data, propname):
+        items = getattr(data, propname)
+        helper = bpy.types.UI_UL_list
+        flags = helper.filter_items_by_name(self.filter_name, self.bitflag_filter_item, items, "name") \
+            if self.filter_name else []
+        if self.sort_key == 'NAME':
+            order = helper.sort_items_by_name(items, "name")
+        else:
+            attr = {'MAX': "max_weight", 'MEAN': "mean_weight", 'COUNT': "count"}[self.sort_key]
+            order = helper.sort_items_helper([(i, getattr(item, attr)) for i, item in enumerate(items)],
+                                             key=lambda entry: entry[1])
+        return flags, order
+
+#----------------------------------------------------------
+#   Snapshot targets
+#----------------------------------------------------------
+
+def morph_objects(self, context):
+    scene = context.scene
+    names = (scene.primary_mesh_enum, scene.female_anatomy_mesh_enum, scene.male_anatomy_mesh_enum)
+    return [context.active_object] + [bpy.data.objects.get(name) for name in names]
+
+def paint_objects(self, context):
+    return [context.active_object, bpy.data.objects.get(context.scene.male_anatomy_mesh_enum)] + \
+        list(context.selected_objects)
+
+def selected_meshes(self, context):
+    return list(context.selected_objects) or [context.active_object]
+
+def symmetrize_kinds(self, context):
+    # Only the data being symmetrized is captured, of shape keys only the
+    # keys it writes
+    def written_keys(obj):
+        return mirror.written_keys(obj.data.shape_keys, mirror.selected_keys(obj, self.keys))
+    return dict(shapekeys=False, weights=self.data == 'WEIGHTS', colors=self.data == 'COLORS',
+                key_coords=written_keys if self.data == 'SHAPE_KEYS' else False)
+
+def weight_stash_path(context, slot):
+    directory = context.scene.weight_stash_directory
+    return os.path.join(bpy.path.abspath(directory), f"weights_{bpy.path.clean_name(slot)}.npz") if directory else ""
+
+def find_weight_stash(context, slot):
+    # The stash in memory, or the one in the stash directory, which is kept
+    # in memory once loaded
+    stash = snapshots.weight_stash(slot)
+    path = weight_stash_path(context, slot)
+    if stash is None and path and os.path.exists(path):
+        stash = snapshots.load_weight_stash(path, slot)
+    return stash
+
+def stash_objects(self, context):
+    stash = find_weight_stash(context, self.slot) or {}
+    return [bpy.data.objects.get(name) for name in stash]
 
 #----------------------------------------------------------
 #   Operators
 #----------------------------------------------------------
 
+class DAZTOOLS_OT_ScanLibrary(bpy.types.Operator):
+    bl_label = "Scan Library"
+    bl_idname = "daztools.scan_library"
+    bl_parent_id = "DAZTOOLS_PT_Data"
+    bl_description = "Index the objects of every .blend file in the library directory, only changed files are read"
+    bl_options = {'REGISTER'}
+
+    running = False
+
+    def start(self, context):
+        directory = library.library_directory(context.scene)
+        if not directory or not os.path.isdir(directory):
+            self.report({'ERROR'}, "Library directory not found")
+            return None
+        return library.start_background_scan(directory)
+
+    def execute(self, context):
+        process = self.start(context)
+        if process is None:
+            return {'CANCELLED'}
+        process.wait()
+        return self.finish(context, process)
+
+    def invoke(self, context, event):
+        if DAZTOOLS_OT_ScanLibrary.running:
+            self.report({'ERROR'}, "A library scan is already running")
+            return {'CANCELLED'}
+        self.process = self.start(context)
+        if self.process is None:
+            return {'CANCELLED'}
+        self.timer = context.window_manager.event_timer_add(0.5, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        DAZTOOLS_OT_ScanLibrary.running = True
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type != 'TIMER' or self.process.poll() is None:
+            return {'PASS_THROUGH'}
+        context.window_manager.event_timer_remove(self.timer)
+        DAZTOOLS_OT_ScanLibrary.running = False
+        for area in context.screen.areas if context.screen else []:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+        return self.finish(context, self.process)
+
+    def finish(self, context, process):
+        library.invalidate_library_items()
+        utils.invalidate_object_index()
+        if process.returncode != 0:
+            self.report({'ERROR'}, f"Library scan failed with exit code {process.returncode}")
+            return {'CANCELLED'}
+        meshes = len(library.library_items(context.scene, 'MESH'))
+        self.report({'INFO'}, f"Library indexed, {meshes} meshes available")
+        return {'FINISHED'}
+
 class DAZTOOLS_OT_ReparentToArmature(bpy.types.Operator):
     bl_label = "Reparent to Armature"
     bl_idname = "daztools.reparent_to_armature"
@@ -115,6 +370,7 @@ class DAZTOOLS_OT_ReparentToArmature(bpy.types.Operator):
     bl_description = "Clear current parents and reparent selected objects to chosen armature"
     bl_options = {'REGISTER', 'UNDO'}
 
+    @profiling.traced
     def execute(self, context):
         selected_armature_name = context.scene.primary_armature_enum
         selected_armature = bpy.data.objects.get(selected_armature_name)
@@ -128,23 +384,18 @@ class DAZTOOLS_OT_ReparentToArmature(bpy.types.Operator):
             self.report({'ERROR'}, "There were no selected objects")
             return {'CANCELLED'}
 
-        prev_armature = None
-
-        for obj in clothing_objects:
-            for mod in obj.modifiers:
-                if obj != selected_armature:
-                    obj.parent = None  # Clear parent
-                    obj.parent = selected_armature
-                if mod.type == 'ARMATURE':
-                    prev_armature = mod.object
-                    mod.object = selected_armature
-                if mod.type == 'SUBSURF':
-                    obj.modifiers.remove(mod)
+        with profiling.span("reparent", objects=len(clothing_objects)):
+            prev_armatures = utils.reparent_objects(clothing_objects, selected_armature)
 
-        if prev_armature is not None:
-            utils.delete_hierarchy(prev_armature)
+        # Never delete the target rig, or clothing still parented under an old one
+        prev_armatures = [arm for arm in prev_armatures if selected_armature not in utils.hierarchy(arm)]
+        with profiling.span("delete_hierarchy"):
+            freed = utils.delete_hierarchies(prev_armatures, keep=clothing_objects)
+        context.view_layer.update()
 
-        self.report({'INFO'}, f"Reparented {len(clothing_objects)} objects to '{selected_armature_name}'")
+        self.report({'INFO'}, f"Reparented {len(clothing_objects)} objects to '{selected_armature_name}' "
+                              f"(removed {freed['objects']} objects, {freed['meshes']} meshes, "
+                              f"{freed['armatures']} armatures)")
         return {'FINISHED'}
     
 class DAZTOOLS_OT_CopyWeights(bpy.types.Operator):
@@ -154,13 +405,15 @@ class DAZTOOLS_OT_CopyWeights(bpy.types.Operator):
     bl_description = "Copy weights from chosen mesh to selected objects"
     bl_options = {'REGISTER', 'UNDO'}
 
+    @profiling.traced
     def execute(self, context):
         selected_mesh_name = context.scene.primary_mesh_enum
         selected_mesh = bpy.data.objects.get(selected_mesh_name)
         clothing_objects = context.selected_objects
 
         if bpy.context.mode != 'OBJECT':
-            bpy.ops.object.mode_set(mode='OBJECT')
+            with profiling.span("mode_set"):
+                bpy.ops.object.mode_set(mode='OBJECT')
 
         if not selected_mesh or selected_mesh.type != 'MESH':
             self.report({'ERROR'}, "Valid mesh not selected")
@@ -170,163 +423,211 @@ class DAZTOOLS_OT_CopyWeights(bpy.types.Operator):
             self.report({'ERROR'}, "There were no selected objects")
             return {'CANCELLED'}
         
-        for obj in clothing_objects:
-            obj.vertex_groups.clear()
-            mod = obj.modifiers.new(name="CopyWeights", type='DATA_TRANSFER')
-            mod.object = selected_mesh
-            mod.use_vert_data = True
-            mod.data_types_verts = {'VGROUP_WEIGHTS'}
-            mod.vert_mapping = 'POLYINTERP_NEAREST'
-
-            bpy.context.view_layer.objects.active = obj
-            bpy.ops.object.datalayout_transfer(modifier="CopyWeights")
-            bpy.ops.object.modifier_apply(modifier=mod.name)
-            
-        utils.prune_vertex_groups(clothing_objects)
-
-        self.report({'INFO'}, f"Copied weights from '{selected_mesh_name}' to {len(clothing_objects)} objects")
+        profiling.count(objects=len(clothing_objects), source_vertices=len(selected_mesh.data.vertices),
+                        source_groups=len(selected_mesh.vertex_groups))
+        transfer.transfer_weights(selected_mesh, clothing_objects, context.scene.scheduler_workers)
+
+        timings = utils.prune_vertex_groups(clothing_objects)
+        pruned = sum(removed for _name, removed, _seconds in timings)
+        prune_time = sum(seconds for _name, _removed, seconds in timings)
+
+        self.report({'INFO'}, f"Copied weights from '{selected_mesh_name}' to {len(clothing_objects)} objects "
+                              f"(pruned {pruned} empty groups in {prune_time * 1000.0:.0f} ms)")
         return {'FINISHED'}
     
 class DAZTOOLS_OT_ApplyVertexGroupSmoothing(bpy.types.Operator):
     bl_label = "Apply Vertex Weight Smoothing"
     bl_idname = "daztools.apply_vertex_smoothing"
     bl_parent_id = "DAZTOOLS_PT_VertexWeightTools"
-    bl_description = "Apply smoothing to the active vertex group"
+    bl_description = "Smooth vertex group weights of the selected objects without leaving object mode"
+    bl_options = {'REGISTER'}
+
+    @profiling.traced
+    @snapshots.captures(selected_meshes, shapekeys=False, weights=True)
+    def execute(self, context):
+        scene = context.scene
+        objects = [obj for obj in context.selected_objects if obj.type == 'MESH']
+        if not objects and context.active_object and context.active_object.type == 'MESH':
+            objects = [context.active_object]
+
+        if not objects:
+            self.report({'ERROR'}, "No mesh selected")
+            return {'CANCELLED'}
+
+        if bpy.context.mode == 'EDIT_MESH':
+            with profiling.span("mode_set"):
+                bpy.ops.object.mode_set(mode='OBJECT')
+
+        smoothed = 0
+        for obj in objects:
+            smoothed += weights.smooth_vertex_groups(
+                obj,
+                mode=scene.vertex_smooth_groups,
+                factor=scene.vertex_smooth_factor,
+                iterations=scene.vertex_smooth_iterations,
+                normalize=scene.vertex_smooth_normalize,
+            )
+            obj.data.update()
+
+        self.report({'INFO'}, f"Smoothed {smoothed} vertex groups on {len(objects)} objects")
+        return {'FINISHED'}
+    
+class DAZTOOLS_OT_TransferShapekeys(bpy.types.Operator):
+    bl_label = "Transfer Shapekeys"
+    bl_idname = "daztools.transfer_shapekeys"
+    bl_parent_id = "DAZTOOLS_PT_MorphTools"
+    bl_description = "Copy every shape key of the chosen mesh to the selected objects"
     bl_options = {'REGISTER', 'UNDO'}
 
+    @profiling.traced
     def execute(self, context):
-        obj = bpy.context.active_object
+        selected_mesh_name = context.scene.primary_mesh_enum
+        selected_mesh = bpy.data.objects.get(selected_mesh_name)
+        clothing_objects = [obj for obj in context.selected_objects if obj.type == 'MESH' and obj != selected_mesh]
 
-        smooth_factor = bpy.context.scene.vertex_smooth_factor
-        smooth_iterations = bpy.context.scene.vertex_smooth_iterations
+        if bpy.context.mode != 'OBJECT':
+            with profiling.span("mode_set"):
+                bpy.ops.object.mode_set(mode='OBJECT')
 
-        if obj and obj.type == 'MESH':
-            vg = obj.vertex_groups.active
-            if vg:
-                bpy.ops.object.mode_set(mode='WEIGHT_PAINT')
-        
-        # Apply smoothing to the active vertex group
-        bpy.ops.object.vertex_group_smooth(
-            group_select_mode='ACTIVE',
-            factor=smooth_factor,        # Strength of smoothing (0–1)
-            repeat=smooth_iterations     # Number of iterations
-        )
+        if not selected_mesh or selected_mesh.type != 'MESH':
+            self.report({'ERROR'}, "Valid mesh not selected")
+            return {'CANCELLED'}
 
+        if not clothing_objects:
+            self.report({'ERROR'}, "There were no selected objects")
+            return {'CANCELLED'}
+
+        written, skipped = transfer.transfer_shapekeys(selected_mesh, clothing_objects,
+                                                       context.scene.shapekey_transfer_threshold,
+                                                       context.scene.scheduler_workers)
+
+        self.report({'INFO'}, f"Transferred {written} shape keys from '{selected_mesh_name}' to "
+                              f"{len(clothing_objects)} objects ({skipped} negligible skipped)")
         return {'FINISHED'}
-    
+
 class DAZTOOLS_OT_PreviewMorph(bpy.types.Operator):
     bl_label = "Preview Morph"
     bl_idname = "daztools.preview_morph"
     bl_parent_id = "DAZTOOLS_PT_MorphTools"
     bl_description = "Preview the current morph target"
-    bl_options = {'REGISTER', 'UNDO'}
+    bl_options = {'REGISTER'}
 
+    @profiling.traced
+    @snapshots.captures(morph_objects)
     def execute(self, context):
         obj = bpy.context.active_object
         selected_mesh_name = context.scene.primary_mesh_enum
         selected_mesh = bpy.data.objects.get(selected_mesh_name)
 
-        if bpy.context.mode != 'OBJECT':
-            bpy.ops.object.mode_set(mode='OBJECT')
-
-        if obj and obj.data.shape_keys:
-            active_key = obj.active_shape_key  
-
-        bpy.ops.object.mode_set(mode='SCULPT')
-        bpy.ops.wm.tool_set_by_id(name="builtin_brush.Smooth")
-        obj.use_mesh_mirror_x = True
-
-        active_key.value = 1.0
-        mesh_key = selected_mesh.data.shape_keys.key_blocks.get(active_key.name)
-        mesh_key.value = 1.0
+        if not obj or obj.type != 'MESH' or not obj.data.shape_keys:
+            self.report({'ERROR'}, "No object with shape keys selected")
+            return {'CANCELLED'}
 
-        selected_mesh.active_shape_key_index = utils.get_shapekey_index(selected_mesh, mesh_key)
+        session = morphs.preview_session(obj, selected_mesh)
+        morphs.enter_sculpt(obj)
+        session.show(obj.active_shape_key_index)
 
         return {'FINISHED'}
-    
+
 class DAZTOOLS_OT_PreviewNextMorph(bpy.types.Operator):
     bl_label = "Preview Next Morph"
     bl_idname = "daztools.preview_next_morph"
     bl_parent_id = "DAZTOOLS_PT_MorphTools"
     bl_description = "Preview the next morph target"
-    bl_options = {'REGISTER', 'UNDO'}
+    bl_options = {'REGISTER'}
 
+    @profiling.traced
+    @snapshots.captures(morph_objects)
     def execute(self, context):
         obj = bpy.context.active_object
         selected_mesh_name = context.scene.primary_mesh_enum
         selected_mesh = bpy.data.objects.get(selected_mesh_name)
 
-        if bpy.context.mode != 'OBJECT':
-            bpy.ops.object.mode_set(mode='OBJECT')
-
-        if obj and obj.data.shape_keys:
-            active_key = obj.active_shape_key
-            active_key_index = obj.active_shape_key_index
-            prev_key = obj.data.shape_keys.key_blocks[active_key_index - 1]
-
-        utils.clear_shapekeys(obj)
-        utils.clear_shapekeys(selected_mesh)
-
-        bpy.ops.object.mode_set(mode='SCULPT')
-        bpy.ops.wm.tool_set_by_id(name="builtin_brush.Smooth")
-        obj.use_mesh_mirror_x = True
+        if not obj or obj.type != 'MESH' or not obj.data.shape_keys:
+            self.report({'ERROR'}, "No object with shape keys selected")
+            return {'CANCELLED'}
 
-        prev_key.value = 1.0
-        mesh_key = selected_mesh.data.shape_keys.key_blocks.get(prev_key.name)
-        mesh_key.value = 1.0
+        session = morphs.preview_session(obj, selected_mesh)
+        morphs.enter_sculpt(obj)
+        if session.step(morphs.NEXT) is None:
+            self.report({'ERROR'}, "No next morph")
+            return {'CANCELLED'}
 
-        obj.active_shape_key_index = utils.get_shapekey_index(obj, prev_key)
-        selected_mesh.active_shape_key_index = utils.get_shapekey_index(selected_mesh, mesh_key)
-        
         return {'FINISHED'}
-    
+
 class DAZTOOLS_OT_PreviewPreviousMorph(bpy.types.Operator):
     bl_label = "Preview Previous Morph"
     bl_idname = "daztools.preview_prev_morph"
     bl_parent_id = "DAZTOOLS_PT_MorphTools"
     bl_description = "Preview the previous morph target"
-    bl_options = {'REGISTER', 'UNDO'}
+    bl_options = {'REGISTER'}
 
+    @profiling.traced
+    @snapshots.captures(morph_objects)
     def execute(self, context):
         obj = bpy.context.active_object
         selected_mesh_name = context.scene.primary_mesh_enum
         selected_mesh = bpy.data.objects.get(selected_mesh_name)
 
-        if bpy.context.mode != 'OBJECT':
-            bpy.ops.object.mode_set(mode='OBJECT')
+        if not obj or obj.type != 'MESH' or not obj.data.shape_keys:
+            self.report({'ERROR'}, "No object with shape keys selected")
+            return {'CANCELLED'}
 
-        if obj and obj.data.shape_keys:
-            active_key = obj.active_shape_key
-            active_key_index = obj.active_shape_key_index
-            if (active_key_index + 1 < len(obj.data.shape_keys.key_blocks)):
-                next_key = obj.data.shape_keys.key_blocks[active_key_index + 1]
-            else:
-                self.report({'ERROR'}, "No previous morph")
-                return {'CANCELLED'}
+        session = morphs.preview_session(obj, selected_mesh)
+        morphs.enter_sculpt(obj)
+        if session.step(morphs.PREVIOUS) is None:
+            self.report({'ERROR'}, "No previous morph")
+            return {'CANCELLED'}
 
-        utils.clear_shapekeys(obj)
-        utils.clear_shapekeys(selected_mesh)
+        return {'FINISHED'}
 
-        bpy.ops.object.mode_set(mode='SCULPT')
-        bpy.ops.wm.tool_set_by_id(name="builtin_brush.Smooth")
-        obj.use_mesh_mirror_x = True
+class DAZTOOLS_OT_StepMorphs(bpy.types.Operator):
+    bl_label = "Step Through Morphs"
+    bl_idname = "daztools.step_morphs"
+    bl_parent_id = "DAZTOOLS_PT_MorphTools"
+    bl_description = "Sculpt while stepping through morphs, Left/Right arrows step, Esc or Enter stops"
+    bl_options = {'REGISTER'}
 
-        next_key.value = 1.0
-        mesh_key = selected_mesh.data.shape_keys.key_blocks.get(next_key.name)
-        mesh_key.value = 1.0
+    def invoke(self, context, event):
+        obj = context.active_object
+        selected_mesh = bpy.data.objects.get(context.scene.primary_mesh_enum)
 
-        obj.active_shape_key_index = utils.get_shapekey_index(obj, next_key)
-        selected_mesh.active_shape_key_index = utils.get_shapekey_index(selected_mesh, mesh_key)
-        
-        return {'FINISHED'}
+        if not obj or obj.type != 'MESH' or not obj.data.shape_keys:
+            self.report({'ERROR'}, "No object with shape keys selected")
+            return {'CANCELLED'}
+
+        self.session = morphs.preview_session(obj, selected_mesh)
+        morphs.enter_sculpt(obj)
+        self.show_header(context, self.session.show(obj.active_shape_key_index))
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def show_header(self, context, name):
+        if context.area and name:
+            context.area.header_text_set(f"Morph: {name}    Left/Right: step    Esc/Enter: done")
+
+    def modal(self, context, event):
+        if event.value == 'PRESS' and event.type in {'LEFT_ARROW', 'RIGHT_ARROW'}:
+            if not self.session.is_valid(self.session.obj, self.session.body):
+                self.session = morphs.preview_session(self.session.obj, self.session.body)
+            offset = morphs.NEXT if event.type == 'RIGHT_ARROW' else morphs.PREVIOUS
+            self.show_header(context, self.session.step(offset))
+            return {'RUNNING_MODAL'}
+        if event.type in {'ESC', 'RET'}:
+            if context.area:
+                context.area.header_text_set(None)
+            return {'FINISHED'}
+        return {'PASS_THROUGH'}
 
 class DAZTOOLS_OT_ClearMorphs(bpy.types.Operator):
     bl_label = "Clear Morphs"
     bl_idname = "daztools.clear_morphs"
     bl_parent_id = "DAZTOOLS_PT_MorphTools"
     bl_description = "Clear all morphs"
-    bl_options = {'REGISTER', 'UNDO'}
+    bl_options = {'REGISTER'}
 
+    @profiling.traced
+    @snapshots.captures(morph_objects)
     def execute(self, context):
         obj = bpy.context.active_object
         selected_mesh_name = context.scene.primary_mesh_enum
@@ -344,10 +645,9 @@ class DAZTOOLS_OT_ClearMorphs(bpy.types.Operator):
         if bpy.context.mode != 'OBJECT':
             bpy.ops.object.mode_set(mode='OBJECT')
 
-        obj.active_shape_key_index = 0
-        selected_mesh.active_shape_key_index = 0
-        female_mesh.active_shape_key = 0
-        male_mesh.active_shape_key = 0
+        for mesh in (obj, selected_mesh, female_mesh, male_mesh):
+            if mesh:
+                mesh.active_shape_key_index = 0
 
         return {'FINISHED'}
 
@@ -356,8 +656,10 @@ class DAZTOOLS_OT_SelectDefaultShapekey(bpy.types.Operator):
     bl_idname = "daztools.select_default_shapekey"
     bl_parent_id = "DAZTOOLS_PT_MorphTools"
     bl_description = "Select Default Shapekey"
-    bl_options = {'REGISTER', 'UNDO'}
+    bl_options = {'REGISTER'}
 
+    @profiling.traced
+    @snapshots.captures(morph_objects)
     def execute(self, context):
         obj = bpy.context.active_object
         selected_mesh_name = context.scene.primary_mesh_enum
@@ -368,6 +670,46 @@ class DAZTOOLS_OT_SelectDefaultShapekey(bpy.types.Operator):
 
         return {'FINISHED'}
 
+class DAZTOOLS_OT_PruneShapekeys(bpy.types.Operator):
+    bl_label = "Prune Dead Shapekeys"
+    bl_idname = "daztools.prune_shapekeys"
+    bl_parent_id = "DAZTOOLS_PT_MorphTools"
+    bl_description = "Remove shape keys of the selected objects that move no vertex by more than the dead offset"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    dry_run: bpy.props.BoolProperty(
+        name="Dry Run",
+        description="Only report the keys that would be removed",
+        default=False
+    )
+    keep_tucked: bpy.props.BoolProperty(
+        name="Keep Tucked Morphs",
+        description="Keep tucked morphs that haven't been sculpted yet",
+        default=False
+    )
+
+    @profiling.traced
+    def execute(self, context):
+        objects = [obj for obj in context.selected_objects if obj.type == 'MESH' and obj.data.shape_keys]
+
+        if not objects:
+            self.report({'ERROR'}, "No object with shape keys selected")
+            return {'CANCELLED'}
+
+        if bpy.context.mode != 'OBJECT':
+            with profiling.span("mode_set"):
+                bpy.ops.object.mode_set(mode='OBJECT')
+
+        report = morphs.prune_shapekeys(objects, context.scene.shapekey_prune_threshold, self.dry_run,
+                                        self.keep_tucked)
+        removed = sum(len(names) for _name, names, _saved in report)
+        saved = sum(saved for _name, _names, saved in report)
+
+        verb = "Found" if self.dry_run else "Pruned"
+        self.report({'INFO'}, f"{verb} {removed} dead shape keys on {len(objects)} objects "
+                              f"(~{saved / 1024.0:.1f} KB of FBX), see console for details")
+        return {'FINISHED'}
+
 class DAZTOOLS_OT_CopyVertexPaint(bpy.types.Operator):
     bl_label = "Copy Vertex Paint"
     bl_idname = "daztools.copy_vertex_paint"
@@ -375,6 +717,7 @@ class DAZTOOLS_OT_CopyVertexPaint(bpy.types.Operator):
     bl_description = "Copy vertex paint"
     bl_options = {'REGISTER', 'UNDO'}
 
+    @profiling.traced
     def execute(self, context):
         obj = bpy.context.active_object
         paint_mesh_name = context.scene.paint_mesh_enum
@@ -394,18 +737,13 @@ class DAZTOOLS_OT_CopyVertexPaint(bpy.types.Operator):
             self.report({'ERROR'}, "There was no selected object")
             return {'CANCELLED'}
         
-        mod = obj.modifiers.new(name="CopyVertexColors", type='DATA_TRANSFER')
-        mod.object = paint_mesh
-        mod.use_vert_data = True
-        mod.data_types_verts = {'COLOR_VERTEX'}
-        mod.vert_mapping = 'POLYINTERP_NEAREST'
-
+        # The binding to the paint mesh is kept on obj and reused until either mesh changes
         bpy.context.view_layer.objects.active = obj
-        bpy.ops.object.datalayout_transfer(modifier="CopyVertexColors")
-        bpy.ops.object.modifier_apply(modifier=mod.name)
+        transfer.transfer_colors(paint_mesh, [obj])
 
         if bpy.context.mode != 'VERTEX_PAINT':
-            bpy.ops.object.mode_set(mode='VERTEX_PAINT')
+            with profiling.span("mode_set"):
+                bpy.ops.object.mode_set(mode='VERTEX_PAINT')
             bpy.ops.wm.tool_set_by_id(name="builtin_brush.Blur")
             obj.use_mesh_mirror_x = True
             obj.data.color_attributes.active_color = obj.data.color_attributes.get("Attribute")
@@ -421,6 +759,7 @@ class DAZTOOLS_OT_CopyMaleGensPaint(bpy.types.Operator):
     bl_description = "Copy male gens paint"
     bl_options = {'REGISTER', 'UNDO'}
 
+    @profiling.traced
     def execute(self, context):
         obj = bpy.context.active_object
         paint_mesh_name = context.scene.male_anatomy_mesh_enum
@@ -437,24 +776,17 @@ class DAZTOOLS_OT_CopyMaleGensPaint(bpy.types.Operator):
             self.report({'ERROR'}, "There was no selected object")
             return {'CANCELLED'}
         
-        utils.set_active_shapekey_by_name(obj, "TuckedBase")
-        utils.set_active_shapekey_by_name(paint_mesh, "TuckedBase")
-
-        obj.active_shape_key.value = 1.0
-        paint_mesh.active_shape_key.value = 1.0
-        
-        mod = obj.modifiers.new(name="CopyVertexColors", type='DATA_TRANSFER')
-        mod.object = paint_mesh
-        mod.use_vert_data = True
-        mod.data_types_verts = {'COLOR_VERTEX'}
-        mod.vert_mapping = 'POLYINTERP_NEAREST'
+        utils.activate_shapekey(obj, "TuckedBase")
+        utils.activate_shapekey(paint_mesh, "TuckedBase")
 
+        # Both meshes bind with TuckedBase applied. The binding is kept on obj
+        # and reused until either mesh or the mix changes
         bpy.context.view_layer.objects.active = obj
-        bpy.ops.object.datalayout_transfer(modifier="CopyVertexColors")
-        bpy.ops.object.modifier_apply(modifier=mod.name)
+        transfer.transfer_colors(paint_mesh, [obj], mix=True)
 
         if bpy.context.mode != 'VERTEX_PAINT':
-            bpy.ops.object.mode_set(mode='VERTEX_PAINT')
+            with profiling.span("mode_set"):
+                bpy.ops.object.mode_set(mode='VERTEX_PAINT')
             bpy.ops.wm.tool_set_by_id(name="builtin_brush.Blur")
             obj.use_mesh_mirror_x = True
             obj.data.color_attributes.active_color = obj.data.color_attributes.get("Penis")
@@ -467,120 +799,205 @@ class DAZTOOLS_OT_MergePaintGroups(bpy.types.Operator):
     bl_idname = "daztools.merge_paint_groups"
     bl_parent_id = "DAZTOOLS_PT_VertexPaintTools"
     bl_description = "Merge paint groups"
-    bl_options = {'REGISTER', 'UNDO'}
+    bl_options = {'REGISTER'}
 
+    @profiling.traced
+    @snapshots.captures(paint_objects, colors=True)
     def execute(self, context):
         obj = bpy.context.active_object
         paint_mesh_name = context.scene.male_anatomy_mesh_enum
         paint_mesh = bpy.data.objects.get(paint_mesh_name)
-        mesh = obj.data
+        objects = [ob for ob in context.selected_objects if ob.type == 'MESH'] or [obj]
 
-        src_attribute = mesh.color_attributes.get("Attribute")
-        dst_attribute = mesh.color_attributes.get("Penis")
-        dst_channel_idx = 1
-        src_channel_idx = 1
+        try:
+            mappings = colors.parse_mappings(context.scene.paint_channel_map)
+        except ValueError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
 
-        for i, src_av in enumerate(src_attribute.data):
-                dst_attribute.data[i].color[dst_channel_idx] = src_av.color[src_channel_idx]
+        if bpy.context.mode == 'EDIT_MESH':
+            bpy.ops.object.mode_set(mode='OBJECT')
 
-        mesh.color_attributes.remove(src_attribute)
-        mesh.color_attributes.active.name = "Attribute"
+        merged = colors.merge_paint_groups(objects, mappings, byte_color=context.scene.paint_byte_color)
+        if not merged:
+            self.report({'ERROR'}, "No selected object has all the mapped color attributes")
+            return {'CANCELLED'}
 
         utils.clear_shapekeys(obj)
         utils.clear_shapekeys(paint_mesh)
 
-        self.report({'INFO'}, f"Merged vertex colors on selected object")
+        self.report({'INFO'}, f"Merged vertex colors on {len(merged)} objects")
         return {'FINISHED'}
 
 class DAZTOOLS_OT_ExportClothing(bpy.types.Operator):
     bl_label = "Export Clothing"
     bl_idname = "daztools.export_clothing"
     bl_parent_id = "DAZTOOLS_PT_VertexPaintTools"
-    bl_description = "Export clothing"
-    bl_options = {'REGISTER', 'UNDO'}
-
+    bl_description = "Export selected clothing and the chosen armature to FBX without changing the scene"
+    bl_options = {'REGISTER'}
+
+    filepath: bpy.props.StringProperty(
+        name="File Path",
+        description="Write the FBX to this path instead of the scene's output template",
+        subtype='FILE_PATH',
+        options={'SKIP_SAVE'},
+    )
+    force: bpy.props.BoolProperty(
+        name="Force",
+        description="Export even when nothing changed since the last export",
+        default=False,
+        options={'SKIP_SAVE'},
+    )
+
+    @profiling.traced
     def execute(self, context):
         obj = bpy.context.active_object
         armature_name = context.scene.primary_armature_enum
         armature = bpy.data.objects.get(armature_name)
 
-        if bpy.context.mode != 'OBJECT':
-            bpy.ops.object.mode_set(mode='OBJECT')
+        if context.scene.export_per_piece:
+            return self.export_pieces(context, armature)
 
-        if not obj or not armature:
+        if not obj or obj.type != 'MESH' or not armature:
             self.report({'ERROR'}, "Missing object or armature")
             return {'CANCELLED'}
-        
-        obj.active_shape_key_index = 0
 
-        # trick to ensure mesh doesn't export with applied shape key
-        if bpy.context.mode != 'EDIT':
-            bpy.ops.object.mode_set(mode='EDIT')
+        objects = [obj] + [ob for ob in context.selected_objects if ob.type == 'MESH' and ob != obj]
+        try:
+            filepath = bpy.path.abspath(self.filepath) if self.filepath else \
+                export.output_path(context.scene.export_path_template, obj, armature)
+        except ValueError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
 
-        if bpy.context.mode != 'OBJECT':
-            bpy.ops.object.mode_set(mode='OBJECT')
-        
-        armature.select_set(True)
+        influences = None
+        if context.scene.export_limit_influences:
+            influences = dict(max_influences=context.scene.export_max_influences,
+                              epsilon=context.scene.export_influence_epsilon,
+                              quantize=context.scene.export_quantize_weights)
+        force = self.force or not context.scene.export_use_cache
+
+        if context.scene.export_in_background:
+            with profiling.span("fingerprint"):
+                digest = export.fingerprint(objects, armature, influences=influences)
+            if not force and export.is_cached(filepath, digest):
+                self.report({'INFO'}, f"'{filepath}' is up to date, nothing exported")
+                return {'FINISHED'}
+            try:
+                export.start_background_export(objects, armature, filepath, influences=influences, digest=digest)
+            except (ValueError, RuntimeError, OSError) as e:
+                self.report({'ERROR'}, f"Background export of '{filepath}' failed to start: {e}")
+                return {'CANCELLED'}
+            if not DAZTOOLS_OT_WatchBackgroundExports.running:
+                bpy.ops.daztools.watch_background_exports('INVOKE_DEFAULT')
+            self.report({'INFO'}, f"Started background export to '{filepath}'")
+            return {'FINISHED'}
+
+        try:
+            exported = export.export_if_changed(objects, armature, filepath, force=force, influences=influences)
+        except (ValueError, RuntimeError, OSError) as e:
+            self.report({'ERROR'}, f"Export to '{filepath}' failed: {e}")
+            return {'CANCELLED'}
+        if not exported:
+            self.report({'INFO'}, f"'{filepath}' is up to date, nothing exported")
+            return {'FINISHED'}
+
+        self.report({'INFO'}, f"Successfully exported clothing to '{filepath}'")
+        return {'FINISHED'}
 
-        # Unlock scale for object and armature
-        for target in (obj, armature):
-            target.lock_scale[0] = False
-            target.lock_scale[1] = False
-            target.lock_scale[2] = False
+    def export_pieces(self, context, armature):
+        scene = context.scene
+        if scene.export_collection:
+            objects = [ob for ob in scene.export_collection.all_objects if ob.type == 'MESH']
+        else:
+            obj = context.active_object
+            objects = ([obj] if obj and obj.type == 'MESH' and obj.select_get() else []) + \
+                [ob for ob in context.selected_objects if ob.type == 'MESH' and ob != obj]
+        if not objects or not armature:
+            self.report({'ERROR'}, "Missing objects or armature")
+            return {'CANCELLED'}
 
-        # Scale both by 100
-        armature.scale *= 100.0
+        # A chosen file keeps its directory, pieces are named after themselves
+        template = os.path.join(os.path.dirname(self.filepath), "{name}.fbx") if self.filepath else \
+            scene.export_path_template
+        try:
+            paths = export.piece_paths(template, objects, armature)
+        except ValueError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
 
-        # Apply scale
-        bpy.context.view_layer.objects.active = obj
-        bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
-
-        bpy.context.view_layer.objects.active = armature
-        bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
-
-        bpy.ops.export_scene.fbx(
-            'INVOKE_DEFAULT',
-            filepath = "D:/UE Projects/Characters/Base Female/Clothing/",
-            use_selection = True,
-            use_visible = True,
-            use_active_collection = False,
-            global_scale = 0.009999999776482582,
-            apply_unit_scale = True,
-            apply_scale_options = 'FBX_SCALE_NONE',
-            use_space_transform = True,
-            bake_space_transform = False,
-            object_types = {'ARMATURE', 'MESH'},
-            use_mesh_modifiers = False,
-            use_mesh_modifiers_render = True,
-            mesh_smooth_type = 'FACE',
-            colors_type = 'SRGB',
-            prioritize_active_color = False,
-            use_subsurf = False,
-            use_mesh_edges = False,
-            use_tspace = False,
-            use_triangles = False,
-            use_custom_props = False,
-            add_leaf_bones = False,
-            primary_bone_axis = 'Y',
-            secondary_bone_axis = 'X',
-            use_armature_deform_only = False,
-            armature_nodetype = 'NULL',
-            bake_anim = False,
-            bake_anim_use_all_bones = True,
-            bake_anim_use_nla_strips = True,
-            bake_anim_use_all_actions = True,
-            bake_anim_force_startend_keying = True,
-            bake_anim_step = 1.0,
-            bake_anim_simplify_factor = 1.0,
-            path_mode = 'AUTO',
-            embed_textures = False,
-            batch_mode = 'OFF',
-            use_batch_own_dir = True,
-            axis_forward = '-Z',
-            axis_up = 'Y',
-        )
-
-        self.report({'INFO'}, f"Successfully exported clothing")
+        influences = None
+        if scene.export_limit_influences:
+            influences = dict(max_influences=scene.export_max_influences,
+                              epsilon=scene.export_influence_epsilon,
+                              quantize=scene.export_quantize_weights)
+        force = self.force or not scene.export_use_cache
+
+        if scene.export_in_background:
+            manifest_path = export.export_manifest_path(list(paths.values()))
+            try:
+                export.start_background_export(objects, armature, manifest_path, influences=influences,
+                                               pieces=paths, force=force)
+            except (ValueError, RuntimeError, OSError) as e:
+                self.report({'ERROR'}, f"Background export failed to start: {e}")
+                return {'CANCELLED'}
+            if not DAZTOOLS_OT_WatchBackgroundExports.running:
+                bpy.ops.daztools.watch_background_exports('INVOKE_DEFAULT')
+            self.report({'INFO'}, f"Started background export of {len(objects)} pieces")
+            return {'FINISHED'}
+
+        try:
+            manifest_path, items = export.export_pieces(objects, armature, paths, force=force, influences=influences)
+        except (ValueError, OSError) as e:
+            self.report({'ERROR'}, f"Export failed: {e}")
+            return {'CANCELLED'}
+        counts = {status: sum(item["status"] == status for item in items) for status in ("exported", "unchanged", "failed")}
+        self.report({'ERROR'} if counts["failed"] else {'INFO'},
+                    f"Exported {counts['exported']} pieces, {counts['unchanged']} unchanged, "
+                    f"{counts['failed']} failed, see '{manifest_path}'")
+        return {'FINISHED'}
+
+class DAZTOOLS_OT_WatchBackgroundExports(bpy.types.Operator):
+    bl_label = "Watch Background Exports"
+    bl_idname = "daztools.watch_background_exports"
+    bl_description = "Poll background exports and report when they finish"
+    bl_options = {'INTERNAL'}
+
+    running = False
+
+    def invoke(self, context, event):
+        self.timer = context.window_manager.event_timer_add(0.5, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        DAZTOOLS_OT_WatchBackgroundExports.running = True
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        for task in export.poll_background_exports():
+            if task.status == 'DONE':
+                self.report({'INFO'}, f"Exported '{task.name}' to '{task.filepath}' in {task.duration:.1f} s")
+            else:
+                self.report({'ERROR'}, f"Export of '{task.name}' failed: {task.error}")
+        for area in context.screen.areas if context.screen else []:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+        if not export.running_background_exports():
+            context.window_manager.event_timer_remove(self.timer)
+            DAZTOOLS_OT_WatchBackgroundExports.running = False
+            return {'FINISHED'}
+        return {'PASS_THROUGH'}
+
+class DAZTOOLS_OT_ClearBackgroundExports(bpy.types.Operator):
+    bl_label = "Clear Finished Exports"
+    bl_idname = "daztools.clear_background_exports"
+    bl_description = "Remove finished background exports from the list"
+    bl_options = {'INTERNAL'}
+
+    def execute(self, context):
+        export.clear_background_exports()
         return {'FINISHED'}
 
 class DAZTOOLS_OT_AddTuckedBaseMorph(bpy.types.Operator):
@@ -590,6 +1007,7 @@ class DAZTOOLS_OT_AddTuckedBaseMorph(bpy.types.Operator):
     bl_description = "Add Tucked Base Morph"
     bl_options = {'REGISTER', 'UNDO'}
 
+    @profiling.traced
     def execute(self, context):
         obj = bpy.context.active_object
         male_anatomy_mesh_name = context.scene.male_anatomy_mesh_enum
@@ -601,20 +1019,18 @@ class DAZTOOLS_OT_AddTuckedBaseMorph(bpy.types.Operator):
             self.report({'ERROR'}, "Valid object not selected")
             return {'CANCELLED'}
         
-        if shape_name in obj.data.shape_keys.key_blocks:
+        if utils.find_shapekey_index(obj, shape_name) >= 0:
             self.report({'ERROR'}, "Object already has tucked base morph")
             return {'CANCELLED'}
 
-        obj.shape_key_add(name="TuckedBase", from_mix=False)
+        utils.add_shapekey(obj, shape_name)
 
-        new_key = obj.data.shape_keys.key_blocks.get(shape_name)
-        obj.active_shape_key_index = utils.get_shapekey_index(obj, new_key)
-        new_key.value = 1.0
+        utils.activate_shapekey(obj, shape_name)
 
         # Make sure it's not hidden in the current view layer
         male_anatomy_mesh.hide_set(False)
 
-        mesh_key = male_anatomy_mesh.data.shape_keys.key_blocks.get(shape_name)
+        mesh_key = utils.get_shapekey(male_anatomy_mesh, shape_name)
         mesh_key.value = 1.0
 
         bpy.ops.object.mode_set(mode='SCULPT')
@@ -631,6 +1047,7 @@ class DAZTOOLS_OT_AddTuckedMorphs(bpy.types.Operator):
     bl_description = "Add Tucked Morphs"
     bl_options = {'REGISTER', 'UNDO'}
 
+    @profiling.traced
     def execute(self, context):
         obj = bpy.context.active_object
         male_anatomy_mesh_name = context.scene.male_anatomy_mesh_enum
@@ -638,23 +1055,18 @@ class DAZTOOLS_OT_AddTuckedMorphs(bpy.types.Operator):
 
         shape_names = ["TuckedMax", "TuckedShaftMax", "TuckedScrotumMax"]
 
-        if any(name in shape_names for name in obj.data.shape_keys.key_blocks):
+        if any(utils.find_shapekey_index(obj, name) >= 0 for name in shape_names):
             self.report({'ERROR'}, "Object already has tucked morphs")
             return {'CANCELLED'}
 
         for name in shape_names:
-            obj.shape_key_add(name=name, from_mix=True)
+            utils.add_shapekey(obj, name, from_mix=True)
 
         utils.clear_shapekeys(obj)
         utils.clear_shapekeys(male_anatomy_mesh)
 
-        male_key = male_anatomy_mesh.data.shape_keys.key_blocks.get("TuckedMax")
-        male_anatomy_mesh.active_shape_key_index = utils.get_shapekey_index(male_anatomy_mesh, male_key)
-        male_key.value = 1.0
-
-        obj_key = obj.data.shape_keys.key_blocks.get("TuckedMax")
-        obj.active_shape_key_index = utils.get_shapekey_index(obj, obj_key)
-        obj_key.value = 1.0
+        utils.activate_shapekey(male_anatomy_mesh, "TuckedMax")
+        utils.activate_shapekey(obj, "TuckedMax")
 
         self.report({'INFO'}, f"Added tucked morphs to object")
         return {'FINISHED'}
@@ -666,6 +1078,7 @@ class DAZTOOLS_OT_NextTuckedMorph(bpy.types.Operator):
     bl_description = "Next Tucked Morph"
     bl_options = {'REGISTER', 'UNDO'}
 
+    @profiling.traced
     def execute(self, context):
         obj = bpy.context.active_object
         male_anatomy_mesh_name = context.scene.male_anatomy_mesh_enum
@@ -677,8 +1090,6 @@ class DAZTOOLS_OT_NextTuckedMorph(bpy.types.Operator):
             self.report({'ERROR'}, "No object with shape keys selected")
             return {'CANCELLED'}
 
-        active_key = obj.data.shape_keys.key_blocks.get(active_key.name)
-
         if active_key.name == "TuckedMax":
             next_key_name = "TuckedShaftMax"
         elif active_key.name == "TuckedShaftMax":
@@ -693,13 +1104,8 @@ class DAZTOOLS_OT_NextTuckedMorph(bpy.types.Operator):
         utils.clear_shapekeys(obj)
         utils.clear_shapekeys(male_anatomy_mesh)
 
-        male_key = male_anatomy_mesh.data.shape_keys.key_blocks.get(next_key_name)
-        male_anatomy_mesh.active_shape_key_index = utils.get_shapekey_index(male_anatomy_mesh, male_key)
-        male_key.value = 1.0
-
-        obj_key = obj.data.shape_keys.key_blocks.get(next_key_name)
-        obj.active_shape_key_index = utils.get_shapekey_index(obj, obj_key)
-        obj_key.value = 1.0
+        utils.activate_shapekey(male_anatomy_mesh, next_key_name)
+        utils.activate_shapekey(obj, next_key_name)
 
         self.report({'INFO'}, f"Moved to next tucked morph")
         return {'FINISHED'}
@@ -714,33 +1120,213 @@ class DAZTOOLS_OT_GlobalSettings(bpy.types.Operator):
 #   Debug
 #-------------------------------------------------------------
 
+class DAZTOOLS_OT_RestoreSnapshot(bpy.types.Operator):
+    bl_label = "Restore Snapshot"
+    bl_idname = "daztools.restore_snapshot"
+    bl_parent_id = "DAZTOOLS_PT_DebugTools"
+    bl_description = "Put back the shape key values, weights or colors saved before an operator ran"
+    bl_options = {'REGISTER'}
+
+    snapshot_id: bpy.props.IntProperty(name="Snapshot", default=-1, options={'SKIP_SAVE'})
+
+    @profiling.traced
+    def execute(self, context):
+        snapshot_id = self.snapshot_id
+        if snapshot_id < 0:
+            recent = snapshots.recent_snapshots()
+            snapshot_id = recent[0][0] if recent else -1
+
+        result = snapshots.restore(snapshot_id)
+        if result is None:
+            self.report({'ERROR'}, "Snapshot no longer available")
+            return {'CANCELLED'}
+
+        restored, skipped = result
+        for name, what in skipped:
+            print(f"Not restored on '{name}': {what}")
+        if skipped:
+            self.report({'WARNING'}, f"Restored {len(restored)} objects, {len(skipped)} items could not be restored, see console")
+        else:
+            self.report({'INFO'}, f"Restored {len(restored)} objects")
+        return {'FINISHED'}
+
+class DAZTOOLS_OT_Symmetrize(bpy.types.Operator):
+    bl_label = "Symmetrize"
+    bl_idname = "daztools.symmetrize"
+    bl_parent_id = "DAZTOOLS_PT_VertexWeightTools"
+    bl_description = "Copy weights, colors or shape key offsets of one side onto the other on the selected meshes"
+    bl_options = {'REGISTER'}
+
+    data: bpy.props.EnumProperty(
+        name="Data",
+        items=[
+            ('WEIGHTS', "Weights", "Vertex group weights, .L/.R and l/r groups swap sides"),
+            ('COLORS', "Colors", "Color attributes"),
+            ('SHAPE_KEYS', "Shape Keys", "Offsets of every shape key"),
+        ],
+        default='WEIGHTS'
+    )
+    keys: bpy.props.EnumProperty(
+        name="Keys",
+        items=[
+            ('ALL', "All", "Every shape key"),
+            ('ACTIVE', "Active", "The active shape key and the keys relative to it"),
+        ],
+        default='ALL'
+    )
+
+    @profiling.traced
+    @snapshots.captures(selected_meshes, kinds=symmetrize_kinds)
+    def execute(self, context):
+        objects = [ob for ob in selected_meshes(self, context) if ob and ob.type == 'MESH']
+        if not objects:
+            self.report({'ERROR'}, "No mesh selected")
+            return {'CANCELLED'}
+
+        if bpy.context.mode != 'OBJECT':
+            with profiling.span("mode_set"):
+                bpy.ops.object.mode_set(mode='OBJECT')
+
+        result = mirror.symmetrize(objects, self.data, context.scene.mirror_direction, context.scene.mirror_tolerance,
+                                   self.keys)
+        written = sum(count for _name, count in result)
+        self.report({'INFO'}, f"Symmetrized {written} {self.data.lower().replace('_', ' ')} on {len(result)} objects")
+        return {'FINISHED'}
+
+class DAZTOOLS_OT_StashWeights(bpy.types.Operator):
+    bl_label = "Stash Weights"
+    bl_idname = "daztools.stash_weights"
+    bl_parent_id = "DAZTOOLS_PT_VertexWeightTools"
+    bl_description = "Keep every vertex group of the selected meshes for restoring or comparing later"
+    bl_options = {'REGISTER'}
+
+    slot: bpy.props.StringProperty(name="Slot", default="A")
+
+    @profiling.traced
+    def execute(self, context):
+        objects = [ob for ob in selected_meshes(self, context) if ob and ob.type == 'MESH']
+        if not objects:
+            self.report({'ERROR'}, "No mesh selected")
+            return {'CANCELLED'}
+
+        with profiling.span("stash"):
+            stash = snapshots.stash_weights(self.slot, objects)
+        path = weight_stash_path(context, self.slot)
+        if path:
+            with profiling.span("save_stash"):
+                snapshots.save_weight_stash(stash, path)
+
+        size = sum(entry.nbytes for entry in stash.values())
+        self.report({'INFO'}, f"Stashed weights of {len(stash)} objects as '{self.slot}' ({size / 1024.0:.0f} KB)")
+        return {'FINISHED'}
+
+class DAZTOOLS_OT_RestoreWeightStash(bpy.types.Operator):
+    bl_label = "Restore Weight Stash"
+    bl_idname = "daztools.restore_weight_stash"
+    bl_parent_id = "DAZTOOLS_PT_VertexWeightTools"
+    bl_description = "Put back the vertex groups of a weight stash"
+    bl_options = {'REGISTER'}
+
+    slot: bpy.props.StringProperty(name="Slot", default="A")
+
+    @profiling.traced
+    @snapshots.captures(stash_objects, shapekeys=False, weights=True)
+    def execute(self, context):
+        stash = find_weight_stash(context, self.slot)
+        if stash is None:
+            self.report({'ERROR'}, f"No weight stash '{self.slot}'")
+            return {'CANCELLED'}
+
+        if bpy.context.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+
+        restored = snapshots.restore_weight_stash(stash)
+        self.report({'INFO'}, f"Restored weights of {len(restored)} of {len(stash)} objects from '{self.slot}'")
+        return {'FINISHED'}
+
+class DAZTOOLS_OT_CompareWeightStashes(bpy.types.Operator):
+    bl_label = "Compare Weight Stashes"
+    bl_idname = "daztools.compare_weight_stashes"
+    bl_parent_id = "DAZTOOLS_PT_VertexWeightTools"
+    bl_description = "Print the vertex groups that differ between two weight stashes"
+    bl_options = {'REGISTER'}
+
+    first: bpy.props.StringProperty(name="First", default="A")
+    second: bpy.props.StringProperty(name="Second", default="B")
+
+    @profiling.traced
+    def execute(self, context):
+        first = find_weight_stash(context, self.first)
+        second = find_weight_stash(context, self.second)
+        if first is None or second is None:
+            self.report({'ERROR'}, f"Stash '{self.first if first is None else self.second}' not found")
+            return {'CANCELLED'}
+
+        report = snapshots.diff_weight_stashes(first, second)
+        changed = 0
+        for name, rows in report:
+            print(f"Weights of '{name}', {self.first} -> {self.second}: {len(rows)} groups differ")
+            for group, max_delta, mean_delta, vertices in rows:
+                print(f"    {group}: max {max_delta:.4f}, mean {mean_delta:.4f} over {vertices} vertices")
+            changed += len(rows)
+
+        self.report({'INFO'}, f"{changed} groups differ on {len(report)} objects, see console for details")
+        return {'FINISHED'}
+
 class DAZTOOLS_OT_PrintVertexWeight(bpy.types.Operator):
     bl_label = "Print Vertex Weight"
     bl_idname = "daztools.print_vertex_weight"
     bl_parent_id = "DAZTOOLS_PT_DebugTools"
-    bl_description = "Print weight value of selected vertex group"
-    bl_options = {'REGISTER', 'UNDO'}
+    bl_description = "Print weight statistics of the active vertex group"
+    bl_options = {'REGISTER'}
 
+    @profiling.traced
     def execute(self, context):
         obj = bpy.context.active_object
 
-        active_vgroup = None
-
-        if obj and obj.type == 'MESH':
-            active_vgroup = obj.vertex_groups.active
-            
-        if not active_vgroup or not obj or not obj.type == 'MESH':
+        if not obj or obj.type != 'MESH' or not obj.vertex_groups.active:
             self.report({'INFO'}, f"No vertex group selected")
+            return {'CANCELLED'}
+
+        active_vgroup = obj.vertex_groups.active
+        stats = weights.group_statistics(obj)
+        gn = active_vgroup.index
+
+        self.report({'INFO'}, f"Vertex group '{active_vgroup.name}' has value '{stats.max[gn]:.6f}' "
+                              f"(mean {stats.mean[gn]:.6f}, {stats.count[gn]} vertices)")
+        return {'FINISHED'}
 
-        max_weight = 0.0
+class DAZTOOLS_OT_GroupStatistics(bpy.types.Operator):
+    bl_label = "Vertex Group Statistics"
+    bl_idname = "daztools.group_statistics"
+    bl_parent_id = "DAZTOOLS_PT_DebugTools"
+    bl_description = "List max, mean, count and weight histogram of every vertex group of the active mesh"
+    bl_options = {'REGISTER'}
 
-        if active_vgroup:
-            for v in obj.data.vertices:
-                for g in v.groups:
-                    if g.group == active_vgroup.index:
-                        max_weight = max(max_weight, g.weight)
+    @profiling.traced
+    def execute(self, context):
+        obj = bpy.context.active_object
+        scene = context.scene
 
-        self.report({'INFO'}, f"Vertex group '{active_vgroup.name}' has value '{max_weight}")
+        if not obj or obj.type != 'MESH':
+            self.report({'ERROR'}, "No mesh selected")
+            return {'CANCELLED'}
+
+        stats = weights.group_statistics(obj)
+
+        scene.daztools_group_stats.clear()
+        for gn, name in enumerate(stats.names):
+            item = scene.daztools_group_stats.add()
+            item.name = name
+            item.max_weight = stats.max[gn]
+            item.mean_weight = stats.mean[gn]
+            item.count = int(stats.count[gn])
+            item.histogram = stats.histogram[gn].tolist()
+        scene.daztools_group_stats_object = obj.name
+        scene.daztools_group_stats_index = obj.vertex_groups.active_index
+
+        empty = int((stats.count == 0).sum())
+        self.report({'INFO'}, f"{len(stats.names)} vertex groups on '{obj.name}', {empty} empty")
         return {'FINISHED'}
 
 #-------------------------------------------------------------
@@ -748,34 +1334,66 @@ class DAZTOOLS_OT_PrintVertexWeight(bpy.types.Operator):
 #-------------------------------------------------------------
 
 classes = [
+    DAZTOOLS_PG_GroupStat,
+    DAZTOOLS_UL_GroupStats,
     DAZTOOLS_PT_Data,
     DAZTOOLS_PT_ClothingTools,
     DAZTOOLS_PT_DebugTools,
     DAZTOOLS_PT_VertexWeightTools,
     DAZTOOLS_PT_MorphTools,
     DAZTOOLS_PT_VertexColorTools,
+    DAZTOOLS_OT_ScanLibrary,
     DAZTOOLS_OT_ReparentToArmature,
     DAZTOOLS_OT_CopyWeights,
+    DAZTOOLS_OT_RestoreSnapshot,
+    DAZTOOLS_OT_Symmetrize,
+    DAZTOOLS_OT_StashWeights,
+    DAZTOOLS_OT_RestoreWeightStash,
+    DAZTOOLS_OT_CompareWeightStashes,
     DAZTOOLS_OT_PrintVertexWeight,
+    DAZTOOLS_OT_GroupStatistics,
     DAZTOOLS_OT_ApplyVertexGroupSmoothing,
+    DAZTOOLS_OT_TransferShapekeys,
     DAZTOOLS_OT_PreviewMorph,
     DAZTOOLS_OT_PreviewNextMorph,
     DAZTOOLS_OT_PreviewPreviousMorph,
+    DAZTOOLS_OT_StepMorphs,
     DAZTOOLS_OT_ClearMorphs,
     DAZTOOLS_OT_SelectDefaultShapekey,
+    DAZTOOLS_OT_PruneShapekeys,
     DAZTOOLS_OT_CopyVertexPaint,
     DAZTOOLS_OT_AddTuckedBaseMorph,
     DAZTOOLS_OT_AddTuckedMorphs,
     DAZTOOLS_OT_NextTuckedMorph,
     DAZTOOLS_OT_CopyMaleGensPaint,
     DAZTOOLS_OT_MergePaintGroups,
-    DAZTOOLS_OT_ExportClothing
+    DAZTOOLS_OT_ExportClothing,
+    DAZTOOLS_OT_WatchBackgroundExports,
+    DAZTOOLS_OT_ClearBackgroundExports
 ]
 
+@bpy.app.handlers.persistent
+def _on_file_load(*args):
+    # Loading a file ends every modal operator without calling back into
+    # it, so their flags are reset and the workers they watched are stopped
+    DAZTOOLS_OT_WatchBackgroundExports.running = False
+    export.cancel_background_exports()
+    DAZTOOLS_OT_ScanLibrary.running = False
+    library.cancel_background_scan()
+
 def register():
     for cls in classes:
         bpy.utils.register_class(cls)
+    bpy.types.Scene.daztools_group_stats = bpy.props.CollectionProperty(type=DAZTOOLS_PG_GroupStat)
+    bpy.types.Scene.daztools_group_stats_index = bpy.props.IntProperty()
+    bpy.types.Scene.daztools_group_stats_object = bpy.props.StringProperty()
+    bpy.app.handlers.load_post.append(_on_file_load)
 
 def unregister():
+    if _on_file_load in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_file_load)
+    del bpy.types.Scene.daztools_group_stats
+    del bpy.types.Scene.daztools_group_stats_index
+    del bpy.types.Scene.daztools_group_stats_object
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
\ No newline at end of file
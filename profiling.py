@@ -0,0 +1,117 @@
+import bpy
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+#-------------------------------------------------------------
+#   Operator runs
+#-------------------------------------------------------------
+
+MAX_RUNS = 10
+
+_runs = collections.deque(maxlen=MAX_RUNS)
+_active = None
+
+class Run:
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.spans = []
+        self.counts = {}
+        self.peak_memory = 0
+        self.trace_path = ""
+
+    def top_spans(self, limit=3):
+        totals = collections.Counter()
+        for name, _start, duration, _counts, _thread in self.spans:
+            totals[name] += duration
+        return totals.most_common(limit)
+
+def recent_runs():
+    return list(reversed(_runs))
+
+def clear_runs():
+    _runs.clear()
+
+@contextlib.contextmanager
+def span(name, **counts):
+    # Named phase inside the traced operator, a no-op when nothing is traced.
+    # Spans of scheduler workers get their own trace lane.
+    run = _active
+    if run is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        thread = threading.current_thread()
+        run.spans.append((name, start - run.start, time.perf_counter() - start, counts,
+                          0 if thread is threading.main_thread() else thread.ident))
+
+def count(**counts):
+    if _active is not None:
+        for key, value in counts.items():
+            _active.counts[key] = _active.counts.get(key, 0) + value
+
+def traced(execute):
+    # Operator.execute decorator, records a run when the scene enables profiling
+    @functools.wraps(execute)
+    def wrapper(self, context):
+        global _active
+        if _active is not None or not getattr(context.scene, "profile_operators", False):
+            return execute(self, context)
+
+        run = _active = Run(self.bl_idname.replace("_OT_", ".").lower())
+        started_tracemalloc = not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            return execute(self, context)
+        finally:
+            run.duration = time.perf_counter() - run.start
+            run.peak_memory = tracemalloc.get_traced_memory()[1]
+            if started_tracemalloc:
+                tracemalloc.stop()
+            _active = None
+            _runs.append(run)
+            run.trace_path = write_trace(run, bpy.path.abspath(context.scene.profile_directory)
+                                         or bpy.app.tempdir)
+    return wrapper
+
+#-------------------------------------------------------------
+#   Chrome trace output
+#-------------------------------------------------------------
+
+def trace_events(run):
+    pid = os.getpid()
+    events = [{
+        "name": run.name, "cat": "operator", "ph": "X", "pid": pid, "tid": 0,
+        "ts": 0.0, "dur": run.duration * 1e6,
+        "args": dict(run.counts, peak_memory=run.peak_memory),
+    }]
+    for name, start, duration, counts, thread in run.spans:
+        events.append({
+            "name": name, "cat": "phase", "ph": "X", "pid": pid, "tid": thread,
+            "ts": start * 1e6, "dur": duration * 1e6, "args": counts,
+        })
+    return events
+
+def write_trace(run, directory):
+    try:
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d_%H%M%S") + f"_{time.time_ns() // 1000000 % 1000:03d}"
+        path = os.path.join(directory, f"daztools_{run.name.replace('.', '_')}_{stamp}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events(run), "displayTimeUnit": "ms"}, f)
+        return path
+    except OSError as e:
+        print(f"Could not write trace for {run.name}: {e}")
+        return ""
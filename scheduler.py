@@ -0,0 +1,61 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from . import profiling
+
+# Multi-object operators run in three phases per object:
+#
+#   extract    reads the object's arrays, main thread, selection order
+#   compute    works on those arrays only, worker threads
+#   writeback  stores the result on the object, main thread, selection order
+#
+# bpy data must never be touched from compute. Only NumPy array operations
+# release the GIL, so compute should be bulk array work: interpolation,
+# thresholds, masks. Anything looping in Python, like the BVH binding
+# search, holds the GIL and belongs in extract. Results don't depend on the
+# worker count, writeback order is always the order of the objects.
+
+# Pool size when the scene doesn't set one
+MAX_WORKERS = 8
+
+def worker_count(workers=0):
+    # workers <= 0 uses every core, up to MAX_WORKERS
+    return workers if workers > 0 else max(1, min(os.cpu_count() or 1, MAX_WORKERS))
+
+def run(objects, extract, compute, writeback, workers=0, label="compute"):
+    # Returns [(object name, extract, compute, writeback seconds)] in object order
+    objects = list(objects)
+    workers = min(worker_count(workers), max(len(objects), 1))
+
+    def timed_compute(name, payload):
+        start = time.perf_counter()
+        with profiling.span(label, object=name):
+            result = compute(payload)
+        return result, time.perf_counter() - start
+
+    def extracted():
+        for obj in objects:
+            start = time.perf_counter()
+            with profiling.span("extract", object=obj.name):
+                payload = extract(obj)
+            yield obj, payload, time.perf_counter() - start
+
+    timings = []
+    def write(obj, extract_time, result, compute_time):
+        start = time.perf_counter()
+        with profiling.span("writeback", object=obj.name):
+            writeback(obj, result)
+        timings.append((obj.name, extract_time, compute_time, time.perf_counter() - start))
+
+    if workers == 1:
+        for obj, payload, extract_time in extracted():
+            write(obj, extract_time, *timed_compute(obj.name, payload))
+        return timings
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="daztools") as pool:
+        pending = [(obj, extract_time, pool.submit(timed_compute, obj.name, payload))
+                   for obj, payload, extract_time in extracted()]
+        for obj, extract_time, future in pending:
+            write(obj, extract_time, *future.result())
+    profiling.count(workers=workers)
+    return timings
@@ -0,0 +1,416 @@
+import bpy
+import bmesh
+import collections
+import functools
+import itertools
+import json
+import os
+import time
+import numpy as np
+from . import utils, profiling, weights
+
+#-------------------------------------------------------------
+#   Object state
+#-------------------------------------------------------------
+
+# Memory budget of the snapshot store when the scene doesn't set one
+BUDGET_MB = 256
+
+class ObjectState:
+    # The arrays of one object an operator may touch. Objects are found
+    # again by name, pointers don't survive undo or file reloads.
+
+    def __init__(self, obj, shapekeys=True, weights=False, colors=False, key_coords=False):
+        self.name = obj.name
+        self.shapekeys = None
+        self.weights = None
+        self.colors = None
+        self.active_color = ""
+        self.key_coords = None
+
+        if shapekeys and obj.data.shape_keys:
+            self.shapekeys = (utils.get_shapekey_values(obj), obj.active_shape_key_index)
+        if key_coords and obj.data.shape_keys:
+            # Vertex positions of the keys an operator moves, every key or
+            # the names key_coords(obj) returns
+            key_blocks = obj.data.shape_keys.key_blocks
+            names = capture_key_names(obj, key_coords)
+            coords = np.empty((len(names), len(obj.data.vertices) * 3), dtype=np.float32)
+            for k, name in enumerate(names):
+                key_blocks[name].data.foreach_get("co", coords[k])
+            self.key_coords = (names, coords)
+        if weights:
+            rows, cols, vals = utils.weight_matrix(obj)
+            self.weights = ([vg.name for vg in obj.vertex_groups], obj.vertex_groups.active_index,
+                            rows, cols.astype(np.uint16 if len(obj.vertex_groups) < 65536 else np.int32), vals)
+        if colors:
+            self.colors = {}
+            attributes = obj.data.color_attributes
+            for attribute in attributes:
+                data = np.empty(len(attribute.data) * 4, dtype=np.float32)
+                attribute.data.foreach_get("color", data)
+                self.colors[attribute.name] = (attribute.domain, attribute.data_type, data)
+            self.active_color = attributes.active_color.name if attributes.active_color else ""
+
+    @property
+    def nbytes(self):
+        size = 0
+        if self.shapekeys:
+            size += self.shapekeys[0].nbytes
+        if self.weights:
+            size += sum(array.nbytes for array in self.weights[2:])
+        if self.colors:
+            size += sum(data.nbytes for _domain, _data_type, data in self.colors.values())
+        if self.key_coords:
+            size += self.key_coords[1].nbytes
+        return size
+
+    def restore(self):
+        # None when the object is gone, otherwise what couldn't be put back
+        obj = bpy.data.objects.get(self.name)
+        if obj is None or obj.type != 'MESH':
+            return None
+        skipped = []
+        if self.shapekeys:
+            values, active_index = self.shapekeys
+            key = obj.data.shape_keys
+            if key and len(key.key_blocks) == len(values):
+                key.key_blocks.foreach_set("value", values)
+                obj.active_shape_key_index = active_index
+                key.update_tag()
+            else:
+                skipped.append("shape key values")
+        if self.key_coords:
+            if not self.restore_key_coords(obj):
+                skipped.append("shape key positions")
+        if self.weights:
+            if not self.restore_weights(obj):
+                skipped.append("vertex weights")
+        if self.colors is not None:
+            skipped.extend(f"color '{name}'" for name in self.restore_colors(obj))
+        obj.data.update()
+        return skipped
+
+    def restore_key_coords(self, obj):
+        names, coords = self.key_coords
+        key = obj.data.shape_keys
+        if not key or any(name not in key.key_blocks for name in names) \
+                or coords.shape[1] != len(obj.data.vertices) * 3:
+            return False
+        for name, co in zip(names, coords):
+            key.key_blocks[name].data.foreach_set("co", co)
+        return True
+
+    def restore_weights(self, obj):
+        names, active_index, rows, cols, vals = self.weights
+        if len(rows) and rows.max() >= len(obj.data.vertices):
+            return False
+        for vg in list(obj.vertex_groups):
+            if vg.name not in names:
+                obj.vertex_groups.remove(vg)
+        for name in names:
+            if obj.vertex_groups.get(name) is None:
+                obj.vertex_groups.new(name=name)
+        mapping = np.array([obj.vertex_groups[name].index for name in names] or [0], dtype=np.int64)
+        utils.write_weights(obj, rows, mapping[cols.astype(np.int64)], vals)
+        if 0 <= active_index < len(obj.vertex_groups):
+            obj.vertex_groups.active_index = active_index
+        weights.invalidate_group_statistics(obj.data)
+        return True
+
+    def restore_colors(self, obj):
+        # Attributes converted to another domain or type since the capture
+        # are recreated. Returns the names whose size no longer matches.
+        attributes = obj.data.color_attributes
+        for attribute in list(attributes):
+            if attribute.name not in self.colors:
+                attributes.remove(attribute)
+        skipped = []
+        for name, (domain, data_type, data) in self.colors.items():
+            attribute = attributes.get(name)
+            if attribute is not None and (attribute.domain != domain or attribute.data_type != data_type):
+                attributes.remove(attribute)
+                attribute = None
+            if attribute is None:
+                attribute = attributes.new(name=name, type=data_type, domain=domain)
+            if len(attribute.data) * 4 == len(data):
+                attribute.data.foreach_set("color", data)
+            else:
+                skipped.append(name)
+        if self.active_color in attributes:
+            attributes.active_color = attributes[self.active_color]
+        return skipped
+
+def capture_key_names(obj, key_coords):
+    if key_coords is True:
+        return [key_block.name for key_block in obj.data.shape_keys.key_blocks]
+    return list(key_coords(obj))
+
+#-------------------------------------------------------------
+#   Snapshot store
+#-------------------------------------------------------------
+
+class Snapshot:
+    def __init__(self, label, states):
+        self.label = label
+        self.time = time.time()
+        self.states = states
+        self.nbytes = sum(state.nbytes for state in states)
+
+# Oldest / least recently restored first
+_snapshots = collections.OrderedDict()
+_next_id = 0
+
+def capture(label, objects, shapekeys=True, weights=False, colors=False, key_coords=False,
+            budget=BUDGET_MB * 1024 * 1024):
+    # None when the key positions alone would exceed the budget, those are
+    # checked before anything is read
+    meshes = {}
+    for obj in objects:
+        if obj is not None and obj.type == 'MESH':
+            meshes.setdefault(obj.name, obj)
+    objects = list(meshes.values())
+    if key_coords:
+        size = sum(len(capture_key_names(obj, key_coords)) * len(obj.data.vertices) * 12
+                   for obj in objects if obj.data.shape_keys)
+        if size > budget:
+            return None
+    snapshot = Snapshot(label, [ObjectState(obj, shapekeys, weights, colors, key_coords) for obj in objects])
+    return snapshot if snapshot.nbytes <= budget else None
+
+def push(snapshot, budget=BUDGET_MB * 1024 * 1024):
+    # Returns the snapshot's id, None when it alone is over the budget
+    if snapshot.nbytes > budget:
+        return None
+    global _next_id
+    _next_id += 1
+    _snapshots[_next_id] = snapshot
+    evict(budget)
+    return _next_id
+
+def evict(budget):
+    # Drops least recently used snapshots until the store fits the budget
+    used = memory_used()
+    while used > budget and _snapshots:
+        _id, snapshot = _snapshots.popitem(last=False)
+        used -= snapshot.nbytes
+
+def restore(snapshot_id):
+    snapshot = _snapshots.get(snapshot_id)
+    if snapshot is None:
+        return None
+    # (names restored, [(name, what couldn't be restored)])
+    _snapshots.move_to_end(snapshot_id)
+    restored = []
+    skipped = []
+    for state in snapshot.states:
+        result = state.restore()
+        if result is None:
+            skipped.append((state.name, "object missing"))
+            continue
+        restored.append(state.name)
+        skipped.extend((state.name, what) for what in result)
+    return restored, skipped
+
+def memory_used():
+    return sum(snapshot.nbytes for snapshot in _snapshots.values())
+
+def recent_snapshots():
+    return list(reversed(_snapshots.items()))
+
+def clear_snapshots():
+    _snapshots.clear()
+
+def captures(objects, shapekeys=True, weights=False, colors=False, kinds=None):
+    # Operator.execute decorator. objects(self, context) lists what the
+    # operator touches, their state is kept when it finishes. kinds(self,
+    # context) can pick the capture arguments per call instead. Snapshots
+    # are opt-in per scene, without them the operator pushes a global undo
+    # step like the operators without snapshots.
+    def decorator(execute):
+        @functools.wraps(execute)
+        def wrapper(self, context):
+            if not getattr(context.scene, "use_snapshots", False):
+                result = execute(self, context)
+                if 'FINISHED' in result:
+                    bpy.ops.ed.undo_push(message=self.bl_label)
+                return result
+
+            arguments = dict(shapekeys=shapekeys, weights=weights, colors=colors)
+            if kinds is not None:
+                arguments.update(kinds(self, context))
+            budget = getattr(context.scene, "snapshot_budget", BUDGET_MB)
+            with profiling.span("snapshot"):
+                snapshot = capture(self.bl_label, objects(self, context), budget=budget * 1024 * 1024, **arguments)
+            result = execute(self, context)
+            if 'FINISHED' not in result:
+                return result
+            if snapshot is None:
+                self.report({'WARNING'}, f"No snapshot of '{self.bl_label}' kept, it needs more than "
+                                         f"the {budget} MB snapshot budget")
+            elif snapshot.states:
+                push(snapshot, budget * 1024 * 1024)
+            return result
+        return wrapper
+    return decorator
+
+#-------------------------------------------------------------
+#   Weight stashes
+#-------------------------------------------------------------
+
+# Stashed weights are kept in 1/65535 steps
+WEIGHT_STEPS = 65535
+
+class WeightStash:
+    # Every vertex group of one object as CSR rows per vertex: group
+    # indices and uint16 weights, with the group names. About a third of
+    # the memory of the (vertex, group, float) triplets.
+
+    def __init__(self, name, groups, indptr, indices, weights):
+        self.name = name
+        self.groups = groups
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    @classmethod
+    def capture(cls, obj):
+        # Deform layer items of a BMesh come back per vertex in one call,
+        # faster than walking MeshVertex.groups
+        bm = bmesh.new()
+        try:
+            bm.from_mesh(obj.data, use_shape_key=False)
+            layer = bm.verts.layers.deform.active
+            items = [vert[layer].items() for vert in bm.verts] if layer else []
+        finally:
+            bm.free()
+        counts = np.fromiter(map(len, items), dtype=np.int32, count=len(items))
+        pairs = np.array(list(itertools.chain.from_iterable(items)), dtype=np.float64).reshape(-1, 2)
+
+        indptr = np.zeros(len(obj.data.vertices) + 1, dtype=np.int32)
+        np.cumsum(counts, out=indptr[1:len(counts) + 1])
+        indptr[len(counts) + 1:] = indptr[len(counts)]
+        indices = pairs[:, 0].astype(np.uint16 if len(obj.vertex_groups) < 65536 else np.int32)
+        values = np.round(np.clip(pairs[:, 1], 0.0, 1.0) * WEIGHT_STEPS).astype(np.uint16)
+        return cls(obj.name, [vg.name for vg in obj.vertex_groups], indptr, indices, values)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes
+
+    @property
+    def vertex_count(self):
+        return len(self.indptr) - 1
+
+    def dense(self, groups=None):
+        # Vertices x groups float weights, columns in the order of groups
+        groups = self.groups if groups is None else groups
+        column = {name: i for i, name in enumerate(groups)}
+        mapping = np.array([column.get(name, -1) for name in self.groups] or [-1], dtype=np.int64)
+        rows = np.repeat(np.arange(self.vertex_count), np.diff(self.indptr))
+        cols = mapping[self.indices.astype(np.int64)] if len(self.indices) else np.zeros(0, dtype=np.int64)
+        keep = cols >= 0
+        dense = np.zeros((self.vertex_count, len(groups)), dtype=np.float32)
+        dense[rows[keep], cols[keep]] = self.weights[keep] / np.float32(WEIGHT_STEPS)
+        return dense
+
+    def restore(self, obj):
+        # Replaces every vertex group of obj by the stashed ones, written
+        # through a BMesh deform layer in one pass
+        if obj.type != 'MESH' or len(obj.data.vertices) != self.vertex_count:
+            return False
+        for vg in list(obj.vertex_groups):
+            if vg.name not in self.groups:
+                obj.vertex_groups.remove(vg)
+        for name in self.groups:
+            if obj.vertex_groups.get(name) is None:
+                obj.vertex_groups.new(name=name)
+        mapping = np.array([obj.vertex_groups[name].index for name in self.groups] or [0], dtype=np.int64)
+        rows = np.repeat(np.arange(self.vertex_count), np.diff(self.indptr))
+        utils.write_weights(obj, rows, mapping[self.indices.astype(np.int64)],
+                            self.weights / np.float32(WEIGHT_STEPS))
+        weights.invalidate_group_statistics(obj.data)
+        return True
+
+_stashes = {}
+
+def stash_weights(label, objects):
+    # Keeps the weights of every mesh in objects under label, returns the stash
+    stash = {obj.name: WeightStash.capture(obj) for obj in objects if obj is not None and obj.type == 'MESH'}
+    _stashes[label] = stash
+    return stash
+
+def weight_stash(label):
+    return _stashes.get(label)
+
+def restore_weight_stash(stash, objects=None):
+    # Restores the stashed objects, or only those in objects. Returns names restored.
+    names = None if objects is None else {obj.name for obj in objects}
+    restored = []
+    for name, entry in stash.items():
+        obj = bpy.data.objects.get(name)
+        if obj is not None and (names is None or name in names) and entry.restore(obj):
+            restored.append(name)
+    return restored
+
+def save_weight_stash(stash, path):
+    # Compressed .npz, arrays per object plus a JSON header of names and groups
+    arrays = {}
+    header = []
+    for i, (name, entry) in enumerate(stash.items()):
+        header.append({"name": name, "groups": entry.groups})
+        arrays[f"{i}_indptr"] = entry.indptr
+        arrays[f"{i}_indices"] = entry.indices
+        arrays[f"{i}_weights"] = entry.weights
+    arrays["header"] = np.frombuffer(json.dumps(header).encode(), dtype=np.uint8)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.savez_compressed(path, **arrays)
+    return path
+
+def load_weight_stash(path, label=None):
+    # With label, the loaded stash is also kept in memory under it
+    with np.load(path, allow_pickle=False) as data:
+        header = json.loads(data["header"].tobytes().decode())
+        stash = {entry["name"]: WeightStash(entry["name"], entry["groups"], data[f"{i}_indptr"],
+                                            data[f"{i}_indices"], data[f"{i}_weights"])
+                 for i, entry in enumerate(header)}
+    if label is not None:
+        _stashes[label] = stash
+    return stash
+
+def diff_weight_stashes(first, second, threshold=1.0 / WEIGHT_STEPS):
+    # [(object name, [(group, max difference, mean difference, vertices changed)])]
+    # for every object in both stashes, groups only in one stash count as zero
+    # in the other. Only groups with a vertex changed beyond threshold are listed.
+    report = []
+    for name in first:
+        if name not in second or first[name].vertex_count != second[name].vertex_count:
+            continue
+        groups = list(dict.fromkeys(first[name].groups + second[name].groups))
+        delta = np.abs(first[name].dense(groups) - second[name].dense(groups))
+        changed = (delta > threshold).sum(axis=0)
+        rows = []
+        for gn in np.flatnonzero(changed):
+            column = delta[:, gn]
+            rows.append((groups[gn], float(column.max()), float(column[column > threshold].mean()), int(changed[gn])))
+        rows.sort(key=lambda row: -row[1])
+        report.append((name, rows))
+    return report
+
+def clear_weight_stashes():
+    _stashes.clear()
+
+@bpy.app.handlers.persistent
+def _on_file_load(*args):
+    # Both hold object names of the previous file
+    clear_snapshots()
+    clear_weight_stashes()
+
+def register():
+    bpy.app.handlers.load_post.append(_on_file_load)
+
+def unregister():
+    if _on_file_load in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_file_load)
+    clear_snapshots()
+    clear_weight_stashes()
@@ -0,0 +1,428 @@
+import hashlib
+import numpy as np
+from mathutils import Vector
+from mathutils.bvhtree import BVHTree
+from . import utils, profiling, colors, scheduler, weights
+
+#-------------------------------------------------------------
+#   Source mesh index
+#-------------------------------------------------------------
+
+def mesh_coords(mesh):
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    return co.reshape(-1, 3)
+
+def transform_points(matrix, points):
+    m = np.array(matrix, dtype=np.float32)
+    return points @ m[:3, :3].T + m[:3, 3]
+
+def mixed_coords(obj):
+    # Vertex positions with the current shape key mix, as the evaluated
+    # mesh has them before any modifier: values within the slider range,
+    # offsets masked by the key's vertex group
+    mesh = obj.data
+    if not mesh.shape_keys:
+        return mesh_coords(mesh)
+    count = len(mesh.vertices)
+    if obj.show_only_shape_key and obj.active_shape_key:
+        return key_coords(obj.active_shape_key, count)
+    reference = mesh.shape_keys.reference_key
+    co = key_coords(reference, count)
+    relative_coords = {reference.name: co.copy()}
+    masks = None
+    for key_block in mesh.shape_keys.key_blocks:
+        value = min(max(key_block.value, key_block.slider_min), key_block.slider_max)
+        if value == 0.0 or key_block.mute or key_block == reference:
+            continue
+        relative = key_block.relative_key
+        if relative.name not in relative_coords:
+            relative_coords[relative.name] = key_coords(relative, count)
+        delta = key_coords(key_block, count) - relative_coords[relative.name]
+        group = obj.vertex_groups.get(key_block.vertex_group) if key_block.vertex_group else None
+        if group is not None:
+            if masks is None:
+                masks = utils.dense_weights(obj)
+            delta *= masks[:, group.index, None]
+        co += value * delta
+    return co
+
+class SourceIndex:
+    # Triangulated source mesh and its BVH tree, built once and shared by
+    # every target of a transfer. The tree is only built when a target has
+    # no usable cached binding. Both meshes bind in their rest shape, with
+    # mix in their current shape key mix instead.
+
+    def __init__(self, obj, mix=False):
+        mesh = obj.data
+        mesh.calc_loop_triangles()
+        tris = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("vertices", tris)
+
+        self.obj = obj
+        self.mix = mix
+        self.co = self.coords(obj)
+        self.tris = tris.reshape(-1, 3)
+        self._tree = None
+        self._topology = None
+
+    def coords(self, obj):
+        return mixed_coords(obj) if self.mix else mesh_coords(obj.data)
+
+    @property
+    def mode(self):
+        return "mix" if self.mix else "rest"
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            with profiling.span("build_tree"):
+                self._tree = BVHTree.FromPolygons(self.co.tolist(), self.tris.tolist(), all_triangles=True)
+        return self._tree
+
+    @property
+    def topology(self):
+        if self._topology is None:
+            self._topology = topology_hash(self.obj.data)
+        return self._topology
+
+    def target_points(self, target):
+        matrix = self.obj.matrix_world.inverted() @ target.matrix_world
+        return transform_points(matrix, self.coords(target))
+
+    def nearest(self, points):
+        # Nearest source triangle and barycentric coordinates of every point.
+        # A Python loop over the tree that holds the GIL, so it runs in the
+        # scheduler's extract phase rather than in its workers.
+        tri_index = np.zeros(len(points), dtype=np.int32)
+        nearest = np.empty_like(points)
+        find_nearest = self.tree.find_nearest
+        for i, point in enumerate(points):
+            location, _normal, index, _dist = find_nearest(Vector(point))
+            if index is not None:
+                tri_index[i] = index
+                nearest[i] = location
+            else:
+                nearest[i] = point
+
+        tri_verts = self.tris[tri_index]
+        return tri_index, barycentric(nearest, *(self.co[tri_verts[:, j]] for j in range(3)))
+
+    # bind split in three for the scheduler: prepare and resolve run in its
+    # extract phase, store in its writeback phase
+
+    def prepare(self, target):
+        # (key, cached binding or None, points to search when not cached)
+        key = binding_key(self, target)
+        cached = load_binding(target.data, self.obj.name, self.mode, key)
+        if cached is not None:
+            profiling.count(binding_hits=1)
+            return key, cached, None
+        profiling.count(binding_misses=1)
+        self.tree
+        return key, None, self.target_points(target)
+
+    def resolve(self, prepared):
+        _key, cached, points = prepared
+        return cached if cached is not None else self.nearest(points)
+
+    def store(self, target, prepared, tri_index, bary):
+        key, cached, _points = prepared
+        if cached is None:
+            store_binding(target.data, self.obj.name, self.mode, key, tri_index, bary)
+
+    def bind(self, target, cache=True):
+        # (tri_verts, bary) of target, from the binding stored on its mesh
+        # when neither mesh changed since it was computed
+        if not cache:
+            tri_index, bary = self.nearest(self.target_points(target))
+            return self.tris[tri_index], bary
+        prepared = self.prepare(target)
+        tri_index, bary = self.resolve(prepared)
+        self.store(target, prepared, tri_index, bary)
+        return self.tris[tri_index], bary
+
+def barycentric(p, a, b, c):
+    v0, v1, v2 = b - a, c - a, p - a
+    d00 = np.einsum('ij,ij->i', v0, v0)
+    d01 = np.einsum('ij,ij->i', v0, v1)
+    d11 = np.einsum('ij,ij->i', v1, v1)
+    d20 = np.einsum('ij,ij->i', v2, v0)
+    d21 = np.einsum('ij,ij->i', v2, v1)
+    denom = d00 * d11 - d01 * d01
+    denom[denom == 0.0] = 1.0
+    v = (d11 * d20 - d01 * d21) / denom
+    w = (d00 * d21 - d01 * d20) / denom
+    bary = np.clip(np.stack((1.0 - v - w, v, w), axis=1), 0.0, 1.0)
+    return bary / np.maximum(bary.sum(axis=1, keepdims=True), 1e-12)
+
+def interpolate(tri_verts, bary, values):
+    # Blend per-vertex source values onto targets, values is (source verts, ...).
+    # (tri_verts, bary) is a sparse matrix with three entries per row, this is
+    # its product with values.
+    bary = bary.reshape(bary.shape + (1,) * (values.ndim - 1))
+    result = bary[:, 0] * values[tri_verts[:, 0]]
+    result += bary[:, 1] * values[tri_verts[:, 1]]
+    result += bary[:, 2] * values[tri_verts[:, 2]]
+    return result
+
+#-------------------------------------------------------------
+#   Binding cache
+#-------------------------------------------------------------
+
+# Bindings live on the target mesh as hidden point attributes, one pair per
+# source and mode (rest or mix), with the key they were computed for in a custom property. The key
+# covers both topologies, both vertex positions and the relative transform.
+BINDING_PROPERTY = "daztools_bindings"
+
+def topology_hash(mesh):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.int64(len(mesh.vertices)).tobytes())
+    for collection, attr in ((mesh.loops, "vertex_index"), (mesh.polygons, "loop_total")):
+        data = np.empty(len(collection), dtype=np.int32)
+        collection.foreach_get(attr, data)
+        digest.update(data.tobytes())
+    return digest.hexdigest()
+
+def binding_key(index, target):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(index.topology.encode())
+    digest.update(index.co.tobytes())
+    digest.update(topology_hash(target.data).encode())
+    digest.update(index.coords(target).tobytes())
+    matrix = index.obj.matrix_world.inverted() @ target.matrix_world
+    digest.update(np.array(matrix, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+def binding_names(source_name, mode):
+    slot = hashlib.blake2b(f"{mode}:{source_name}".encode(), digest_size=4).hexdigest()
+    return slot, f".daztools_bind_{slot}_tri", f".daztools_bind_{slot}_bary"
+
+def load_binding(mesh, source_name, mode, key):
+    slot, tri_name, bary_name = binding_names(source_name, mode)
+    stored = mesh.get(BINDING_PROPERTY, {})
+    if stored.get(slot) != key:
+        return None
+    tri_attribute = mesh.attributes.get(tri_name)
+    bary_attribute = mesh.attributes.get(bary_name)
+    if tri_attribute is None or bary_attribute is None:
+        return None
+    tri_index = np.empty(len(mesh.vertices), dtype=np.int32)
+    tri_attribute.data.foreach_get("value", tri_index)
+    bary = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    bary_attribute.data.foreach_get("vector", bary)
+    return tri_index, bary.reshape(-1, 3)
+
+def store_binding(mesh, source_name, mode, key, tri_index, bary):
+    slot, tri_name, bary_name = binding_names(source_name, mode)
+    for name, data_type in ((tri_name, 'INT'), (bary_name, 'FLOAT_VECTOR')):
+        attribute = mesh.attributes.get(name)
+        if attribute is not None and (attribute.domain != 'POINT' or attribute.data_type != data_type):
+            mesh.attributes.remove(attribute)
+            attribute = None
+        if attribute is None:
+            mesh.attributes.new(name=name, type=data_type, domain='POINT')
+    mesh.attributes[tri_name].data.foreach_set("value", tri_index.astype(np.int32))
+    mesh.attributes[bary_name].data.foreach_set("vector", bary.astype(np.float32).ravel())
+    if BINDING_PROPERTY not in mesh:
+        mesh[BINDING_PROPERTY] = {}
+    mesh[BINDING_PROPERTY][slot] = key
+
+def clear_bindings(mesh):
+    for attribute in [attribute for attribute in mesh.attributes if attribute.name.startswith(".daztools_bind_")]:
+        mesh.attributes.remove(attribute)
+    if BINDING_PROPERTY in mesh:
+        del mesh[BINDING_PROPERTY]
+
+#-------------------------------------------------------------
+#   Vertex group weights
+#-------------------------------------------------------------
+
+def mesh_targets(source, targets):
+    return [obj for obj in targets if obj.type == 'MESH' and obj != source]
+
+def transfer_weights(source, targets, workers=0):
+    # Nearest-face interpolated weight copy, equivalent to a DATA_TRANSFER
+    # modifier with POLYINTERP_NEAREST but sharing one source index.
+    # Returns the scheduler timings of every target.
+    with profiling.span("build_index"):
+        index = SourceIndex(source)
+        source_weights = utils.dense_weights(source)
+    names = [vg.name for vg in source.vertex_groups]
+
+    def extract(obj):
+        profiling.count(vertices=len(obj.data.vertices))
+        prepared = index.prepare(obj)
+        return (prepared,) + index.resolve(prepared)
+
+    def compute(binding):
+        # Triplets of the nonzero weights, groups no vertex uses are left out
+        prepared, tri_index, bary = binding
+        target_weights = interpolate(index.tris[tri_index], bary, source_weights)
+        rows, cols = np.nonzero(target_weights > 0.0)
+        vals = target_weights[rows, cols]
+        used, cols = np.unique(cols, return_inverse=True)
+        return prepared, tri_index, bary, [names[gn] for gn in used], (rows, cols, vals)
+
+    def writeback(obj, result):
+        prepared, tri_index, bary, group_names, triplets = result
+        index.store(obj, prepared, tri_index, bary)
+        obj.vertex_groups.clear()
+        for name in group_names:
+            obj.vertex_groups.new(name=name)
+        utils.write_weights(obj, *triplets)
+        weights.invalidate_group_statistics(obj.data)
+
+    return scheduler.run(mesh_targets(source, targets), extract, compute, writeback, workers, "interpolate")
+
+#-------------------------------------------------------------
+#   Color attributes
+#-------------------------------------------------------------
+
+def transfer_colors(source, targets, names=None, workers=0, mix=False):
+    # Nearest-face interpolated copy of the source's color attributes into
+    # point attributes of the same names, like a DATA_TRANSFER modifier with
+    # COLOR_VERTEX and POLYINTERP_NEAREST. With mix, both meshes bind in
+    # their current shape key mix. Returns the names copied.
+    attributes = source.data.color_attributes
+    names = [attribute.name for attribute in attributes if names is None or attribute.name in names]
+    if not names:
+        return []
+
+    with profiling.span("build_index"):
+        index = SourceIndex(source, mix)
+        values = {name: colors.convert_domain(source.data, colors.read_colors(attributes[name]),
+                                              attributes[name].domain, 'POINT') for name in names}
+
+    def extract(obj):
+        prepared = index.prepare(obj)
+        return (prepared,) + index.resolve(prepared)
+
+    def compute(binding):
+        prepared, tri_index, bary = binding
+        tri_verts = index.tris[tri_index]
+        return prepared, tri_index, bary, [interpolate(tri_verts, bary, values[name]) for name in names]
+
+    def writeback(obj, result):
+        prepared, tri_index, bary, target_colors = result
+        index.store(obj, prepared, tri_index, bary)
+        target_attributes = obj.data.color_attributes
+        for name, data in zip(names, target_colors):
+            attribute = target_attributes.get(name)
+            if attribute is not None and attribute.domain != 'POINT':
+                target_attributes.remove(attribute)
+                attribute = None
+            if attribute is None:
+                attribute = target_attributes.new(name=name, type=attributes[name].data_type, domain='POINT')
+            colors.write_colors(attribute, data)
+        obj.data.update()
+
+    scheduler.run(mesh_targets(source, targets), extract, compute, writeback, workers, "interpolate")
+    return names
+
+#-------------------------------------------------------------
+#   Shape keys
+#-------------------------------------------------------------
+
+# Transferred keys whose largest offset is below this are skipped
+MIN_DELTA = 0.0001
+
+# Source keys are read and interpolated this many at a time
+KEY_CHUNK = 64
+
+def key_coords(key_block, count):
+    co = np.empty(count * 3, dtype=np.float32)
+    key_block.data.foreach_get("co", co)
+    return co.reshape(-1, 3)
+
+def source_deltas(obj, names):
+    # (verts, keys, 3) offsets of the named keys from their relative keys
+    key_blocks = obj.data.shape_keys.key_blocks
+    count = len(obj.data.vertices)
+    relative_coords = {}
+    deltas = np.empty((count, len(names), 3), dtype=np.float32)
+    for k, name in enumerate(names):
+        key_block = key_blocks[name]
+        relative = key_block.relative_key
+        if relative.name not in relative_coords:
+            relative_coords[relative.name] = key_coords(relative, count)
+        deltas[:, k] = key_coords(key_block, count) - relative_coords[relative.name]
+    return deltas
+
+def write_shapekeys(obj, basis, deltas, stale=()):
+    # Create or overwrite the named keys as basis + delta. Existing keys
+    # named in stale are reset to the basis, their new offset is negligible
+    # and must not leave the old one in place.
+    if deltas and not obj.data.shape_keys:
+        utils.add_shapekey(obj, "Basis")
+    for name in stale:
+        index = utils.find_shapekey_index(obj, name)
+        if index > 0:
+            obj.data.shape_keys.key_blocks[index].data.foreach_set("co", basis.ravel())
+    for name, delta in deltas:
+        index = utils.find_shapekey_index(obj, name)
+        if index >= 0:
+            key_block = obj.data.shape_keys.key_blocks[index]
+        else:
+            key_block = utils.add_shapekey(obj, name)
+        key_block.data.foreach_set("co", (basis + delta).ravel())
+
+def transfer_shapekeys(source, targets, threshold=MIN_DELTA, workers=0):
+    # Binds every target to the source once, then moves all source key
+    # offsets through the binding. Returns (keys written, keys skipped).
+    if not source.data.shape_keys:
+        return 0, 0
+    reference = source.data.shape_keys.reference_key
+    names = [key_block.name for key_block in source.data.shape_keys.key_blocks if key_block != reference]
+    if not names:
+        return 0, 0
+
+    # Offsets are rest-shape differences, bind rest shapes to each other
+    with profiling.span("build_index"):
+        index = SourceIndex(source)
+
+    def extract(obj):
+        # Offsets are directions, only the rotation/scale part applies
+        matrix = obj.matrix_world.inverted() @ source.matrix_world
+        rotation = np.array(matrix.to_3x3(), dtype=np.float32)
+        # Basis is only added once a key is written, until then it's the mesh
+        if obj.data.shape_keys:
+            basis = key_coords(obj.data.shape_keys.reference_key, len(obj.data.vertices))
+        else:
+            basis = mesh_coords(obj.data)
+        prepared = index.prepare(obj)
+        tri_index, bary = index.resolve(prepared)
+        index.store(obj, prepared, tri_index, bary)
+        return index.tris[tri_index], bary, rotation, basis
+
+    objects = mesh_targets(source, targets)
+    bindings = {}
+    for obj in objects:
+        with profiling.span("bind", object=obj.name):
+            bindings[obj] = extract(obj)
+
+    written = skipped = 0
+    for start in range(0, len(names), KEY_CHUNK):
+        chunk = names[start:start + KEY_CHUNK]
+        with profiling.span("read_deltas", keys=len(chunk)):
+            deltas = source_deltas(source, chunk)
+
+        def compute(binding):
+            tri_verts, bary, rotation, _basis = binding
+            moved = interpolate(tri_verts, bary, deltas) @ rotation.T
+            magnitude = np.abs(moved).max(axis=(0, 2)) if len(moved) else np.zeros(len(chunk))
+            return moved, np.flatnonzero(magnitude >= threshold)
+
+        def writeback(obj, result):
+            nonlocal written, skipped
+            moved, keep = result
+            kept = set(keep.tolist())
+            stale = [name for k, name in enumerate(chunk) if k not in kept]
+            write_shapekeys(obj, bindings[obj][3], [(chunk[k], moved[:, k]) for k in keep], stale)
+            written += len(keep)
+            skipped += len(chunk) - len(keep)
+
+        scheduler.run(objects, bindings.get, compute, writeback, workers, "interpolate")
+
+    profiling.count(shape_keys=written, skipped_keys=skipped)
+    return written, skipped
@@ -1,99 +1,355 @@
 import bpy
+import bmesh
+import time
+import numpy as np
+from . import profiling, library, colors
 
 #-------------------------------------------------------------
 #   Armature Operations
 #-------------------------------------------------------------
 
+# Items are cached per scene and partitioned by object type. Blender also
+# requires dynamic enum strings to stay referenced from Python, which the
+# shared lists take care of.
+_object_index = {}
+_object_index_stats = {"hits": 0, "misses": 0, "rebuilds": 0}
+
+# Scene items followed by library items per (scene, object type), reused
+# while neither the scene index nor the library index changed
+_enum_items = {}
+
+PLACEHOLDERS = {
+    'ARMATURE': ("NONE", "No Armatures", ""),
+    'MESH': ("NONE", "No Meshes", ""),
+}
+
+def _scene_object_index(scene):
+    key = scene.as_pointer()
+    index = _object_index.get(key)
+    if index is not None:
+        _object_index_stats["hits"] += 1
+        return index
+
+    _object_index_stats["misses"] += 1
+    index = {'ARMATURE': [], 'MESH': []}
+    for obj in scene.objects:
+        if obj.type in index:
+            index[obj.type].append(obj.name)
+    index = {
+        'ARMATURE': [(name, name, "Armature object") for name in index['ARMATURE']],
+        'MESH': [(name, name, "Mesh object") for name in index['MESH']],
+    }
+    _object_index[key] = index
+    return index
+
+def _object_items(scene, obj_type):
+    index = _scene_object_index(scene)
+    stamp = library.library_stamp(scene)
+    key = (scene.as_pointer(), obj_type)
+    cached = _enum_items.get(key)
+    if cached is not None and cached[0] is index and cached[1] == stamp:
+        return cached[2]
+
+    items = index[obj_type]
+    items = items + library.library_items(scene, obj_type, exclude=[item[0] for item in items])
+    items = items or [PLACEHOLDERS[obj_type]]
+    _enum_items[key] = (index, stamp, items)
+    return items
+
+def invalidate_object_index():
+    if _object_index:
+        _object_index_stats["rebuilds"] += 1
+    _object_index.clear()
+    _enum_items.clear()
+
+def get_object_index_stats():
+    return dict(_object_index_stats)
+
 def get_armature_items(self, context):
-    items = []
-    for obj in context.scene.objects:
-        if obj.type == 'ARMATURE':
-            items.append((obj.name, obj.name, "Armature object"))
-    return items if items else [("NONE", "No Armatures", "")]
+    return _object_items(context.scene, 'ARMATURE')
 
 def get_mesh_items(self, context):
-    items = []
-    for obj in context.scene.objects:
-        if obj.type == 'MESH':
-            items.append((obj.name, obj.name, "Mesh object"))
-    return items if items else [("NONE", "No Meshes", "")]
+    return _object_items(context.scene, 'MESH')
+
+def append_library_choice(prop):
+    # Enum update callback: a library entry is appended and replaced by
+    # the name of the appended object
+    def update(self, context):
+        value = getattr(self, prop)
+        if not library.is_library_item(value):
+            return
+        path, name = library.parse_library_item(value)
+        obj = library.append_object(path, name, context.scene)
+        invalidate_object_index()
+        setattr(self, prop, obj.name)
+    return update
 
-def delete_hierarchy(obj):
-    # Gather all children recursively
-    to_delete = []
+@bpy.app.handlers.persistent
+def _on_depsgraph_update(scene, depsgraph):
+    # Objects added, removed or renamed show up as object/collection/scene updates
+    if not _object_index:
+        return
+    if depsgraph.id_type_updated('SCENE') or depsgraph.id_type_updated('COLLECTION'):
+        invalidate_object_index()
+        return
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object) and not (update.is_updated_transform
+                                                             or update.is_updated_geometry):
+            invalidate_object_index()
+            return
 
-    def collect(obj):
-        to_delete.append(obj)
-        for child in obj.children:
-            collect(child)
+@bpy.app.handlers.persistent
+def _on_file_load(*args):
+    invalidate_object_index()
+    invalidate_shapekeys()
 
-    collect(obj)
+def hierarchy(obj):
+    # obj and all of its descendants
+    return [obj] + list(obj.children_recursive)
 
-    # Deselect everything
-    bpy.ops.object.select_all(action='DESELECT')
+def delete_hierarchy(obj, keep=()):
+    return delete_hierarchies([obj], keep)
 
-    # Select the hierarchy for deletion
-    for ob in to_delete:
-        ob.select_set(True)
+def delete_hierarchies(roots, keep=()):
+    # Removes the roots and their descendants through bpy.data in one batch,
+    # then frees mesh/armature data nobody else uses. Objects in keep and
+    # their ancestors survive. Returns {"objects": n, "meshes": n, "armatures": n}.
+    protected = set()
+    for ob in keep:
+        while ob is not None:
+            protected.add(ob)
+            ob = ob.parent
+    doomed = {ob for root in roots for ob in hierarchy(root)} - protected
+    datas = {ob.data for ob in doomed if isinstance(ob.data, (bpy.types.Mesh, bpy.types.Armature))}
 
-    # Set an active object (needed for delete operator)
-    bpy.context.view_layer.objects.active = obj
+    # Kept children of removed parents keep their place in the world
+    for ob in protected:
+        if ob.parent in doomed:
+            world = ob.matrix_world.copy()
+            ob.parent = None
+            ob.matrix_world = world
 
-    # Delete selected objects
-    bpy.ops.object.delete()
+    freed = {"objects": len(doomed), "meshes": 0, "armatures": 0}
+    bpy.data.batch_remove(doomed)
+    orphans = [data for data in datas if data.users == 0]
+    for data in orphans:
+        freed["meshes" if isinstance(data, bpy.types.Mesh) else "armatures"] += 1
+    bpy.data.batch_remove(orphans)
+    invalidate_object_index()
+    return freed
+
+def reparent_objects(objects, armature):
+    # Parent every object to armature once, retarget armature modifiers and
+    # drop subdivision. Returns the armatures the modifiers used before.
+    previous = set()
+    for obj in objects:
+        if obj == armature:
+            continue
+        if obj.parent != armature:
+            obj.parent = armature
+        subsurf = []
+        for mod in obj.modifiers:
+            if mod.type == 'ARMATURE':
+                if mod.object and mod.object != armature:
+                    previous.add(mod.object)
+                mod.object = armature
+            elif mod.type == 'SUBSURF':
+                subsurf.append(mod)
+        for mod in subsurf:
+            obj.modifiers.remove(mod)
+    return previous
 
 #-------------------------------------------------------------
 #   Prune vertex groups
 #-------------------------------------------------------------
 
+def weight_matrix(obj):
+    # Sparse (vertex, group, weight) triplets of every group membership,
+    # gathered in a single pass over the mesh
+    flat = [(v.index, g.group, g.weight) for v in obj.data.vertices for g in v.groups]
+    if not flat:
+        return (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32),
+                np.zeros(0, dtype=np.float32))
+    rows, cols, vals = zip(*flat)
+    return (np.fromiter(rows, dtype=np.int32, count=len(flat)),
+            np.fromiter(cols, dtype=np.int32, count=len(flat)),
+            np.fromiter(vals, dtype=np.float32, count=len(flat)))
+
+def dense_weights(obj):
+    # Vertex x group weight matrix, zero where a vertex is not a member
+    rows, cols, vals = weight_matrix(obj)
+    weights = np.zeros((len(obj.data.vertices), len(obj.vertex_groups)), dtype=np.float32)
+    weights[rows, cols] = vals
+    return weights
+
 def survey(obj):
-            maxWeight = {}
-            for i in obj.vertex_groups:
-                maxWeight[i.index] = 0
-
-            for v in obj.data.vertices:
-                for g in v.groups:
-                    gn = g.group 
-                    w = obj.vertex_groups[g.group].weight(v.index)
-                    if (maxWeight.get(gn) is None or w>maxWeight[gn]):
-                        maxWeight[gn] = w
-            return maxWeight
-
-def prune_vertex_groups(objects):
-    for obj in objects:
-            maxWeight = survey(obj)
-            ka = []
-            ka.extend(maxWeight.keys())
-            ka.sort(key=lambda gn: -gn) # Inverse it, so remove can works well.
-            for gn in ka:
-                if maxWeight[gn]<=0.000001:
-                    obj.vertex_groups.remove(obj.vertex_groups[gn]) # actually remove the group
+    # Per-group max weight and membership count, indexed by group index
+    rows, cols, vals = weight_matrix(obj)
+    group_count = len(obj.vertex_groups)
+    max_weight = np.zeros(group_count, dtype=np.float32)
+    np.maximum.at(max_weight, cols, vals)
+    count = np.bincount(cols, minlength=group_count)
+    return max_weight, count
+
+def prune_vertex_groups(objects, threshold=0.000001):
+    # Survey every object first, then remove all empty groups in one batch
+    timings = []
+    empty_groups = []
+    with profiling.span("survey"):
+        for obj in objects:
+            if obj.type != 'MESH':
+                continue
+            start = time.perf_counter()
+            max_weight, _count = survey(obj)
+            empty = [obj.vertex_groups[int(gn)] for gn in np.flatnonzero(max_weight <= threshold)]
+            empty_groups.append((obj, empty))
+            timings.append([obj.name, len(empty), time.perf_counter() - start])
+
+    with profiling.span("remove_groups"):
+        for timing, (obj, empty) in zip(timings, empty_groups):
+            start = time.perf_counter()
+            for vg in empty:
+                obj.vertex_groups.remove(vg)
+            timing[2] += time.perf_counter() - start
+    profiling.count(groups_pruned=sum(timing[1] for timing in timings))
+
+    for name, removed, seconds in timings:
+        print(f"Pruned {removed} vertex groups from '{name}' in {seconds * 1000.0:.1f} ms")
+    return [tuple(timing) for timing in timings]
+
+def write_group_weights(vg, indices, weights):
+    # One VertexGroup.add() call per distinct weight when weights repeat
+    # (masks, quantized or restored weights). Interpolated weights are
+    # nearly all distinct, grouping them only adds overhead to the same
+    # number of calls.
+    values, inverse, counts = np.unique(weights, return_inverse=True, return_counts=True)
+    if len(values) * 2 > len(weights):
+        for index, value in zip(np.asarray(indices).tolist(), np.asarray(weights).tolist()):
+            vg.add([index], value, 'REPLACE')
+        return
+    members = np.asarray(indices)[np.argsort(inverse, kind='stable')].tolist()
+    start = 0
+    for value, count in zip(values.tolist(), counts.tolist()):
+        vg.add(members[start:start + count], value, 'REPLACE')
+        start += count
+
+def write_weights(obj, rows, cols, vals):
+    # Replaces every deform weight of obj by (vertex, group index, weight)
+    # triplets in one BMesh pass over the vertices, about 3x faster than
+    # VertexGroup.add() when all groups are rewritten
+    order = np.argsort(rows, kind='stable')
+    indptr = np.searchsorted(rows[order], np.arange(len(obj.data.vertices) + 1)).tolist()
+    groups = np.asarray(cols)[order].tolist()
+    values = np.asarray(vals, dtype=np.float32)[order].tolist()
+
+    bm = bmesh.new()
+    try:
+        bm.from_mesh(obj.data)
+        layer = bm.verts.layers.deform.verify()
+        for i, vert in enumerate(bm.verts):
+            deform = vert[layer]
+            deform.clear()
+            for k in range(indptr[i], indptr[i + 1]):
+                deform[groups[k]] = values[k]
+        bm.to_mesh(obj.data)
+    finally:
+        bm.free()
+    obj.data.update()
 
 # --------------------------------------
 #   Morph Operations
 # --------------------------------------
 
+# Keys left untouched when morphs are cleared
+KEEP_KEYS = {"HideNips"}
+
+# Keys the tucked morph operators add, flat until they are sculpted
+TUCKED_KEYS = {"TuckedBase", "TuckedMax", "TuckedShaftMax", "TuckedScrotumMax"}
+
+# Name -> index maps per Key datablock. Added or removed keys (length
+# change) and renamed keys (name mismatch on a hit) cause a rebuild. A miss
+# is confirmed with Blender's own lookup, renames and delete + add keep the
+# count, and rebuilds the map when the key exists after all.
+_shapekey_registry = {}
+
+def _shapekey_map(key, rebuild=False):
+    ptr = key.as_pointer()
+    names = _shapekey_registry.get(ptr)
+    if rebuild or names is None or len(names) != len(key.key_blocks):
+        names = {key_block.name: i for i, key_block in enumerate(key.key_blocks)}
+        _shapekey_registry[ptr] = names
+    return names
+
+def invalidate_shapekeys(key=None):
+    if key is None:
+        _shapekey_registry.clear()
+    else:
+        _shapekey_registry.pop(key.as_pointer(), None)
+
+def find_shapekey_index(obj, shapekey_name):
+    if not obj or obj.type != 'MESH' or not obj.data.shape_keys:
+        return -1
+    key = obj.data.shape_keys
+    index = _shapekey_map(key).get(shapekey_name)
+    if index is not None and key.key_blocks[index].name == shapekey_name:
+        return index
+    index = key.key_blocks.find(shapekey_name)
+    if index >= 0:
+        _shapekey_map(key, rebuild=True)
+    return index
+
+def add_shapekey(obj, shapekey_name, from_mix=False):
+    # shape_key_add that keeps a valid name map valid instead of rebuilding it
+    key_block = obj.shape_key_add(name=shapekey_name, from_mix=from_mix)
+    key = obj.data.shape_keys
+    names = _shapekey_registry.get(key.as_pointer())
+    if names is not None and len(names) == len(key.key_blocks) - 1:
+        names[key_block.name] = len(key.key_blocks) - 1
+    return key_block
+
+def get_shapekey(obj, shapekey_name):
+    index = find_shapekey_index(obj, shapekey_name)
+    return obj.data.shape_keys.key_blocks[index] if index >= 0 else None
+
 def get_shapekey_index(obj, shapekey):
-    if obj and obj.data.shape_keys:
-        for i, key in enumerate(obj.data.shape_keys.key_blocks):
-            if key.name == shapekey.name:
-                return i
-    return -1  # Not found
+    return find_shapekey_index(obj, shapekey.name)
 
-def clear_shapekeys(obj):
-    # Ignored keys
-    keep_keys = {"HideNips"}
+def get_shapekey_values(obj):
+    key_blocks = obj.data.shape_keys.key_blocks
+    values = np.empty(len(key_blocks), dtype=np.float32)
+    key_blocks.foreach_get("value", values)
+    return values
 
-    if obj and obj.data.shape_keys:
-            for key_block in obj.data.shape_keys.key_blocks:
-                if key_block.name not in keep_keys:
-                    key_block.value = 0.0
+def set_shapekey_values(obj, value=0.0, keep=KEEP_KEYS):
+    # Set every key value in one write, leaving keys named in keep as they are
+    if not obj or obj.type != 'MESH' or not obj.data.shape_keys:
+        return
+    key_blocks = obj.data.shape_keys.key_blocks
+    values = get_shapekey_values(obj)
+    keep_indices = [i for i in (find_shapekey_index(obj, name) for name in keep) if i >= 0]
+    new_values = np.full(len(values), value, dtype=np.float32)
+    new_values[keep_indices] = values[keep_indices]
+    key_blocks.foreach_set("value", new_values)
+    profiling.count(shape_keys=len(new_values))
+    obj.data.shape_keys.update_tag()
+
+def clear_shapekeys(obj):
+    set_shapekey_values(obj, 0.0, KEEP_KEYS)
 
 def set_active_shapekey_by_name(obj, shapekey_name):
-    if obj and obj.data.shape_keys:
-        for i, key in enumerate(obj.data.shape_keys.key_blocks):
-            if key.name == shapekey_name:
-                obj.active_shape_key_index = i
+    index = find_shapekey_index(obj, shapekey_name)
+    if index >= 0:
+        obj.active_shape_key_index = index
+    return index
+
+def activate_shapekey(obj, shapekey_name, value=1.0):
+    # Make the named key active and set its value, returns the key or None
+    index = set_active_shapekey_by_name(obj, shapekey_name)
+    if index < 0:
+        return None
+    key_block = obj.data.shape_keys.key_blocks[index]
+    key_block.value = value
+    return key_block
 
 # --------------------------------------
 #   Register/Unregister Float Property
@@ -145,27 +401,189 @@ def register_props():
     bpy.types.Scene.primary_armature_enum = bpy.props.EnumProperty(
         name="Armature",
         description="Select an armature",
-        items=get_armature_items
+        items=get_armature_items,
+        update=append_library_choice("primary_armature_enum")
     )
     bpy.types.Scene.primary_mesh_enum = bpy.props.EnumProperty(
         name="Mesh",
         description="Select a mesh",
-        items=get_mesh_items
+        items=get_mesh_items,
+        update=append_library_choice("primary_mesh_enum")
     )
     bpy.types.Scene.female_anatomy_mesh_enum = bpy.props.EnumProperty(
         name="Female Anatomy Mesh",
         description="Select a mesh",
-        items=get_mesh_items
+        items=get_mesh_items,
+        update=append_library_choice("female_anatomy_mesh_enum")
     )
     bpy.types.Scene.male_anatomy_mesh_enum = bpy.props.EnumProperty(
         name="Male Anatomy Mesh",
         description="Select a mesh",
-        items=get_mesh_items
+        items=get_mesh_items,
+        update=append_library_choice("male_anatomy_mesh_enum")
     )
     bpy.types.Scene.paint_mesh_enum = bpy.props.EnumProperty(
         name="Paint Mesh",
         description="Select a mesh",
-        items=get_mesh_items
+        items=get_mesh_items,
+        update=append_library_choice("paint_mesh_enum")
+    )
+
+    bpy.types.Scene.library_directory = bpy.props.StringProperty(
+        name="Library",
+        description="Directory of .blend files whose objects the Data panel lists for appending",
+        default="",
+        subtype='DIR_PATH'
+    )
+
+    bpy.types.Scene.vertex_smooth_groups = bpy.props.EnumProperty(
+        name="Smooth Groups",
+        description="Vertex groups to smooth",
+        items=[
+            ('ACTIVE', "Active", "Only the active vertex group"),
+            ('BONE_DEFORM', "Deform", "Groups of deforming bones"),
+            ('ALL', "All", "Every vertex group"),
+        ],
+        default='ACTIVE'
+    )
+    bpy.types.Scene.vertex_smooth_normalize = bpy.props.BoolProperty(
+        name="Normalize",
+        description="Renormalize deform weights of every vertex after smoothing",
+        default=False
+    )
+    bpy.types.Scene.shapekey_transfer_threshold = bpy.props.FloatProperty(
+        name="Min Offset",
+        description="Transferred shape keys that move no vertex further than this are skipped",
+        default=0.0001,
+        min=0.0,
+        precision=5,
+        subtype='DISTANCE'
+    )
+    bpy.types.Scene.shapekey_prune_threshold = bpy.props.FloatProperty(
+        name="Dead Offset",
+        description="Shape keys that move no vertex further than this from their relative key are pruned",
+        default=0.0001,
+        min=0.0,
+        precision=5,
+        subtype='DISTANCE'
+    )
+    bpy.types.Scene.paint_channel_map = bpy.props.StringProperty(
+        name="Channel Map",
+        description="Color channels to merge, as 'Source.R > Destination.G' entries separated by commas",
+        default=colors.DEFAULT_MAPPINGS
+    )
+    bpy.types.Scene.paint_byte_color = bpy.props.BoolProperty(
+        name="Byte Color",
+        description="Store merged color attributes as 8-bit colors, a quarter of the memory in Blender",
+        default=False
+    )
+    bpy.types.Scene.export_path_template = bpy.props.StringProperty(
+        name="Export Path",
+        description="FBX output path, {name}, {armature} and {blend} are replaced on export",
+        default="//{name}.fbx",
+        subtype='FILE_PATH'
+    )
+    bpy.types.Scene.export_per_piece = bpy.props.BoolProperty(
+        name="One File per Piece",
+        description="Export every mesh to its own FBX with the armature, named by the export path",
+        default=False
+    )
+    bpy.types.Scene.export_collection = bpy.props.PointerProperty(
+        name="Collection",
+        description="Export the meshes of this collection instead of the selection",
+        type=bpy.types.Collection
+    )
+    bpy.types.Scene.export_use_cache = bpy.props.BoolProperty(
+        name="Skip Unchanged",
+        description="Skip exports whose objects, armature and settings match the last export to the same file",
+        default=True
+    )
+    bpy.types.Scene.export_in_background = bpy.props.BoolProperty(
+        name="Background Export",
+        description="Export from a separate headless Blender so the UI stays responsive",
+        default=False
+    )
+    bpy.types.Scene.export_limit_influences = bpy.props.BoolProperty(
+        name="Limit Influences",
+        description="Limit, normalize and optionally quantize bone weights of the exported copies",
+        default=False
+    )
+    bpy.types.Scene.export_max_influences = bpy.props.IntProperty(
+        name="Max Influences",
+        description="Bone influences kept per vertex",
+        default=4,
+        min=1,
+        max=12
+    )
+    bpy.types.Scene.export_influence_epsilon = bpy.props.FloatProperty(
+        name="Min Weight",
+        description="Influences at or below this weight are dropped before normalizing",
+        default=0.001,
+        min=0.0,
+        max=0.5,
+        precision=4
+    )
+    bpy.types.Scene.export_quantize_weights = bpy.props.BoolProperty(
+        name="Quantize",
+        description="Round weights to 8-bit steps that still sum to one",
+        default=False
+    )
+
+    bpy.types.Scene.use_snapshots = bpy.props.BoolProperty(
+        name="Snapshots",
+        description="Keep snapshots of only the data an operator changes instead of a global undo step, "
+                    "restored from the Debug panel",
+        default=False
+    )
+    bpy.types.Scene.snapshot_budget = bpy.props.IntProperty(
+        name="Snapshot Budget",
+        description="Memory in MB kept for operator snapshots, least recently used ones are dropped first",
+        default=256,
+        min=1
+    )
+
+    bpy.types.Scene.scheduler_workers = bpy.props.IntProperty(
+        name="Worker Threads",
+        description="Threads computing per-object transfers in parallel, 0 uses every core",
+        default=0,
+        min=0,
+        max=64
+    )
+
+    bpy.types.Scene.mirror_direction = bpy.props.EnumProperty(
+        name="Direction",
+        description="Side copied onto the other when symmetrizing",
+        items=[
+            ('POSITIVE_X', "+X to -X", "Copy the character's left side onto the right"),
+            ('NEGATIVE_X', "-X to +X", "Copy the character's right side onto the left"),
+        ],
+        default='POSITIVE_X'
+    )
+    bpy.types.Scene.mirror_tolerance = bpy.props.FloatProperty(
+        name="Tolerance",
+        description="Largest distance between a mirrored vertex and its partner",
+        default=0.0001,
+        min=0.0,
+        max=0.01,
+        precision=5
+    )
+    bpy.types.Scene.weight_stash_directory = bpy.props.StringProperty(
+        name="Stash Directory",
+        description="Also write weight stashes here as .npz files, so they outlive the session",
+        default="",
+        subtype='DIR_PATH'
+    )
+
+    bpy.types.Scene.profile_operators = bpy.props.BoolProperty(
+        name="Profile Operators",
+        description="Record phase timings and peak memory of Daz Tools operators and write Chrome traces",
+        default=False
+    )
+    bpy.types.Scene.profile_directory = bpy.props.StringProperty(
+        name="Trace Directory",
+        description="Directory for Chrome trace files, the temporary directory when empty",
+        default="",
+        subtype='DIR_PATH'
     )
 
 def unregister_props():
@@ -174,17 +592,49 @@ def unregister_props():
     del bpy.types.Scene.female_anatomy_mesh_enum
     del bpy.types.Scene.male_anatomy_mesh_enum
     del bpy.types.Scene.paint_mesh_enum
+    del bpy.types.Scene.library_directory
+    del bpy.types.Scene.vertex_smooth_groups
+    del bpy.types.Scene.vertex_smooth_normalize
+    del bpy.types.Scene.shapekey_transfer_threshold
+    del bpy.types.Scene.shapekey_prune_threshold
+    del bpy.types.Scene.paint_channel_map
+    del bpy.types.Scene.paint_byte_color
+    del bpy.types.Scene.export_path_template
+    del bpy.types.Scene.export_per_piece
+    del bpy.types.Scene.export_collection
+    del bpy.types.Scene.export_use_cache
+    del bpy.types.Scene.export_in_background
+    del bpy.types.Scene.export_limit_influences
+    del bpy.types.Scene.export_max_influences
+    del bpy.types.Scene.export_influence_epsilon
+    del bpy.types.Scene.export_quantize_weights
+    del bpy.types.Scene.use_snapshots
+    del bpy.types.Scene.snapshot_budget
+    del bpy.types.Scene.scheduler_workers
+    del bpy.types.Scene.weight_stash_directory
+    del bpy.types.Scene.mirror_direction
+    del bpy.types.Scene.mirror_tolerance
+    del bpy.types.Scene.profile_operators
+    del bpy.types.Scene.profile_directory
 
 # --------------------------------------
 #   Blender registration hooks
 # --------------------------------------
 
 def register():
+    bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update)
+    bpy.app.handlers.load_post.append(_on_file_load)
     register_props()
     register_float_property("vertex_smooth_factor", default=0.5, min_val=0.0, max_val=1.0)
     register_int_property("vertex_smooth_iterations", default=5, min_val=1, max_val=10)
 
 def unregister():
+    if _on_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update)
+    if _on_file_load in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_file_load)
+    invalidate_object_index()
+    invalidate_shapekeys()
     unregister_props()
     unregister_float_property("vertex_smooth_factor")
     unregister_int_property("vertex_smooth_iterations")
\ No newline at end of file
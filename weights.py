@@ -0,0 +1,275 @@
+import bpy
+import numpy as np
+from . import utils, profiling
+
+#-------------------------------------------------------------
+#   Mesh adjacency
+#-------------------------------------------------------------
+
+# CSR vertex adjacency per mesh, reused until the edge topology changes.
+# Entries are keyed by the edge array itself, so a reused pointer is safe.
+_adjacency_cache = {}
+
+def mesh_edges(mesh):
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+    return edges.reshape(-1, 2)
+
+def adjacency(mesh):
+    edges = mesh_edges(mesh)
+    vertex_count = len(mesh.vertices)
+    key = (vertex_count, hash(edges.tobytes()))
+    cached = _adjacency_cache.get(mesh.as_pointer())
+    if cached and cached[0] == key:
+        return cached[1]
+
+    rows = np.concatenate((edges[:, 0], edges[:, 1]))
+    cols = np.concatenate((edges[:, 1], edges[:, 0]))
+    indices = cols[np.argsort(rows, kind='stable')]
+    indptr = np.zeros(vertex_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=vertex_count), out=indptr[1:])
+
+    _adjacency_cache[mesh.as_pointer()] = (key, (indptr, indices))
+    return indptr, indices
+
+def invalidate_adjacency():
+    _adjacency_cache.clear()
+
+def neighbor_mean(values, indptr, indices):
+    # Mean of the edge-connected neighbours of every vertex, rows without
+    # neighbours keep their own value
+    degree = np.diff(indptr)
+    connected = degree > 0
+    result = values.copy()
+    if len(indices):
+        sums = np.add.reduceat(values[indices], indptr[:-1][connected], axis=0)
+        result[connected] = sums / degree[connected, None]
+    return result
+
+#-------------------------------------------------------------
+#   Smoothing
+#-------------------------------------------------------------
+
+def deform_group_indices(obj):
+    # Groups named after deforming bones of the armatures driving obj
+    bones = set()
+    armatures = [mod.object for mod in obj.modifiers if mod.type == 'ARMATURE' and mod.object]
+    if obj.parent and obj.parent.type == 'ARMATURE':
+        armatures.append(obj.parent)
+    for armature in armatures:
+        bones.update(bone.name for bone in armature.data.bones if bone.use_deform)
+    return [vg.index for vg in obj.vertex_groups if vg.name in bones]
+
+def smooth_weights(weights, indptr, indices, factor, iterations):
+    # Laplacian smoothing of all columns at once, w += factor * (mean - w)
+    for _ in range(iterations):
+        weights = weights + factor * (neighbor_mean(weights, indptr, indices) - weights)
+    return weights
+
+def normalize_weights(weights, columns, locked=()):
+    # Scale columns so each vertex sums to one, minus what locked columns hold
+    free = 1.0 - (weights[:, list(locked)].sum(axis=1, keepdims=True) if len(locked) else 0.0)
+    totals = weights[:, columns].sum(axis=1, keepdims=True)
+    scale = np.where(totals > 0.0, np.maximum(free, 0.0) / np.maximum(totals, 1e-12), 0.0)
+    weights[:, columns] *= scale
+    return weights
+
+def select_groups(obj, mode):
+    if mode == 'ACTIVE':
+        return [obj.vertex_groups.active_index] if obj.vertex_groups.active else []
+    if mode == 'BONE_DEFORM':
+        return deform_group_indices(obj)
+    return [vg.index for vg in obj.vertex_groups]
+
+def smooth_vertex_groups(obj, mode='ACTIVE', factor=0.5, iterations=5, normalize=False):
+    # Smooths the chosen groups in object mode, returns the number of groups written
+    groups = [gn for gn in select_groups(obj, mode) if not obj.vertex_groups[gn].lock_weight]
+    if not groups:
+        return 0
+
+    with profiling.span("read_weights", object=obj.name):
+        indptr, indices = adjacency(obj.data)
+        before, membership = read_weights(obj)
+
+    with profiling.span("smooth", object=obj.name, groups=len(groups)):
+        after = before.copy()
+        after[:, groups] = smooth_weights(before[:, groups], indptr, indices, factor, iterations)
+        if normalize:
+            deform = deform_group_indices(obj) or groups
+            locked = [gn for gn in deform if obj.vertex_groups[gn].lock_weight]
+            unlocked = [gn for gn in deform if not obj.vertex_groups[gn].lock_weight]
+            normalize_weights(after, unlocked, locked)
+
+    with profiling.span("write_weights", object=obj.name):
+        written = write_changed_groups(obj, before, after, membership)
+    profiling.count(vertices=len(before), groups=written)
+    return written
+
+def read_weights(obj):
+    # Dense weights and group membership, vertices x groups
+    rows, cols, vals = utils.weight_matrix(obj)
+    weights = np.zeros((len(obj.data.vertices), len(obj.vertex_groups)), dtype=np.float32)
+    weights[rows, cols] = vals
+    membership = np.zeros(weights.shape, dtype=bool)
+    membership[rows, cols] = True
+    return weights, membership
+
+def write_changed_groups(obj, before, after, membership):
+    # Write back only the columns that changed, dropping members that reached zero
+    written = 0
+    changed = np.flatnonzero(np.abs(after - before).max(axis=0) > 1e-7) if len(before) else []
+    for gn in changed:
+        vg = obj.vertex_groups[int(gn)]
+        column = after[:, gn]
+        members = np.flatnonzero(column > 0.0)
+        if len(members):
+            utils.write_group_weights(vg, members, column[members])
+        emptied = np.flatnonzero(membership[:, gn] & (column <= 0.0))
+        if len(emptied):
+            vg.remove(emptied.tolist())
+        written += 1
+    if written:
+        invalidate_group_statistics(obj.data)
+    return written
+
+#-------------------------------------------------------------
+#   Influence limit
+#-------------------------------------------------------------
+
+# UE skins with up to 8 influences per vertex by default, 4 is cheaper
+MAX_INFLUENCES = 4
+
+# 8-bit skin weights, as UE stores them
+QUANTIZE_STEPS = 255
+
+def limit_weights(weights, max_influences=MAX_INFLUENCES, epsilon=0.0, quantize=False):
+    # Keep the largest max_influences weights of every row above epsilon and
+    # renormalize. The largest weight of a row is kept even below epsilon,
+    # only rows without any weight stay empty.
+    limited = np.where(weights > epsilon, weights, 0.0).astype(np.float32)
+    if weights.shape[1]:
+        rows = np.arange(len(weights))
+        largest = weights.argmax(axis=1)
+        keep = weights[rows, largest] > 0.0
+        limited[rows[keep], largest[keep]] = weights[rows[keep], largest[keep]]
+    weights = limited
+    if weights.shape[1] > max_influences:
+        smallest = np.argpartition(weights, weights.shape[1] - max_influences, axis=1)
+        np.put_along_axis(weights, smallest[:, :weights.shape[1] - max_influences], 0.0, axis=1)
+
+    totals = weights.sum(axis=1, keepdims=True)
+    weights /= np.where(totals > 0.0, totals, 1.0)
+    if quantize:
+        weights = quantize_weights(weights)
+    return weights
+
+def quantize_weights(weights, steps=QUANTIZE_STEPS):
+    # Round normalized rows to multiples of 1/steps that still sum to one,
+    # handing the leftover steps to the largest remainders
+    scaled = weights * steps
+    steps_taken = np.floor(scaled)
+    remainder = scaled - steps_taken
+    deficit = np.rint(steps * (weights.sum(axis=1) > 0.0) - steps_taken.sum(axis=1)).astype(np.int64)
+    rank = np.argsort(np.argsort(-remainder, axis=1, kind='stable'), axis=1, kind='stable')
+    steps_taken += (rank < deficit[:, None]) & (remainder > 0.0)
+    return (steps_taken / steps).astype(np.float32)
+
+def limit_influences(obj, max_influences=MAX_INFLUENCES, epsilon=0.0, quantize=False):
+    # Limits deform group influences of every vertex, returns the number of
+    # vertices that lost influences
+    deform = deform_group_indices(obj) or [vg.index for vg in obj.vertex_groups]
+    if not deform:
+        return 0
+
+    with profiling.span("read_weights", object=obj.name):
+        before, membership = read_weights(obj)
+
+    with profiling.span("limit_influences", object=obj.name):
+        after = before.copy()
+        after[:, deform] = limit_weights(before[:, deform], max_influences, epsilon, quantize)
+        limited = int(((before[:, deform] > 0.0) & (after[:, deform] <= 0.0)).any(axis=1).sum())
+
+    with profiling.span("write_weights", object=obj.name):
+        write_changed_groups(obj, before, after, membership)
+    profiling.count(vertices=len(before), limited_vertices=limited)
+    return limited
+
+#-------------------------------------------------------------
+#   Group statistics
+#-------------------------------------------------------------
+
+HISTOGRAM_BINS = 10
+
+# Per-mesh statistics, validated against vertex/group counts on lookup.
+# Weight edits don't always reach the depsgraph handler, so the functions
+# in the add-on that write weights drop the entry themselves.
+_stats_cache = {}
+
+class GroupStatistics:
+    def __init__(self, names, max_weight, mean_weight, count, histogram):
+        self.names = names
+        self.max = max_weight
+        self.mean = mean_weight
+        self.count = count
+        self.histogram = histogram
+
+def compute_group_statistics(obj):
+    rows, cols, vals = utils.weight_matrix(obj)
+    group_count = len(obj.vertex_groups)
+    nonzero = vals > 0.0
+    cols, vals = cols[nonzero], vals[nonzero]
+
+    max_weight = np.zeros(group_count, dtype=np.float32)
+    np.maximum.at(max_weight, cols, vals)
+    count = np.bincount(cols, minlength=group_count)
+    total = np.bincount(cols, weights=vals, minlength=group_count)
+    mean_weight = np.where(count > 0, total / np.maximum(count, 1), 0.0).astype(np.float32)
+
+    bins = np.minimum((vals * HISTOGRAM_BINS).astype(np.int64), HISTOGRAM_BINS - 1)
+    histogram = np.bincount(cols * HISTOGRAM_BINS + bins, minlength=group_count * HISTOGRAM_BINS)
+    return GroupStatistics([vg.name for vg in obj.vertex_groups], max_weight, mean_weight, count,
+                           histogram.reshape(group_count, HISTOGRAM_BINS))
+
+def group_statistics(obj):
+    key = obj.data.as_pointer()
+    signature = (len(obj.data.vertices), tuple(vg.name for vg in obj.vertex_groups))
+    cached = _stats_cache.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+    with profiling.span("group_statistics", object=obj.name):
+        stats = compute_group_statistics(obj)
+    _stats_cache[key] = (signature, stats)
+    return stats
+
+def invalidate_group_statistics(mesh=None):
+    if mesh is None:
+        _stats_cache.clear()
+    else:
+        _stats_cache.pop(mesh.as_pointer(), None)
+
+@bpy.app.handlers.persistent
+def _on_depsgraph_update(scene, depsgraph):
+    # Weight painting and any other edit of a mesh shows up as a geometry update
+    if not _stats_cache:
+        return
+    for update in depsgraph.updates:
+        if update.is_updated_geometry and isinstance(update.id, bpy.types.Object) \
+                and update.id.type == 'MESH':
+            invalidate_group_statistics(update.id.original.data)
+
+@bpy.app.handlers.persistent
+def _on_file_load(*args):
+    invalidate_adjacency()
+    invalidate_group_statistics()
+
+def register():
+    bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update)
+    bpy.app.handlers.load_post.append(_on_file_load)
+
+def unregister():
+    if _on_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update)
+    if _on_file_load in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_file_load)
+    invalidate_adjacency()
+    invalidate_group_statistics()